@@ -12,7 +12,7 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import logging
+import time, logging
 from grid_control.backends.backend_tools import BackendError, BackendExecutor
 from grid_control.job_db import Job
 from grid_control.utils import abort
@@ -42,6 +42,61 @@ class CheckJobs(BackendExecutor):
 		return CheckStatus.OK
 
 
+class CheckJobsCached(CheckJobs):
+	# Status queries are answered from a table with the status of all jobs of the user, which is
+	# refreshed after <check cache ttl> seconds - only jobs missing from the table are queried directly.
+	# Incremental tables only contain the jobs that changed since the last query and are merged
+	def __init__(self, config, executor, table_executor, incremental=False):
+		CheckJobs.__init__(self, config)
+		(self._executor, self._table_executor) = (executor, table_executor)
+		(self._incremental, self._status) = (incremental, CheckStatus.OK)
+		self._ttl = config.get_time('check cache ttl', 0, on_change=None)
+		(self._map_wms_id2result, self._table_time) = ({}, None)
+
+	def execute(self, wms_id_list):  # yields list of (wms_id, job_status, job_info)
+		if self._ttl <= 0:  # status cache is disabled
+			for result in self._executor.execute(wms_id_list):
+				yield result
+			self._status = self._executor.get_status()
+			return
+		if (self._table_time is None) or (time.time() - self._table_time > self._ttl):
+			self._update_table()
+		wms_id_list_missing = []
+		for wms_id in wms_id_list:
+			if wms_id in self._map_wms_id2result:
+				(job_status, job_info) = self._map_wms_id2result[wms_id]
+				yield (wms_id, job_status, dict(job_info))
+			else:
+				wms_id_list_missing.append(wms_id)
+		self._status = CheckStatus.OK
+		if wms_id_list_missing:
+			for (wms_id, job_status, job_info) in self._executor.execute(wms_id_list_missing):
+				self._map_wms_id2result[wms_id] = (job_status, dict(job_info))
+				yield (wms_id, job_status, job_info)
+			self._status = self._executor.get_status()
+
+	def get_status(self):
+		return self._status
+
+	def setup(self, log):
+		CheckJobs.setup(self, log)
+		self._executor.setup(log)
+		self._table_executor.setup(log)
+
+	def _update_table(self):
+		map_wms_id2result = {}
+		for (wms_id, job_status, job_info) in self._table_executor.execute([]):
+			map_wms_id2result[wms_id] = (job_status, job_info)
+		if self._table_executor.get_status() != CheckStatus.OK:
+			self._log.warning('Unable to query status table - falling back to direct status queries')
+			self._map_wms_id2result = {}  # discard possibly outdated information
+		elif self._incremental:
+			self._map_wms_id2result.update(map_wms_id2result)
+		else:
+			self._map_wms_id2result = map_wms_id2result
+		self._table_time = time.time()
+
+
 class CheckJobsMissingState(CheckJobs):
 	def __init__(self, config, executor, missing_state=Job.DONE):
 		CheckJobs.__init__(self, config)
@@ -37,6 +37,15 @@ def unpack_wildcard_tar(log, output_dn):
 				clear_current_exception()
 
 
+def iter_array_index(value):
+	# Yield indices of array range specifications like "1-5,7", "[1-9%2]" or "1-10:2"
+	for entry in value.strip('[]').split('%')[0].split(','):
+		(entry, step) = (entry.split(':') + ['1'])[:2]
+		(start, end) = (entry.split('-') + [entry])[:2]
+		for array_idx in irange(int(start), int(end) + 1, int(step)):
+			yield array_idx
+
+
 class BackendDiscovery(ConfigurablePlugin):
 	def discover(self):
 		raise AbstractError
@@ -14,8 +14,8 @@
 
 import xml.dom.minidom
 from grid_control.backends.aspect_cancel import CancelJobsWithProcessBlind
-from grid_control.backends.aspect_status import CheckInfo, CheckJobsMissingState, CheckJobsWithProcess, CheckStatus  # pylint:disable=line-too-long
-from grid_control.backends.backend_tools import BackendDiscovery, ProcessCreatorViaArguments
+from grid_control.backends.aspect_status import CheckInfo, CheckJobsCached, CheckJobsMissingState, CheckJobsWithProcess, CheckStatus  # pylint:disable=line-too-long
+from grid_control.backends.backend_tools import BackendDiscovery, ProcessCreatorViaArguments, iter_array_index  # pylint:disable=line-too-long
 from grid_control.backends.wms import BackendError, WMS
 from grid_control.backends.wms_pbsge import PBSGECommon
 from grid_control.config import ConfigError
@@ -118,7 +118,14 @@ class GridEngineCheckJobs(CheckJobsWithProcess):
 					job_info[CheckInfo.WN] = node
 			except Exception:
 				raise BackendError('Error reading job info:\n%s' % job_node.toxml())
-			yield job_info
+			task_spec = job_info.pop('tasks', None)
+			if task_spec is None:
+				yield job_info
+				continue
+			for array_idx in iter_array_index(task_spec):  # array tasks: <job number>.<task index>
+				task_info = dict(job_info)
+				task_info[CheckInfo.WMSID] = '%s.%d' % (job_info[CheckInfo.WMSID], array_idx)
+				yield task_info
 
 
 class GridEngine(PBSGECommon):  # pylint:disable=too-many-ancestors
@@ -130,7 +137,8 @@ class GridEngine(PBSGECommon):  # pylint:disable=too-many-ancestors
 			fmt=lambda wms_id_list: [str.join(',', wms_id_list)], unknown_id='Unknown Job Id')
 		PBSGECommon.__init__(self, config, name,
 			cancel_executor=cancel_executor,
-			check_executor=CheckJobsMissingState(config, GridEngineCheckJobs(config)),
+			check_executor=CheckJobsMissingState(config,
+				CheckJobsCached(config, GridEngineCheckJobs(config), GridEngineCheckJobs(config))),
 			nodes_finder=GridEngineDiscoverNodes(config),
 			queues_finder=GridEngineDiscoverQueues(config))
 		self._project = config.get('project name', '', on_change=None)
@@ -140,6 +148,10 @@ class GridEngine(PBSGECommon):  # pylint:disable=too-many-ancestors
 		# Your job 424992 ("test.sh") has been submitted
 		return data.split()[2].strip()
 
+	def _get_array_wms_id(self, wms_id, array_idx):
+		# Your job-array 424992.1-10:1 ("test.sh") has been submitted
+		return '%s.%d' % (wms_id.split('.')[0], array_idx)
+
 	def _get_submit_arguments(self, jobnum, job_name, reqs, sandbox, stdout, stderr):
 		def _time_str(secs):
 			return '%02d:%02d:%02d' % (secs / 3600, (secs / 60) % 60, secs % 60)
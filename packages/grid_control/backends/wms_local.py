@@ -16,13 +16,13 @@ import os, glob, time, shlex, shutil, tempfile
 from grid_control.backends.aspect_cancel import CancelAndPurgeJobs, CancelJobs
 from grid_control.backends.broker_base import Broker
 from grid_control.backends.wms import BackendError, BasicWMS, WMS
-from grid_control.utils import ensure_dir_exists, get_path_share, remove_files, resolve_install_path
+from grid_control.utils import abort, ensure_dir_exists, get_path_share, remove_files, resolve_install_path  # pylint:disable=line-too-long
 from grid_control.utils.activity import Activity
 from grid_control.utils.file_tools import VirtualFile
 from grid_control.utils.process_base import LocalProcess
-from grid_control.utils.thread_tools import GCLock, with_lock
-from hpfwk import AbstractError, ExceptionCollector, ignore_exception
-from python_compat import ifilter, imap, ismap, lchain, lfilter, lmap
+from grid_control.utils.thread_tools import GCLock, GCQueue, start_daemon, with_lock
+from hpfwk import AbstractError, ExceptionCollector, clear_current_exception, ignore_exception
+from python_compat import ifilter, imap, lchain, lfilter, lmap, lsmap, sorted
 
 
 class SandboxHelper(object):
@@ -48,6 +48,15 @@ class SandboxHelper(object):
 			os.listdir(self._path))
 		return _search_sandbox(ifilter(lambda x: x not in old_cache, self._cache))
 
+	def remove_array_lists(self):
+		# Array sandbox lists are obsolete once none of the listed array tasks can start anymore -
+		# the job config is removed from the sandbox during the output retrieval and the purge
+		for list_fn in glob.glob(os.path.join(self._path, 'array.*.list')):
+			sandbox_list = ignore_exception(Exception, [], lambda: open(list_fn).read().splitlines())
+			if not lfilter(lambda sandbox: os.path.exists(os.path.join(sandbox, '_jobconfig.sh')),
+					sandbox_list):
+				remove_files([list_fn])
+
 
 class LocalWMS(BasicWMS):
 	config_section_list = BasicWMS.config_section_list + ['local']
@@ -83,15 +92,41 @@ class LocalWMS(BasicWMS):
 		self._scratch_path = config.get_list('scratch path', ['TMPDIR', '/tmp'], on_change=True)
 		self._submit_opt_list = shlex.split(config.get('submit options', '', on_change=None))
 		self._memory = config.get_int('memory', -1, on_change=None)
+		self._array_size = config.get_int('array size', 0, on_change=None)
+		if (self._array_size > 1) and (self._get_array_arguments(self._array_size) is None):
+			self._log.warning('%s does not support array jobs - jobs are submitted individually',
+				self.__class__.__name__)
+			self._array_size = 0
+		self._submit_concurrency = config.get_int('submit concurrency', 1, on_change=None)
+		if (self._array_size > 1) and (self._submit_concurrency > 1):
+			self._log.warning('Array jobs are submitted sequentially - "submit concurrency" is ignored')
+		self._submit_rate = config.get_float('submit rate', -1, on_change=None)
+		(self._submit_rate_lock, self._submit_rate_next) = (GCLock(), 0)
 
 	def parse_submit_output(self, data):
 		raise AbstractError
 
+	def submit_jobs(self, jobnum_list, task):
+		if self._array_size > 1:
+			return self._submit_jobs_array(jobnum_list, task)
+		if self._submit_concurrency <= 1:
+			return BasicWMS.submit_jobs(self, jobnum_list, task)
+		return self._submit_jobs_parallel(jobnum_list, task)
+
 	def _check_req(self, reqs, req, test=lambda x: x > 0):
 		if req in reqs:
 			return test(reqs[req])
 		return False
 
+	def _get_array_arguments(self, array_len):
+		return None  # returns additional submit arguments for array jobs (None: not supported)
+
+	def _get_array_job_name(self, job_name, array_len):
+		return job_name
+
+	def _get_array_wms_id(self, wms_id, array_idx):
+		raise AbstractError  # returns the WMS ID of the array task (array_idx starts at 1)
+
 	def _get_job_arguments(self, jobnum, sandbox):
 		raise AbstractError
 
@@ -113,6 +148,7 @@ class LocalWMS(BasicWMS):
 				imap(lambda fn: os.path.join(path, fn), os.listdir(path))))
 
 			yield (jobnum, path)
+		self._sandbox_helper.remove_array_lists()
 		activity.finish()
 
 	def _get_sandbox_file_list(self, task, sm_list):
@@ -124,19 +160,21 @@ class LocalWMS(BasicWMS):
 	def _get_submit_arguments(self, jobnum, job_name, reqs, sandbox, stdout, stderr):
 		raise AbstractError
 
-	def _get_submit_proc(self, jobnum, sandbox, job_name, reqs):
+	def _get_submit_proc(self, jobnum, sandbox, job_name, reqs, array_len=None):
 		(stdout, stderr) = (os.path.join(sandbox, 'gc.stdout'), os.path.join(sandbox, 'gc.stderr'))
 		submit_args = list(self._submit_opt_list)
+		if array_len is not None:  # sandbox is the sandbox list - gc-local.sh redirects the output
+			(stdout, stderr) = ('/dev/null', '/dev/null')
+			job_name = self._get_array_job_name(job_name, array_len)
+			submit_args.extend(shlex.split(self._get_array_arguments(array_len)))
 		submit_args.extend(shlex.split(self._get_submit_arguments(jobnum, job_name,
 			reqs, sandbox, stdout, stderr)))
 		submit_args.append(get_path_share('gc-local.sh'))
 		submit_args.extend(shlex.split(self._get_job_arguments(jobnum, sandbox)))
 		return LocalProcess(self._submit_exec, *submit_args)
 
-	def _submit_job(self, jobnum, task):
-		# Submit job and yield (jobnum, WMS ID, other data)
-		activity = Activity('submitting job %d' % jobnum)
-
+	def _prepare_job(self, jobnum, task):
+		# Create sandbox with job config and determine the job requirements (accesses the task)
 		try:
 			sandbox = tempfile.mkdtemp('', '%s.%04d.' % (task.get_description().task_id, jobnum),
 				self._sandbox_helper.get_path())
@@ -146,7 +184,7 @@ class LocalWMS(BasicWMS):
 
 		def _translate_target(desc, src, target):
 			return (desc, src, os.path.join(sb_prefix, target))
-		self._sm_sb_in.do_transfer(ismap(_translate_target, self._get_in_transfer_info_list(task)))
+		transfer_list = lsmap(_translate_target, self._get_in_transfer_info_list(task))
 
 		self._write_job_config(os.path.join(sandbox, '_jobconfig.sh'), jobnum, task, {
 			'GC_SANDBOX': sandbox, 'GC_SCRATCH_SEARCH': str.join(' ', self._scratch_path)})
@@ -156,6 +194,115 @@ class LocalWMS(BasicWMS):
 			reqs[WMS.MEMORY] = self._memory  # local jobs need higher (more realistic) memory requirements
 
 		job_name = task.get_description(jobnum).job_name
+		return (jobnum, sandbox, transfer_list, job_name, reqs)
+
+	def _submit_job(self, jobnum, task):
+		# Submit job and yield (jobnum, WMS ID, other data)
+		return self._submit_prepared_job(*self._prepare_job(jobnum, task))
+
+	def _submit_jobs_array(self, jobnum_list, task):
+		# Jobs with identical requirements are collected and submitted as array jobs
+		# with up to <array size> tasks
+		map_reqs2prepared_list = {}
+		for jobnum in jobnum_list:
+			if abort():
+				break
+			prepared = self._prepare_job(jobnum, task)
+			reqs_key = repr(sorted(prepared[-1].items()))
+			map_reqs2prepared_list.setdefault(reqs_key, []).append(prepared)
+			if (len(map_reqs2prepared_list[reqs_key]) >= self._array_size) and not abort():
+				for result in self._submit_prepared_array(map_reqs2prepared_list.pop(reqs_key)):
+					yield result
+		if abort():  # the jobs of incomplete array jobs are not submitted after an abort
+			for prepared_list in map_reqs2prepared_list.values():
+				for (_, sandbox, _, _, _) in prepared_list:
+					shutil.rmtree(sandbox, ignore_errors=True)
+			return
+		for reqs_key in sorted(map_reqs2prepared_list):
+			for result in self._submit_prepared_array(map_reqs2prepared_list[reqs_key]):
+				yield result
+
+	def _submit_jobs_parallel(self, jobnum_list, task):
+		# The jobs are prepared in the current thread, while the sandbox transfer and the submission
+		# itself is done by up to <submit concurrency> threads - results are yielded when available
+		(result_queue, pending) = (GCQueue(), 0)
+
+		def _submit_thread(*args):
+			result = (args[0], None, {'sandbox': args[1]})
+			try:
+				result = self._submit_prepared_job(*args)
+			except Exception:
+				self._log.exception('Unable to submit job %d', args[0])
+				clear_current_exception()
+			result_queue.put(result)
+
+		try:
+			for jobnum in jobnum_list:
+				if abort():
+					break
+				start_daemon('submitting job %d' % jobnum, _submit_thread, *self._prepare_job(jobnum, task))
+				pending += 1
+				while pending >= self._submit_concurrency:
+					yield result_queue.get(timeout=None)
+					pending -= 1
+		except Exception:  # jobs that are already submitted have to be reported before failing
+			error = BackendError('Unable to submit job %d' % jobnum)
+			while pending:
+				yield result_queue.get(timeout=None)
+				pending -= 1
+			raise error
+		while pending:
+			yield result_queue.get(timeout=None)
+			pending -= 1
+
+	def _submit_prepared_array(self, prepared_list):
+		# The array tasks select their sandbox from a list file with one sandbox per line
+		if len(prepared_list) == 1:
+			yield self._submit_prepared_job(*prepared_list[0])
+			return
+		activity = Activity('submitting array job with %d tasks' % len(prepared_list))
+		for (_, _, transfer_list, _, _) in prepared_list:
+			self._sm_sb_in.do_transfer(transfer_list)
+		# The list is only visible as *.list after it was completely written (see remove_array_lists)
+		(sandbox_list_fd, sandbox_list_fn_tmp) = tempfile.mkstemp('.tmp', 'array.',
+			self._sandbox_helper.get_path())
+		sandbox_list_fp = os.fdopen(sandbox_list_fd, 'w')
+		try:
+			sandbox_list_fp.write(str.join('', imap(lambda prepared: prepared[1] + '\n', prepared_list)))
+		finally:
+			sandbox_list_fp.close()
+		sandbox_list_fn = sandbox_list_fn_tmp[:-len('.tmp')] + '.list'
+		os.rename(sandbox_list_fn_tmp, sandbox_list_fn)
+		if self._submit_rate > 0:
+			time.sleep(with_lock(self._submit_rate_lock, self._wait_submit_rate))
+
+		(jobnum, _, _, job_name, reqs) = prepared_list[0]
+		proc = self._get_submit_proc(jobnum, sandbox_list_fn, job_name, reqs, len(prepared_list))
+		exit_code = proc.status(timeout=20, terminate=True)
+		wms_id_str = proc.stdout.read(timeout=0).strip().strip('\n')
+		wms_id = ignore_exception(Exception, None, self.parse_submit_output, wms_id_str)
+		activity.finish()
+
+		if exit_code != 0:
+			self._log.warning('%s failed:', self._submit_exec)
+		elif wms_id is None:
+			self._log.warning('%s did not yield job id:\n%s', self._submit_exec, wms_id_str)
+		if wms_id is None:
+			self._log.log_process(proc)
+			remove_files([sandbox_list_fn])
+		for (array_idx, (jobnum, sandbox, _, _, _)) in enumerate(prepared_list):
+			gc_id = None
+			if wms_id is not None:
+				gc_id = self._create_gc_id(self._get_array_wms_id(wms_id, array_idx + 1))
+				open(os.path.join(sandbox, gc_id), 'w')
+			yield (jobnum, gc_id, {'sandbox': sandbox})
+
+	def _submit_prepared_job(self, jobnum, sandbox, transfer_list, job_name, reqs):
+		activity = Activity('submitting job %d' % jobnum)
+		self._sm_sb_in.do_transfer(transfer_list)
+		if self._submit_rate > 0:  # delay submission according to the rate limit
+			time.sleep(with_lock(self._submit_rate_lock, self._wait_submit_rate))
+
 		proc = self._get_submit_proc(jobnum, sandbox, job_name, reqs)
 		exit_code = proc.status(timeout=20, terminate=True)
 		wms_id_str = proc.stdout.read(timeout=0).strip().strip('\n')
@@ -173,6 +320,13 @@ class LocalWMS(BasicWMS):
 			self._log.log_process(proc)
 		return (jobnum, gc_id, {'sandbox': sandbox})
 
+	def _wait_submit_rate(self):
+		# Return the time to wait before the next submission is allowed
+		t_now = time.time()
+		t_submit = max(t_now, self._submit_rate_next)
+		self._submit_rate_next = t_submit + 1. / self._submit_rate
+		return t_submit - t_now
+
 
 class LocalPurgeJobs(CancelJobs):
 	purge_lock = GCLock()
@@ -191,6 +345,7 @@ class LocalPurgeJobs(CancelJobs):
 				continue
 			with_lock(LocalPurgeJobs.purge_lock, _purge_directory, self._log, path, wms_id)
 			yield (wms_id,)
+		self._sandbox_helper.remove_array_lists()
 		activity.finish()
 
 
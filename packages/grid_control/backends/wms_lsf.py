@@ -13,7 +13,7 @@
 # | limitations under the License.
 
 from grid_control.backends.aspect_cancel import CancelJobsWithProcessBlind
-from grid_control.backends.aspect_status import CheckInfo, CheckJobsMissingState, CheckJobsWithProcess  # pylint:disable=line-too-long
+from grid_control.backends.aspect_status import CheckInfo, CheckJobsCached, CheckJobsMissingState, CheckJobsWithProcess  # pylint:disable=line-too-long
 from grid_control.backends.backend_tools import ProcessCreatorAppendArguments
 from grid_control.backends.wms import BackendError, WMS
 from grid_control.backends.wms_local import LocalWMS
@@ -53,6 +53,9 @@ class LSFCheckJobs(CheckJobsWithProcess):
 				tmp = line.split()
 				job_info = dict(izip(tmp_head, tmp[:7]))
 				job_info['submit_time'] = str.join(' ', tmp[7:10])
+				job_name = job_info.get('job_name', '')
+				if job_name.endswith(']') and ('[' in job_name):  # array task: <job name>[<array index>]
+					job_info[CheckInfo.WMSID] += '[%d]' % int(job_name.rsplit('[', 1)[1].rstrip(']'))
 				yield job_info
 			except Exception:
 				raise BackendError('Error reading job info:\n%s' % line)
@@ -65,12 +68,22 @@ class LSF(LocalWMS):
 		LocalWMS.__init__(self, config, name,
 			submit_exec=resolve_install_path('bsub'),
 			cancel_executor=LSFCancelJobs(config),
-			check_executor=CheckJobsMissingState(config, LSFCheckJobs(config)))
+			check_executor=CheckJobsMissingState(config,
+				CheckJobsCached(config, LSFCheckJobs(config), LSFCheckJobs(config))))
 
 	def parse_submit_output(self, data):
 		# Job <34020017> is submitted to queue <1nh>.
 		return data.split()[1].strip('<>').strip()
 
+	def _get_array_arguments(self, array_len):
+		return ''  # the array size is specified via the job name
+
+	def _get_array_job_name(self, job_name, array_len):
+		return '%s[1-%d]' % (job_name, array_len)
+
+	def _get_array_wms_id(self, wms_id, array_idx):
+		return '%s[%d]' % (wms_id, array_idx)
+
 	def _get_job_arguments(self, jobnum, sandbox):
 		return repr(sandbox)
 
@@ -108,6 +108,10 @@ class PBS(PBSGECommon):  # pylint:disable=too-many-ancestors
 		# 1667161.ekpplusctl.ekpplus.cluster
 		return data.split('.')[0].strip()
 
+	def _get_array_wms_id(self, wms_id, array_idx):
+		# 1667161[].ekpplusctl.ekpplus.cluster -> 1667161[<array index>]
+		return '%s[%d]' % (wms_id.rstrip('[]'), array_idx)
+
 	def _fqid(self, wms_id):
 		if not self._server:
 			return wms_id
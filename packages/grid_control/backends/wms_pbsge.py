@@ -29,6 +29,9 @@ class PBSGECommon(LocalWMS):
 		self._software_req_lookup = config.get_lookup('software requirement map', {},
 			single=False, on_change=None)
 
+	def _get_array_arguments(self, array_len):
+		return ' -t 1-%d' % array_len
+
 	def _get_common_submit_arguments(self, jobnum, job_name, reqs, sandbox, stdout, stderr, req_map):
 		# Job name
 		params = ' -N "%s"' % job_name
@@ -12,21 +12,22 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
+import time
 from grid_control.backends.aspect_cancel import CancelJobsWithProcessBlind
-from grid_control.backends.aspect_status import CheckInfo, CheckJobsMissingState, CheckJobsWithProcess  # pylint:disable=line-too-long
-from grid_control.backends.backend_tools import ProcessCreatorAppendArguments
+from grid_control.backends.aspect_status import CheckInfo, CheckJobsCached, CheckJobsMissingState, CheckJobsWithProcess  # pylint:disable=line-too-long
+from grid_control.backends.backend_tools import ProcessCreatorAppendArguments, ProcessCreatorViaArguments, iter_array_index  # pylint:disable=line-too-long
 from grid_control.backends.wms import BackendError, WMS
 from grid_control.backends.wms_local import LocalWMS
 from grid_control.job_db import Job
-from grid_control.utils import resolve_install_path
+from grid_control.utils import get_local_username, resolve_install_path
 from hpfwk import clear_current_exception
-from python_compat import identity, ifilter
+from python_compat import identity, ifilter, lmap
 
 
 class SLURMCheckJobs(CheckJobsWithProcess):
-	def __init__(self, config):
-		proc_factory = ProcessCreatorAppendArguments(config,
-			'sacct', ['-n', '-o', 'jobid,partition,state,exitcode', '-j'],
+	def __init__(self, config, proc_factory=None):
+		proc_factory = proc_factory or ProcessCreatorAppendArguments(config,
+			'sacct', ['-n', '-o', 'jobid%50,partition,state,exitcode', '-j'],
 			lambda wms_id_list: [str.join(',', wms_id_list)])
 		CheckJobsWithProcess.__init__(self, config, proc_factory, status_map={
 			Job.ABORTED: ['CANCELLED+', 'NODE_FAIL', 'CANCELLED', 'FAILED'],
@@ -40,12 +41,35 @@ class SLURMCheckJobs(CheckJobsWithProcess):
 			if 'error' in line.lower():
 				raise BackendError('Unable to parse status line %s' % repr(line))
 			tmp = line.split()
-			try:
-				wms_id = str(int(tmp[0]))
-			except Exception:
+			try:  # array tasks are reported as <job id>_<array index> or <job id>_[<array range>]
+				(job_id, array_spec) = (tmp[0].split('_', 1) + [None])[:2]
+				wms_id_list = [str(int(job_id))]
+				if array_spec is not None:
+					wms_id_list = lmap(lambda array_idx: '%s_%d' % (wms_id_list[0], array_idx),
+						iter_array_index(array_spec))
+			except Exception:  # skip job steps like <job id>.batch
 				clear_current_exception()
 				continue
-			yield {CheckInfo.WMSID: wms_id, CheckInfo.RAW_STATUS: tmp[2], CheckInfo.QUEUE: tmp[1]}
+			for wms_id in wms_id_list:
+				yield {CheckInfo.WMSID: wms_id, CheckInfo.RAW_STATUS: tmp[2], CheckInfo.QUEUE: tmp[1]}
+
+
+class SLURMCheckJobsTableProcessCreator(ProcessCreatorViaArguments):
+	# Query the status of all jobs of the user that were active since the previous query
+	def __init__(self, config):
+		ProcessCreatorViaArguments.__init__(self, config)
+		self._cmd = resolve_install_path('sacct')
+		self._user = config.get('user', get_local_username(), on_change=None)
+		self._time_last = None
+
+	def _arguments(self, wms_id_list):
+		args = [self._cmd, '-n', '-o', 'jobid%50,partition,state,exitcode']
+		if self._user:
+			args.extend(['-u', self._user])
+		if self._time_last is not None:  # allow for some clock difference to the slurm controller
+			args.extend(['-S', time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._time_last - 60))])
+		self._time_last = time.time()
+		return args
 
 
 class SLURM(LocalWMS):
@@ -54,13 +78,20 @@ class SLURM(LocalWMS):
 	def __init__(self, config, name):
 		LocalWMS.__init__(self, config, name,
 			submit_exec=resolve_install_path('sbatch'),
-			check_executor=CheckJobsMissingState(config, SLURMCheckJobs(config)),
+			check_executor=CheckJobsMissingState(config, CheckJobsCached(config, SLURMCheckJobs(config),
+				SLURMCheckJobs(config, SLURMCheckJobsTableProcessCreator(config)), incremental=True)),
 			cancel_executor=CancelJobsWithProcessBlind(config, 'scancel', unknown_id='not in queue !'))
 
 	def parse_submit_output(self, data):
 		# job_submit: Job 121195 has been submitted.
 		return int(data.split()[3].strip())
 
+	def _get_array_arguments(self, array_len):
+		return ' --array=1-%d' % array_len
+
+	def _get_array_wms_id(self, wms_id, array_idx):
+		return '%s_%d' % (wms_id, array_idx)
+
 	def _get_job_arguments(self, jobnum, sandbox):
 		return repr(sandbox)
 
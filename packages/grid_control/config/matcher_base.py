@@ -17,8 +17,8 @@ from grid_control.config.config_entry import join_config_locations
 from grid_control.gc_plugin import ConfigurablePlugin
 from grid_control.utils.data_structures import make_enum
 from grid_control.utils.parsing import str_dict_linear
-from hpfwk import AbstractError, Plugin
-from python_compat import lfilter, sorted, unspecified
+from hpfwk import AbstractError, Plugin, clear_current_exception
+from python_compat import imap, irange, lfilter, lmap, sorted, unspecified
 
 
 ListOrder = make_enum(['source', 'matcher'])  # pylint: disable=invalid-name
@@ -42,6 +42,29 @@ class MatcherHolder(object):
 		pass
 
 
+class MatcherIndex(object):
+	# Index to find the positions of all selectors in a list, which match a given value.
+	# Selectors given as None match any value. This default implementation simply evaluates
+	# the matcher of each selector - matchers are compiled on first use
+	def __init__(self, matcher, selector_list):
+		(self._matcher, self._selector_list, self._map_idx2match_obj) = (matcher, selector_list, {})
+
+	def is_match(self, idx, value):
+		if self._selector_list[idx] is None:
+			return True
+		match_obj = self._map_idx2match_obj.get(idx)
+		if match_obj is None:
+			match_obj = self._matcher.create_matcher(self._selector_list[idx])
+			self._map_idx2match_obj[idx] = match_obj
+		return match_obj.match(value) > 0
+
+	def iter_match_idx(self, value):
+		# yields the positions of all matching selectors in ascending order
+		for idx in irange(len(self._selector_list)):
+			if self.is_match(idx, value):
+				yield idx
+
+
 class Matcher(ConfigurablePlugin):
 	def __init__(self, config, option_prefix, case_override=None, **kwargs):
 		ConfigurablePlugin.__init__(self, config)
@@ -65,6 +88,9 @@ class Matcher(ConfigurablePlugin):
 				return matcher(value, _get_case(self._case, self._selector))
 		return _get_fixed_matcher_object(self, FunctionObject, selector, self._case)
 
+	def create_index(self, selector_list):
+		return MatcherIndex(self, selector_list)
+
 	def get_positive_selector(self, selector):
 		raise AbstractError
 
@@ -257,6 +283,9 @@ class RegExMatcher(Matcher):
 		selector_case = _get_case(self._case_regex, selector)
 		return _get_fixed_matcher_object(self, FunctionObject, selector_case, self._case)
 
+	def create_index(self, selector_list):
+		return RegExMatcherIndex(self, selector_list, self._case, self._case_regex)
+
 	def get_positive_selector(self, selector):
 		return None
 
@@ -289,6 +318,84 @@ class WeakListFilter(ListFilter):
 		return lfilter(lambda entry: match_function(entry) >= 0, entries)
 
 
+class EqualMatcherIndex(MatcherIndex):
+	# Hash map of the selectors
+	def __init__(self, matcher, selector_list, case):
+		MatcherIndex.__init__(self, matcher, selector_list)
+		(self._case, self._map_selector2idx_list, self._wildcard_idx_list) = (case, {}, [])
+		for (idx, selector) in enumerate(selector_list):
+			if selector is None:
+				self._wildcard_idx_list.append(idx)
+			else:
+				self._map_selector2idx_list.setdefault(_get_case(case, selector), []).append(idx)
+		for (selector, idx_list) in self._map_selector2idx_list.items():
+			self._map_selector2idx_list[selector] = sorted(idx_list + self._wildcard_idx_list)
+
+	def iter_match_idx(self, value):
+		if not isinstance(value, str):  # errors are reported by the matcher
+			return MatcherIndex.iter_match_idx(self, value)
+		return iter(self._map_selector2idx_list.get(_get_case(self._case, value),
+			self._wildcard_idx_list))
+
+
+class RegExMatcherIndex(MatcherIndex):
+	# The first matching selector is found with a single combined expression, which tests
+	# the selectors in order - the remaining selectors are evaluated individually
+	def __init__(self, matcher, selector_list, case, case_regex):
+		MatcherIndex.__init__(self, matcher, selector_list)
+		(self._case, self._regex_list) = (case, None)
+		expr_list = lmap(lambda selector: _get_case(case_regex, selector or ''), selector_list)
+
+		def _get_group_expr(idx):
+			return r'(?=[\s\S]*?(?:%s))(?P<idx%d>)' % (expr_list[idx], idx)
+		try:  # expressions with groups are not combined - group references would be shifted
+			if not lfilter(lambda expr: re.compile(expr).groups, expr_list):
+				self._regex_list = lmap(lambda idx_start: re.compile(str.join('|', imap(_get_group_expr,
+					irange(idx_start, min(idx_start + 50, len(expr_list)))))),
+					irange(0, len(expr_list), 50))  # limit number of groups per expression
+		except re.error:  # invalid expressions are reported by the matcher
+			clear_current_exception()
+
+	def iter_match_idx(self, value):
+		if (self._regex_list is None) or not isinstance(value, str):
+			for idx in MatcherIndex.iter_match_idx(self, value):
+				yield idx
+			return
+		value_case = _get_case(self._case, value)
+		for regex in self._regex_list:
+			match = regex.match(value_case)
+			if match:
+				idx_first = int(match.lastgroup[3:])
+				yield idx_first
+				for idx in irange(idx_first + 1, len(self._selector_list)):
+					if self.is_match(idx, value):
+						yield idx
+				return
+
+
+class StartMatcherIndex(MatcherIndex):
+	# Prefix tree of the selectors
+	def __init__(self, matcher, selector_list, case):
+		MatcherIndex.__init__(self, matcher, selector_list)
+		(self._case, self._root) = (case, ({}, []))
+		for (idx, selector) in enumerate(selector_list):
+			node = self._root
+			for char in _get_case(case, selector or ''):
+				node = node[0].setdefault(char, ({}, []))
+			node[1].append(idx)
+
+	def iter_match_idx(self, value):
+		if not isinstance(value, str):  # errors are reported by the matcher
+			return MatcherIndex.iter_match_idx(self, value)
+		(node, result) = (self._root, list(self._root[1]))
+		for char in _get_case(self._case, value):
+			node = node[0].get(char)
+			if node is None:
+				break
+			result.extend(node[1])
+		return iter(sorted(result))
+
+
 class EndMatcher(BaseMatcher):
 	alias_list = ['end']
 	match_function = str.endswith
@@ -298,6 +405,9 @@ class EqualMatcher(BaseMatcher):
 	alias_list = ['equal']
 	match_function = str.__eq__
 
+	def create_index(self, selector_list):
+		return EqualMatcherIndex(self, selector_list, self._case)
+
 
 class ShellStyleMatcher(BaseMatcher):
 	alias_list = ['shell']
@@ -308,6 +418,9 @@ class StartMatcher(BaseMatcher):
 	alias_list = ['start']
 	match_function = str.startswith
 
+	def create_index(self, selector_list):
+		return StartMatcherIndex(self, selector_list, self._case)
+
 
 def _get_case(case, value):
 	if not case:
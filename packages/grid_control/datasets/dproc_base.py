@@ -12,12 +12,17 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import logging
+import sys, time, logging, threading
 from grid_control.config import join_config_locations
 from grid_control.gc_plugin import ConfigurablePlugin
 from grid_control.utils import prune_processors
-from hpfwk import AbstractError, NestedException
-from python_compat import imap
+from grid_control.utils.algos import accumulate
+from hpfwk import AbstractError, NestedException, format_exception, get_thread_name, ignore_exception  # pylint:disable=line-too-long
+from python_compat import imap, lmap, next
+
+
+multiprocessing = ignore_exception(Exception, None, __import__, 'multiprocessing')  # >= py-2.6
+_WORKER_STAGE_LIST = []  # stages of the forked worker processes
 
 
 class DataProcessorError(NestedException):
@@ -43,6 +48,10 @@ class DataProcessor(ConfigurablePlugin):
 	def enabled(self):
 		return self._enabled() and not self._disabled
 
+	def is_parallel_safe(self):
+		# Processors without state across blocks can be run on chunks of blocks in worker processes
+		return False
+
 	def must_complete_for_partition(self):
 		return False
 
@@ -82,6 +91,9 @@ class MultiDataProcessor(DataProcessor):
 		self._do_prune = config.get_bool(self._get_dproc_opt('processor prune'), True)
 		self._processor_list = prune_processors(self._do_prune, processor_list,
 			self._log, 'Removed %d inactive dataset processors!')
+		self._worker_max = config.get_int(self._get_dproc_opt('processor workers'), 1, on_change=None)
+		self._chunk_size = config.get_int(self._get_dproc_opt('processor chunk size'), 10,
+			on_change=None)
 
 	def __repr__(self):
 		return str.join(' => ', imap(repr, self._processor_list))
@@ -92,13 +104,73 @@ class MultiDataProcessor(DataProcessor):
 		self._processor_list = prune_processors(self._do_prune, self._processor_list,
 			self._log, 'Removed %d singleton dataset processors!')
 
+	def is_parallel_safe(self):
+		return False not in imap(lambda dp: dp.is_parallel_safe(), self._processor_list)
+
 	def must_complete_for_partition(self):
 		return True in imap(lambda dp: dp.must_complete_for_partition(), self._processor_list)
 
 	def process(self, block_iter):
+		# Consecutive parallel-safe processors are grouped into stages, which are run by a pool of
+		# worker processes - all other processors are applied in order in the current process.
+		# The pool is created right away - before the block source can start any provider threads
+		stage_list = self._get_stage_list()
+		pool = None
+		if True in imap(lambda stage: stage[1], stage_list):
+			pool = _create_pool(self._worker_max, stage_list)
+		time_list = None
+		if self._log.isEnabledFor(logging.INFO2):  # cumulative time spent in the source and each stage
+			time_list = [0] * (len(stage_list) + 1)
+			block_iter = _iter_timed(block_iter, time_list, 0)
+		try:
+			for (stage_idx, (stage_processor_list, parallel)) in enumerate(stage_list):
+				if parallel:
+					block_iter = _iter_blocks_parallel(pool, stage_idx, block_iter,
+						self._chunk_size, 2 * self._worker_max)
+				else:
+					for processor in stage_processor_list:
+						block_iter = processor.process(block_iter)
+				if time_list is not None:
+					block_iter = _iter_timed(block_iter, time_list, stage_idx + 1)
+		except Exception:
+			_finish_pool(pool)
+			raise
+		return self._iter_blocks_pooled(block_iter, pool, stage_list, time_list)
+
+	def _get_stage_list(self):
+		# Returns list of (processor list, parallel flag) - parallel stages are only used with workers
+		use_workers = (self._worker_max > 1) and (multiprocessing is not None)
+		if use_workers and not _is_fork_safe():
+			self._log.debug('Dataset processors are not run by workers while provider threads are alive')
+			use_workers = False
+		stage_list = []
 		for processor in self._processor_list:
-			block_iter = processor.process(block_iter)
-		return block_iter
+			parallel = use_workers and processor.is_parallel_safe()
+			if parallel and stage_list and stage_list[-1][1]:
+				stage_list[-1][0].append(processor)
+			else:
+				stage_list.append(([processor], parallel))
+		return stage_list
+
+	def _iter_blocks_pooled(self, block_iter, pool, stage_list, time_list):
+		try:  # old python versions can't use finally
+			for block in block_iter:
+				yield block
+		except:  # the workers are also terminated if the consumer stops early (GeneratorExit)
+			_finish_pool(pool)
+			raise
+		_finish_pool(pool)
+		if time_list is not None:
+			self._show_stage_time(stage_list, time_list)
+
+	def _show_stage_time(self, stage_list, time_list):
+		self._log.log(logging.INFO2, 'Time spent in dataset processors:')
+		for (stage_idx, (stage_processor_list, parallel)) in enumerate(stage_list):
+			stage_desc = str.join(' + ', imap(repr, stage_processor_list))
+			if parallel:
+				stage_desc += ' (%d workers)' % self._worker_max
+			self._log.log(logging.INFO2, '\t%7.3fs %s',
+				time_list[stage_idx + 1] - time_list[stage_idx], stage_desc)
 
 
 class NullDataProcessor(DataProcessor):
@@ -107,5 +179,81 @@ class NullDataProcessor(DataProcessor):
 	def __init__(self, config=None, datasource_name=None):
 		DataProcessor.__init__(self, config, datasource_name)
 
+	def is_parallel_safe(self):
+		return True
+
 	def process_block(self, block):
 		return block
+
+
+def _create_pool(worker_max, stage_list):
+	# The worker processes are forked - so the processors are not pickled but inherited
+	context = multiprocessing
+	if hasattr(multiprocessing, 'get_context'):
+		context = multiprocessing.get_context('fork')
+	return context.Pool(worker_max, _init_worker, (lmap(lambda stage: stage[0], stage_list),))
+
+
+def _finish_pool(pool):
+	if pool is not None:
+		pool.terminate()
+		pool.join()
+
+
+def _get_chunk_result(result):
+	(success, value) = result.get()
+	if not success:
+		raise DataProcessorError('Error while processing dataset blocks in worker process:\n' + value)
+	return value
+
+
+def _init_worker(stage_processor_list_list):
+	global _WORKER_STAGE_LIST  # pylint:disable=global-statement
+	_WORKER_STAGE_LIST = stage_processor_list_list
+
+
+def _is_fork_safe():
+	# Worker processes are only forked from the main thread while no provider threads are running
+	if get_thread_name() != 'MainThread':
+		return False
+	for thread in threading.enumerate():
+		if str(getattr(thread, 'desc', '')).startswith('tchain generator thread'):
+			return False
+	return True
+
+
+def _iter_blocks_parallel(pool, stage_idx, block_iter, chunk_size, chunk_queue_max):
+	# Chunks of blocks are processed asynchronously - results are returned in the original order
+	chunk_iter = accumulate(block_iter, [], lambda block, buffer: len(buffer) >= chunk_size,
+		add_fun=lambda buffer, block: buffer + [block])
+	result_queue = []
+	for chunk in chunk_iter:
+		result_queue.append(pool.apply_async(_process_chunk, ((stage_idx, chunk),)))
+		while len(result_queue) >= chunk_queue_max:
+			for block in _get_chunk_result(result_queue.pop(0)):
+				yield block
+	while result_queue:
+		for block in _get_chunk_result(result_queue.pop(0)):
+			yield block
+
+
+def _iter_timed(block_iter, time_list, stage_idx):
+	block_iter = iter(block_iter)
+	while True:
+		time_start = time.time()
+		block = next(block_iter, None)
+		time_list[stage_idx] += time.time() - time_start
+		if block is None:
+			break
+		yield block
+
+
+def _process_chunk(stage_idx_chunk):
+	(stage_idx, block_iter) = stage_idx_chunk
+	try:
+		for processor in _WORKER_STAGE_LIST[stage_idx]:
+			block_iter = processor.process(block_iter)
+		return (True, list(block_iter))
+	except Exception:  # exceptions with nested exceptions can not be pickled
+		return (False, format_exception(sys.exc_info(), show_threads=0))
+
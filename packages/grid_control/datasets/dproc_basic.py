@@ -88,6 +88,9 @@ class LocationDataProcessor(DataProcessor):
 		self._location_filter = config.get_filter(self._get_dproc_opt('location filter'), '',
 			default_matcher='BlackWhiteMatcher', default_filter='StrictListFilter')
 
+	def is_parallel_safe(self):
+		return True
+
 	def process_block(self, block):
 		if block[DataProvider.Locations] is not None:
 			sites = self._location_filter.filter_list(block[DataProvider.Locations])
@@ -158,6 +161,9 @@ class URLDataProcessor(DataProcessor):
 			filter_parser=lambda value: self._parse_filter(config, value),
 			filter_str=lambda value: str.join('\n', value.split()))
 
+	def is_parallel_safe(self):
+		return True
+
 	def process_block(self, block):
 		if self.enabled():
 			block[DataProvider.FileList] = self._url_filter.filter_list(block[DataProvider.FileList],
@@ -39,6 +39,9 @@ class EntriesConsistencyDataProcessor(BaseConsistencyProcessor):
 		self._mode = config.get_enum(self._get_dproc_opt('check entry consistency'),
 			DatasetCheckMode, DatasetCheckMode.abort)
 
+	def is_parallel_safe(self):
+		return True
+
 	def process_block(self, block):
 		# Check entry consistency
 		events = sum(imap(itemgetter(DataProvider.NEntries), block[DataProvider.FileList]))
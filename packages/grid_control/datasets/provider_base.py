@@ -12,17 +12,32 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, copy, logging
+import os, copy, mmap, zlib, logging
 from grid_control.config import TriggerResync, create_config
 from grid_control.datasets.dproc_base import DataProcessor, NullDataProcessor
 from grid_control.gc_plugin import ConfigurablePlugin
 from grid_control.utils import abort, ensure_dir_exists
 from grid_control.utils.activity import Activity
-from grid_control.utils.algos import get_list_difference, split_list
+from grid_control.utils.algos import decode_columns, encode_columns, split_list
 from grid_control.utils.data_structures import make_enum
 from grid_control.utils.file_tools import SafeFile, erase_content, with_file_iter
-from hpfwk import AbstractError, InstanceFactory, NestedException
-from python_compat import StringBuffer, identity, ifilter, imap, irange, itemgetter, json, lmap, lrange, md5_hex, set, sort_inplace  # pylint:disable=line-too-long
+from grid_control.utils.parsing import parse_json
+from hpfwk import AbstractError, InstanceFactory, NestedException, clear_current_exception, ignore_exception  # pylint:disable=line-too-long
+from python_compat import StringBuffer, Struct, bytes2str, identity, ifilter, imap, irange, itemgetter, izip, json, lfilter, lmap, md5_hex, set, sort_inplace, str2bytes  # pylint:disable=line-too-long
+
+
+# Layout of the binary dataset file (all integers are stored in big-endian byte order):
+#   <magic> <block records> <block index> <string table> <trailer>
+# block record: zlib compressed json list [<nickname>, <entries>, <locations>, <metadata keys>,
+#   <metadata columns>, <file list>] with the file list entries [<url prefix>, <url remainder>,
+#   <entries>] - the file metadata is stored column-wise (see encode_columns)
+#   - nickname, locations, metadata keys and url prefixes are given as ids in the string table
+# block index: <number of blocks> entries (position, length, dataset id, block name id + 1)
+# string table: zlib compressed json list of strings
+# trailer: number of blocks, position of the block index, length of the string table
+_BINARY_MAGIC = str2bytes('GCDSET01')
+_BINARY_INDEX_ENTRY = Struct('>QIII')
+_BINARY_TRAILER = Struct('>QQQ')
 
 
 class DatasetError(NestedException):
@@ -42,6 +57,12 @@ class DataProvider(ConfigurablePlugin):
 		(self._cache_block, self._cache_dataset) = (None, None)
 		self._dataset_query_interval = config.get_time(
 			'%s default query interval' % datasource_name, 60, on_change=None)
+		# The raw blocks are stored together with validity tokens in the work directory
+		(self._block_cache_fn, self._block_cache_old, self._block_cache_token_dict) = (None, {}, {})
+		if config.get_bool(['provider cache', '%s provider cache' % datasource_name], True,
+				on_change=None):
+			self._block_cache_fn = config.get_work_path('provider_cache', '%s.dat' % md5_hex(repr(
+				(self.__class__.__name__, dataset_expr, dataset_nick, DataProvider.enum_name_list))))
 
 		self._stats = dataset_proc or DataProcessor.create_instance('SimpleStatsDataProcessor',
 			config, datasource_name, self._log,
@@ -104,6 +125,39 @@ class DataProvider(ConfigurablePlugin):
 		# Define how often the dataprovider can be queried automatically
 		return self._dataset_query_interval
 
+	def is_binary_file(path):
+		return ignore_exception(Exception, None, _read_magic, path) == _BINARY_MAGIC
+	is_binary_file = staticmethod(is_binary_file)
+
+	def iter_blocks_from_binary(path, block_id_filter=None):
+		# Blocks are read from the memory mapped file - only the blocks with a block id accepted by
+		# the filter are decompressed and parsed
+		try:
+			fp = open(path, 'rb')
+			try:
+				data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+			finally:
+				fp.close()
+			if data[:len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+				raise DatasetError('Invalid file header')
+			(block_len, index_pos, str_table_len) = _BINARY_TRAILER.unpack_from(data,
+				len(data) - _BINARY_TRAILER.size)
+			str_table_pos = index_pos + block_len * _BINARY_INDEX_ENTRY.size
+			str_list = parse_json(bytes2str(zlib.decompress(
+				data[str_table_pos:str_table_pos + str_table_len])))
+		except Exception:
+			raise DatasetError('Unable to read binary dataset file %s' % repr(path))
+		for block_idx in irange(block_len):
+			(pos, length, dataset_sidx, block_name_sidx) = _BINARY_INDEX_ENTRY.unpack_from(data,
+				index_pos + block_idx * _BINARY_INDEX_ENTRY.size)
+			block = {DataProvider.Dataset: str_list[dataset_sidx]}
+			if block_name_sidx:
+				block[DataProvider.BlockName] = str_list[block_name_sidx - 1]
+			if block_id_filter and not block_id_filter(DataProvider.get_block_id(block)):
+				continue
+			yield _parse_binary_block(block, str_list, data[pos:pos + length])
+	iter_blocks_from_binary = staticmethod(iter_blocks_from_binary)
+
 	def iter_blocks_from_expr(cls, config, dataset_expr, dataset_proc=None):
 		for dp_factory in DataProvider.bind(dataset_expr, config=config):
 			dproc = dp_factory.create_instance_bound(dataset_proc=dataset_proc)
@@ -115,7 +169,7 @@ class DataProvider(ConfigurablePlugin):
 		activity = Activity('Retrieving %s' % self._dataset_expr)
 		try:
 			# Validation, Naming:
-			for block in self._iter_blocks_raw():
+			for block in self._iter_blocks_cached():
 				if not block.get(DataProvider.Dataset):
 					raise DatasetError('Block does not contain the dataset name!')
 				block.setdefault(DataProvider.BlockName, '0')
@@ -137,8 +191,9 @@ class DataProvider(ConfigurablePlugin):
 
 	def load_from_file(path):
 		# Load dataset information using ListProvider
+		config_dict = {'dataset': {'dataset processor': 'NullDataProcessor', 'provider cache': 'False'}}
 		return DataProvider.create_instance('ListProvider', create_config(load_old_config=False,
-			config_dict={'dataset': {'dataset processor': 'NullDataProcessor'}}), 'dataset', path)
+			config_dict=config_dict), 'dataset', path)
 	load_from_file = staticmethod(load_from_file)
 
 	def need_init_query(self):
@@ -180,42 +235,49 @@ class DataProvider(ConfigurablePlugin):
 		# Only the affected files are returned in the block file list
 		def _get_block_key(block):  # Compare different blocks according to their name - NOT full content
 			return (block[DataProvider.Dataset], block[DataProvider.BlockName])
-		sort_inplace(block_list_old, key=_get_block_key)
-		sort_inplace(block_list_new, key=_get_block_key)
-
-		def _handle_matching_block(block_list_added, block_list_missing, block_list_matching,
-				block_old, block_new):
-			# Compare different files according to their name - NOT full content
-			get_file_key = itemgetter(DataProvider.URL)
-			sort_inplace(block_old[DataProvider.FileList], key=get_file_key)
-			sort_inplace(block_new[DataProvider.FileList], key=get_file_key)
-
-			def _handle_matching_fi(fi_list_added, fi_list_missing, fi_list_matched, fi_old, fi_new):
-				fi_list_matched.append((fi_old, fi_new))
-
-			(fi_list_added, fi_list_missing, fi_list_matched) = get_list_difference(
-				block_old[DataProvider.FileList], block_new[DataProvider.FileList],
-				get_file_key, _handle_matching_fi, is_sorted=True)
+		map_block_key2block_old = {}
+		for block_old in block_list_old:
+			map_block_key2block_old[_get_block_key(block_old)] = block_old
+
+		def _get_block_list_key(block_list):
+			return _get_block_key(block_list[0])
+
+		(block_list_added, block_list_matching) = ([], [])
+		for block_new in block_list_new:  # blocks are joined via their name
+			block_old = map_block_key2block_old.pop(_get_block_key(block_new), None)
+			if block_old is None:
+				block_list_added.append(block_new)
+				continue
+			(fi_list_added, fi_list_missing, fi_list_matched) = _resync_fi_list(
+				block_old[DataProvider.FileList], block_new[DataProvider.FileList])
 			if fi_list_added:  # Create new block for added files in an existing block
 				block_added = copy.copy(block_new)
 				block_added[DataProvider.FileList] = fi_list_added
 				block_added[DataProvider.NEntries] = sum(imap(itemgetter(DataProvider.NEntries), fi_list_added))
 				block_list_added.append(block_added)
 			block_list_matching.append((block_old, block_new, fi_list_missing, fi_list_matched))
-
-		return get_list_difference(block_list_old, block_list_new,
-			_get_block_key, _handle_matching_block, is_sorted=True)
+		block_list_missing = list(map_block_key2block_old.values())
+		sort_inplace(block_list_added, key=_get_block_key)
+		sort_inplace(block_list_missing, key=_get_block_key)
+		sort_inplace(block_list_matching, key=_get_block_list_key)
+		return (block_list_added, block_list_missing, block_list_matching)
 	resync_blocks = staticmethod(resync_blocks)
 
-	def save_to_file(path, block_iter, strip_metadata=False):
-		for _ in DataProvider.save_to_file_iter(path, block_iter, strip_metadata):
+	def save_to_file(path, block_iter, strip_metadata=False, binary=None):
+		for _ in DataProvider.save_to_file_iter(path, block_iter, strip_metadata, binary):
 			pass
 	save_to_file = staticmethod(save_to_file)
 
-	def save_to_file_iter(path, block_iter, strip_metadata=False):
+	def save_to_file_iter(path, block_iter, strip_metadata=False, binary=None):
 		# Save dataset information in 'ini'-style => 10x faster to r/w than cPickle
+		# or in the binary format - by default, the format of an existing file is kept
 		if os.path.dirname(path):
 			ensure_dir_exists(os.path.dirname(path), 'dataset cache directory')
+		if binary is None:
+			binary = DataProvider.is_binary_file(path)
+		if binary:
+			return with_file_iter(SafeFile(path, 'wb'),
+				lambda fp: DataProvider.save_to_stream_binary(fp, block_iter, strip_metadata))
 		return with_file_iter(SafeFile(path, 'w'),
 			lambda fp: DataProvider.save_to_stream(fp, block_iter, strip_metadata))
 	save_to_file_iter = staticmethod(save_to_file_iter)
@@ -243,22 +305,25 @@ class DataProvider(ConfigurablePlugin):
 			else:
 				_formatter = identity
 
-			do_write_metadata = (DataProvider.Metadata in block) and not strip_metadata
-			if do_write_metadata:
-				def _get_metadata_str(fi, idx_list):
-					idx_list = ifilter(lambda idx: idx < len(fi[DataProvider.Metadata]), idx_list)
-					return json.dumps(lmap(lambda idx: fi[DataProvider.Metadata][idx], idx_list))
-				(metadata_idx_list_block, metadata_idx_list_file) = _split_metadata_idx_list(block)
+			fi_list = block[DataProvider.FileList]
+			metadata_str_list = None
+			if (DataProvider.Metadata in block) and not strip_metadata:
+				metadata_column_list = encode_columns(lmap(_get_fi_metadata, fi_list))
+				(metadata_idx_list_block, metadata_idx_list_file) = _split_metadata_idx_list(block,
+					metadata_column_list)
 				metadata_header_str = json.dumps(lmap(lambda idx: block[DataProvider.Metadata][idx],
 					metadata_idx_list_block + metadata_idx_list_file))
 				writer.write('metadata = %s\n' % metadata_header_str)
 				if metadata_idx_list_block:
-					metadata_str = _get_metadata_str(block[DataProvider.FileList][0], metadata_idx_list_block)
+					metadata_str = _get_metadata_str_list(metadata_column_list, metadata_idx_list_block, 1)[0]
 					writer.write('metadata common = %s\n' % metadata_str)
-			for fi in block[DataProvider.FileList]:
+				if metadata_idx_list_file:
+					metadata_str_list = _get_metadata_str_list(metadata_column_list,
+						metadata_idx_list_file, len(fi_list))
+			for (fi_idx, fi) in enumerate(fi_list):
 				writer.write('%s = %d' % (_formatter(fi[DataProvider.URL]), fi[DataProvider.NEntries]))
-				if do_write_metadata and metadata_idx_list_file:
-					writer.write(' %s' % _get_metadata_str(fi, metadata_idx_list_file))
+				if metadata_str_list:
+					writer.write(' %s' % metadata_str_list[fi_idx])
 				writer.write('\n')
 			stream.write(writer.getvalue())
 			erase_content(writer)
@@ -267,6 +332,52 @@ class DataProvider(ConfigurablePlugin):
 		writer.close()
 	save_to_stream = staticmethod(save_to_stream)
 
+	def save_to_stream_binary(stream, block_iter, strip_metadata=False):
+		(str_list, map_str2sidx, index_list, pos) = ([], {}, [], len(_BINARY_MAGIC))
+
+		def _get_sidx(value):  # strings are stored only once
+			sidx = map_str2sidx.get(value)
+			if sidx is None:
+				sidx = map_str2sidx[value] = len(str_list)
+				str_list.append(value)
+			return sidx
+
+		def _get_sidx_list(value_list):
+			if value_list is not None:
+				return lmap(_get_sidx, value_list)
+
+		stream.write(_BINARY_MAGIC)
+		for block in block_iter:
+			do_write_metadata = (DataProvider.Metadata in block) and not strip_metadata
+			fi_row_list = []
+			for fi in block[DataProvider.FileList]:
+				url = fi[DataProvider.URL]
+				url_sep_pos = url.rfind('/') + 1
+				fi_row_list.append([_get_sidx(url[:url_sep_pos]), url[url_sep_pos:],
+					fi[DataProvider.NEntries]])
+			nickname_sidx = None
+			if DataProvider.Nickname in block:
+				nickname_sidx = _get_sidx(block[DataProvider.Nickname])
+			(metadata_sidx_list, metadata_column_list) = (None, None)
+			if do_write_metadata:
+				metadata_sidx_list = _get_sidx_list(block[DataProvider.Metadata])
+				metadata_column_list = encode_columns(lmap(_get_fi_metadata, block[DataProvider.FileList]))
+			block_data = zlib.compress(str2bytes(json.dumps([nickname_sidx,
+				block.get(DataProvider.NEntries), _get_sidx_list(block.get(DataProvider.Locations)),
+				metadata_sidx_list, metadata_column_list, fi_row_list], separators=(',', ':'))))
+			block_name_sidx = 0
+			if DataProvider.BlockName in block:
+				block_name_sidx = _get_sidx(block[DataProvider.BlockName]) + 1
+			index_list.append(_BINARY_INDEX_ENTRY.pack(pos, len(block_data),
+				_get_sidx(block[DataProvider.Dataset]), block_name_sidx))
+			stream.write(block_data)
+			pos += len(block_data)
+			yield block
+		str_table_data = zlib.compress(str2bytes(json.dumps(str_list, separators=(',', ':'))))
+		stream.write(str2bytes('').join(index_list) + str_table_data +
+			_BINARY_TRAILER.pack(len(index_list), pos, len(str_table_data)))
+	save_to_stream_binary = staticmethod(save_to_stream_binary)
+
 	def _create_block_cache(self, show_stats, iter_fun):
 		def _iter_blocks():
 			for block in iter_fun():
@@ -287,6 +398,22 @@ class DataProvider(ConfigurablePlugin):
 		self._raise_on_abort()
 		return self._cache_block
 
+	def _get_block_cache_token(self):
+		# Token describing the state of the complete dataset (eg. modification time of a file) -
+		# the cached blocks are used without querying the dataset as long as the token is unchanged
+		return None
+
+	def _get_cached_block(self, block_id, block_token):
+		# Returns the raw block stored in the provider cache if its token is unchanged - otherwise
+		# the provider has to retrieve the block, which is then stored together with the new token
+		if (self._block_cache_fn is None) or (block_token is None):
+			return None
+		block_token = md5_hex(repr(block_token))
+		self._block_cache_token_dict[block_id] = block_token
+		(block_token_old, block_str) = self._block_cache_old.get(block_id, (None, None))
+		if block_token_old == block_token:
+			return _parse_cached_block(block_str)
+
 	def _get_dataset_hash(self):
 		buffer = StringBuffer()
 		for _ in DataProvider.save_to_stream(buffer, self.iter_blocks_normed()):
@@ -301,6 +428,35 @@ class DataProvider(ConfigurablePlugin):
 		#   Filelist: [{URL: '/path/to/file1', NEntries: 100}, {URL: '/path/to/file2', NEntries: 23}]}
 		raise AbstractError
 
+	def _iter_blocks_cached(self):
+		if self._block_cache_fn is None:
+			for block in self._iter_blocks_raw():
+				yield block
+			return
+		token = self._get_block_cache_token()
+		if token is not None:
+			token = md5_hex(repr(token))
+		(token_old, record_list) = _read_block_cache(self._block_cache_fn)
+		if (token is not None) and (token == token_old):
+			self._log.log(logging.INFO2, 'Using cached blocks of %s', repr(self._dataset_expr))
+			for (_, _, block_str) in record_list:
+				yield _parse_cached_block(block_str)
+			return
+
+		self._block_cache_old = dict(imap(lambda block_id_token_str: (block_id_token_str[0],
+			block_id_token_str[1:]), record_list))
+		self._block_cache_token_dict = {}
+		block_str_list = []
+		for block in self._iter_blocks_raw():  # blocks are serialized before any normalization
+			block_id = DataProvider.get_block_id(block)
+			if (token is not None) or (block_id in self._block_cache_token_dict):
+				block_str_list.append('%s\t%s\t%s\n' % (block_id,
+					self._block_cache_token_dict.get(block_id, '-'), _serialize_block(block)))
+			yield block
+		self._block_cache_old = {}
+		if (token is not None) or block_str_list:
+			_write_block_cache(self._block_cache_fn, token, block_str_list)
+
 	def _raise_on_abort(self):
 		if abort():
 			raise DatasetError('Received abort request during dataset retrieval')
@@ -310,19 +466,148 @@ make_enum(  # To uncover errors, the enums of DataProvider / DataSplitter do *NO
 	'Nickname', 'Metadata', 'Provider', 'Query'], DataProvider)
 
 
-def _split_metadata_idx_list(block):
-	def _get_metadata_hash(fi, idx):
-		if idx < len(fi[DataProvider.Metadata]):
-			return md5_hex(repr(fi[DataProvider.Metadata][idx]))
-	fi_list = block[DataProvider.FileList]
-	common_metadata_idx_list = lrange(len(block[DataProvider.Metadata]))
-	if fi_list:
-		common_metadata_hash_list = lmap(lambda idx: _get_metadata_hash(fi_list[0], idx),
-			common_metadata_idx_list)
-	for fi in fi_list:  # Identify common metadata
-		for idx in common_metadata_idx_list:
-			if _get_metadata_hash(fi, idx) != common_metadata_hash_list[idx]:
-				common_metadata_idx_list.remove(idx)
-	return split_list(irange(len(block[DataProvider.Metadata])),
-		fun=common_metadata_idx_list.__contains__,
+class _MatchedFileList(object):
+	# Read-only list of (fi_old, fi_new) tuples for two file lists with the same files
+	def __init__(self, fi_list_old, fi_list_new):
+		(self._fi_list_old, self._fi_list_new) = (fi_list_old, fi_list_new)
+
+	def __getitem__(self, idx):
+		return (self._fi_list_old[idx], self._fi_list_new[idx])
+
+	def __len__(self):
+		return len(self._fi_list_old)
+
+
+def _get_fi_metadata(fi):
+	return fi.get(DataProvider.Metadata, [])
+
+
+def _get_metadata_str_list(metadata_column_list, idx_list, fi_len):
+	# Returns the json encoded metadata of the selected columns for each file -
+	# each distinct metadata value is only encoded once
+	column_list = []
+	for idx in idx_list:
+		if idx < len(metadata_column_list):  # skip metadata, which is not set in any file
+			column = metadata_column_list[idx]
+			column_list.append([lmap(json.dumps, column[0])] + column[1:])
+	return lmap(lambda value_str_list: '[%s]' % str.join(', ', value_str_list),
+		decode_columns(column_list, fi_len))
+
+
+def _parse_binary_block(block, str_list, block_data):
+	(nickname_sidx, block_entries, location_sidx_list, metadata_sidx_list, metadata_column_list,
+		fi_row_list) = parse_json(bytes2str(zlib.decompress(block_data)))
+	if nickname_sidx is not None:
+		block[DataProvider.Nickname] = str_list[nickname_sidx]
+	if block_entries is not None:
+		block[DataProvider.NEntries] = block_entries
+	block[DataProvider.Locations] = None
+	if location_sidx_list is not None:
+		block[DataProvider.Locations] = lmap(str_list.__getitem__, location_sidx_list)
+	if metadata_sidx_list is not None:
+		block[DataProvider.Metadata] = lmap(str_list.__getitem__, metadata_sidx_list)
+	fi_list = block[DataProvider.FileList] = []
+	for fi_row in fi_row_list:
+		fi_list.append({DataProvider.URL: str_list[fi_row[0]] + fi_row[1],
+			DataProvider.NEntries: fi_row[2]})
+	if metadata_column_list:
+		for (fi, fi_metadata) in izip(fi_list, decode_columns(metadata_column_list, len(fi_list))):
+			if fi_metadata:
+				fi[DataProvider.Metadata] = fi_metadata
+	return block
+
+
+def _parse_cached_block(block_str):
+	def _parse_enum_dict(value):
+		return dict(imap(lambda key_value: (int(key_value[0]), key_value[1]), value.items()))
+
+	def _parse_fi(fi_row):
+		if isinstance(fi_row, dict):
+			return _parse_enum_dict(fi_row)
+		fi = {DataProvider.URL: fi_row[0], DataProvider.NEntries: fi_row[1]}
+		if len(fi_row) > 2:
+			fi[DataProvider.Metadata] = fi_row[2]
+		return fi
+	(block_info, fi_row_list) = parse_json(block_str)
+	block = _parse_enum_dict(block_info)
+	block[DataProvider.FileList] = lmap(_parse_fi, fi_row_list)
+	return block
+
+
+def _read_block_cache(fn):
+	# Returns the dataset token and the list of (block id, block token, serialized block)
+	if not os.path.exists(fn):
+		return (None, [])
+	fp = SafeFile(fn)
+	try:
+		line_list = fp.readlines()
+	finally:
+		fp.close()
+	if not line_list:
+		return (None, [])
+	return (line_list[0].strip(), lmap(lambda line: tuple(line.rstrip('\n').split('\t', 2)),
+		line_list[1:]))
+
+
+def _read_magic(path):
+	fp = open(path, 'rb')
+	try:
+		return fp.read(len(_BINARY_MAGIC))
+	finally:
+		fp.close()
+
+
+def _resync_fi_list(fi_list_old, fi_list_new):
+	# Compare different files according to their name - NOT full content
+	# The file lists of both blocks are sorted - and only compared file by file if they differ
+	get_file_key = itemgetter(DataProvider.URL)
+	sort_inplace(fi_list_old, key=get_file_key)
+	sort_inplace(fi_list_new, key=get_file_key)
+	if fi_list_old == fi_list_new:  # unchanged blocks are matched without creating any file pairs
+		return ([], [], _MatchedFileList(fi_list_old, fi_list_new))
+	map_url2fi_old = dict(izip(imap(get_file_key, fi_list_old), fi_list_old))
+	(fi_list_added, fi_list_matched) = ([], [])
+	for fi_new in fi_list_new:
+		fi_old = map_url2fi_old.pop(fi_new[DataProvider.URL], None)
+		if fi_old is None:
+			fi_list_added.append(fi_new)
+		else:
+			fi_list_matched.append((fi_old, fi_new))
+	fi_list_missing = lfilter(lambda fi: fi[DataProvider.URL] in map_url2fi_old, fi_list_old)
+	return (fi_list_added, fi_list_missing, fi_list_matched)
+
+
+def _serialize_block(block):
+	# The file infos are stored as [<URL>, <entries>(, <metadata>)] - unless they contain other keys
+	def _get_fi_row(fi):
+		fi_row = [fi[DataProvider.URL], fi[DataProvider.NEntries]]
+		if DataProvider.Metadata in fi:
+			fi_row.append(fi[DataProvider.Metadata])
+		if len(fi_row) != len(fi):
+			return fi
+		return fi_row
+	block_info = dict(block)
+	fi_list = block_info.pop(DataProvider.FileList)
+	return json.dumps([block_info, lmap(_get_fi_row, fi_list)])
+
+
+def _split_metadata_idx_list(block, metadata_column_list):
+	# Metadata with the same value in all files of the block is common metadata
+	def _is_common_metadata(idx):
+		if idx < len(metadata_column_list):
+			return (len(metadata_column_list[idx]) == 1) and (len(metadata_column_list[idx][0]) == 1)
+		return True  # metadata is not set in any file
+	return split_list(irange(len(block[DataProvider.Metadata])), fun=_is_common_metadata,
 		sort_key=lambda idx: block[DataProvider.Metadata][idx])
+
+
+def _write_block_cache(fn, token, block_str_list):
+	if not os.path.exists(os.path.dirname(os.path.dirname(fn))):
+		return  # the cache is only used with an existing work directory
+	try:  # providers are queried in parallel by ThreadedMultiDatasetProvider
+		ensure_dir_exists(os.path.dirname(fn), 'dataset provider cache directory')
+	except Exception:
+		if not os.path.isdir(os.path.dirname(fn)):
+			raise
+		clear_current_exception()
+	SafeFile(fn, 'w').write_close(str.join('', [(token or '-') + '\n'] + block_str_list))
@@ -12,12 +12,13 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
+import os
 from grid_control.config import ConfigError
 from grid_control.datasets.provider_base import DataProvider, DatasetError
 from grid_control.utils import split_opt
 from grid_control.utils.file_tools import SafeFile
 from grid_control.utils.parsing import parse_json, parse_list
-from python_compat import lmap, rsplit
+from python_compat import itemgetter, lmap, rsplit
 
 
 class FileProvider(DataProvider):
@@ -66,6 +67,18 @@ class ListProvider(DataProvider):
 		(path, self._forced_prefix, self._filter) = split_opt(dataset_expr, '@%')
 		self._filename = config.resolve_path(path, True, 'Error resolving dataset file: %s' % path)
 
+	def _apply_forced_prefix(self, block):
+		# Same url handling as for dataset files in 'ini'-style, which store the common prefix
+		fi_list = block[DataProvider.FileList]
+		common_prefix = os.path.commonprefix(lmap(itemgetter(DataProvider.URL), fi_list))
+		common_prefix = str.join('/', common_prefix.split('/')[:-1])
+		for fi in fi_list:
+			url = fi[DataProvider.URL]
+			if len(common_prefix) > 6:
+				url = url.replace(common_prefix + '/', '')
+			fi[DataProvider.URL] = '%s/%s' % (self._forced_prefix, url)
+		return block
+
 	def _create_block(self, block_name):
 		result = {
 			DataProvider.Locations: None,
@@ -133,17 +146,28 @@ class ListProvider(DataProvider):
 		block.pop(self._common_metadata)
 		return block
 
+	def _get_block_cache_token(self):
+		file_stat = os.stat(self._filename)
+		return (file_stat.st_ino, file_stat.st_size, file_stat.st_mtime)
+
 	def _iter_blocks_raw(self):
-		def _filter_block(block):
+		def _filter_block_id(block_id):
 			if self._filter:
-				return self._filter in '/%s#' % DataProvider.get_block_id(block)
+				return self._filter in '/%s#' % block_id
 			return True
+		if DataProvider.is_binary_file(self._filename):  # blocks are filtered before they are parsed
+			for block in DataProvider.iter_blocks_from_binary(self._filename, _filter_block_id):
+				if self._forced_prefix:
+					block = self._apply_forced_prefix(block)
+				self._raise_on_abort()
+				yield block
+			return
 		try:
 			fp = SafeFile(self._filename)
 		except Exception:
 			raise DatasetError('Unable to open dataset file %s' % repr(self._filename))
 		for block in self._create_blocks(fp.iter_close()):
-			if _filter_block(block):
+			if _filter_block_id(DataProvider.get_block_id(block)):
 				self._raise_on_abort()
 				yield block
 
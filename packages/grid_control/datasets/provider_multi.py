@@ -12,9 +12,10 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
+import threading
 from grid_control.datasets.dproc_base import DataProcessor
 from grid_control.datasets.provider_base import DataProvider, DatasetError
-from grid_control.utils.thread_tools import tchain
+from grid_control.utils.thread_tools import GCLock, tchain
 from hpfwk import ExceptionCollector
 from python_compat import imap, reduce, set
 
@@ -74,9 +75,27 @@ class ThreadedMultiDatasetProvider(MultiDatasetProvider):
 	def __init__(self, config, datasource_name, dataset_expr, dataset_nick, provider_list):
 		MultiDatasetProvider.__init__(self, config, datasource_name,
 			dataset_expr, dataset_nick, provider_list)
-		self._thread_max = config.get_int('dataprovider thread max', 3, on_change=None)
 		self._thread_timeout = config.get_time('dataprovider thread timeout', 60 * 15, on_change=None)
+		# The number of concurrent queries is limited for each type of provider (~ backend service)
+		self._thread_lock_dict = {}
+		for provider in provider_list:
+			provider_cls_name = provider.__class__.__name__
+			if provider_cls_name not in self._thread_lock_dict:
+				thread_max = config.get_int(['%s thread max' % provider_cls_name,
+					'dataprovider thread max'], 3, on_change=None)
+				self._thread_lock_dict[provider_cls_name] = GCLock(threading.Semaphore(thread_max))
 
 	def _iter_all_blocks(self, exc):
-		return tchain(imap(lambda provider: provider.iter_blocks_normed(), self._provider_list),
-			timeout=self._thread_timeout, max_concurrent=self._thread_max)
+		return tchain(imap(self._iter_provider_blocks, self._provider_list),
+			timeout=self._thread_timeout)
+
+	def _iter_provider_blocks(self, provider):
+		lock = self._thread_lock_dict[provider.__class__.__name__]
+		lock.acquire()
+		try:  # old python versions can't use finally
+			for block in provider.iter_blocks_normed():
+				yield block
+		except Exception:
+			lock.release()
+			raise
+		lock.release()
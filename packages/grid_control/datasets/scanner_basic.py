@@ -12,19 +12,21 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, logging
+import os, stat, logging
 from grid_control.backends.storage import se_ls
 from grid_control.config import ConfigError, create_config
 from grid_control.datasets import DataProvider, DatasetError
 from grid_control.datasets.scanner_base import InfoScanner
 from grid_control.job_db import JobClass
 from grid_control.job_selector import AndJobSelector, ClassSelector, JobSelector
-from grid_control.utils import DictFormat, clean_path, split_opt
+from grid_control.utils import DictFormat, abort, clean_path, ensure_dir_exists, split_opt
 from grid_control.utils.activity import ProgressActivity
 from grid_control.utils.algos import filter_dict
-from grid_control.utils.parsing import parse_str
-from hpfwk import clear_current_exception
-from python_compat import identity, ifilter, imap, irange, izip, lfilter, lidfilter, lmap, set, sorted  # pylint:disable=line-too-long
+from grid_control.utils.file_tools import SafeFile
+from grid_control.utils.parsing import parse_json, parse_str
+from grid_control.utils.thread_tools import GCEvent, GCQueue, start_daemon
+from hpfwk import ExceptionCollector, clear_current_exception, ignore_exception
+from python_compat import identity, ifilter, imap, irange, itemgetter, izip, json, lfilter, lidfilter, lmap, md5_hex, set, sort_inplace, sorted  # pylint:disable=line-too-long
 
 
 class AddFilePrefix(InfoScanner):
@@ -117,6 +119,10 @@ class FilesFromLS(InfoScanner):
 			self._path = 'file://' + self._path
 		(prot, path) = self._path.split('://')
 		self._path = prot + '://' + clean_path(path)
+		self._thread_max = config.get_int('source thread max', 10, on_change=None)
+		self._ls_cache_fn = None
+		if config.get_bool('source listing cache', False, on_change=None):
+			self._ls_cache_fn = config.get_work_path('provider_cache', 'ls_%s.dat' % md5_hex(self._path))
 
 	def _iter_datasource_items(self, item, metadata_dict, entries, location_list, obj_dict):
 		metadata_dict['GC_SOURCE_DIR'] = self._path
@@ -131,17 +137,81 @@ class FilesFromLS(InfoScanner):
 		progress.finish()
 
 	def _iter_path(self, path):
-		proc = se_ls(path)
-		for size_basename in proc.stdout.iter(timeout=self._timeout):
-			(size, basename) = size_basename.strip().split(' ', 1)
-			size = int(size)
+		# The directories are listed by a pool of worker threads - ahead of the depth-first iteration
+		# over the directory entries, which keeps the order of the files
+		(ls_cache_old, ls_cache_new) = (_read_ls_cache(self._ls_cache_fn), {})
+		ls_info_dict = {path: (GCEvent(), [])}  # path -> (listing finished event, entry list)
+		(path_queue, stop_event, exc) = (GCQueue(), GCEvent(), ExceptionCollector())
+		path_queue.put(path)
+		for _ in irange(max(1, self._thread_max)):
+			start_daemon('directory listing thread', self._ls_thread, exc,
+				path_queue, stop_event, ls_info_dict, ls_cache_old, ls_cache_new)
+		try:
+			for size_url in self._iter_path_listed(path, ls_info_dict, exc):
+				yield size_url
+		except Exception:
+			stop_event.set()
+			path_queue.finish()
+			raise
+		stop_event.set()
+		path_queue.finish()
+		if self._ls_cache_fn is not None:
+			_write_ls_cache(self._ls_cache_fn, ls_cache_new)
+
+	def _iter_path_listed(self, path, ls_info_dict, exc):
+		(ls_event, ls_entry_list) = ls_info_dict[path]
+		while not ls_event.wait(timeout=1, description='directory listing'):
+			if abort():
+				raise DatasetError('Received abort request during directory listing')
+		ls_info_dict.pop(path)
+		exc.raise_any(DatasetError('Unable to list directory %r' % path))
+		for (size, basename) in ls_entry_list:
 			if size >= 0:
 				yield (size, os.path.join(path, basename))
 			elif self._recurse:
-				for result in self._iter_path(os.path.join(path, basename)):
-					yield result
+				for size_url in self._iter_path_listed(os.path.join(path, basename), ls_info_dict, exc):
+					yield size_url
+
+	def _list_path(self, path, ls_cache_old, ls_cache_new):
+		# Returns the list of (size, basename) tuples - directories have the size -1
+		if path.startswith('file://'):  # local directories are listed directly
+			dn = path.replace('file://', '', 1)
+			try:
+				dn_mtime = os.stat(dn).st_mtime
+				(dn_mtime_old, ls_entry_list) = ls_cache_old.get(path, (None, None))
+				if dn_mtime != dn_mtime_old:
+					ls_entry_list = _list_dn(dn)
+				ls_cache_new[path] = (dn_mtime, ls_entry_list)
+				return ls_entry_list
+			except OSError:
+				self._log.warning('Unable to list directory %r', dn)
+				clear_current_exception()
+				return []
+		proc = se_ls(path)
+		ls_entry_list = []
+		for size_basename in proc.stdout.iter(timeout=self._timeout):
+			(size, basename) = size_basename.strip().split(' ', 1)
+			ls_entry_list.append((int(size), basename))
 		if proc.status(timeout=0) != 0:
 			self._log.log_process(proc)
+		return ls_entry_list
+
+	def _ls_thread(self, exc, path_queue, stop_event, ls_info_dict, ls_cache_old, ls_cache_new):
+		while not stop_event.is_set():
+			path = path_queue.get(timeout=None, default=None)
+			if path is None:
+				break
+			(ls_event, ls_entry_list) = ls_info_dict[path]
+			try:
+				ls_entry_list.extend(self._list_path(path, ls_cache_old, ls_cache_new))
+			except Exception:
+				exc.collect()
+			if self._recurse:  # subdirectories are queued before the listing is marked as finished
+				for (size, basename) in ls_entry_list:
+					if size < 0:
+						ls_info_dict[os.path.join(path, basename)] = (GCEvent(), [])
+						path_queue.put(os.path.join(path, basename))
+			ls_event.set()
 
 
 class JobInfoFromOutputDir(InfoScanner):
@@ -360,3 +430,53 @@ class ParentLookup(InfoScanner):
 				for fi in block[DataProvider.FileList]:
 					map_plfnp2pdn[self._get_lfnp(fi[DataProvider.URL])] = block[DataProvider.Dataset]
 		return self._plfnp2pdn_cache.get(parent_dataset_expr, {})  # return cached mapping
+
+
+def _list_dn(dn):
+	# Lists the (non-hidden) directory entries, like "ls" - using os.scandir if available.
+	# Symbolic links to directories are not listed as directories to avoid recursion loops
+	ls_entry_list = []
+	if hasattr(os, 'scandir'):
+		for entry in os.scandir(dn):
+			if entry.name.startswith('.'):
+				continue
+			if entry.is_dir(follow_symlinks=False):
+				ls_entry_list.append((-1, entry.name))
+			elif entry.is_file():
+				ls_entry_list.append((entry.stat().st_size, entry.name))
+	else:
+		for fn in os.listdir(dn):
+			if fn.startswith('.'):
+				continue
+			fn_stat = os.lstat(os.path.join(dn, fn))
+			if stat.S_ISLNK(fn_stat.st_mode):  # symbolic links are only listed if they point to files
+				fn_stat = ignore_exception(OSError, fn_stat, os.stat, os.path.join(dn, fn))
+				if stat.S_ISDIR(fn_stat.st_mode):
+					continue
+			if stat.S_ISDIR(fn_stat.st_mode):
+				ls_entry_list.append((-1, fn))
+			elif stat.S_ISREG(fn_stat.st_mode):
+				ls_entry_list.append((fn_stat.st_size, fn))
+	sort_inplace(ls_entry_list, key=itemgetter(1))
+	return ls_entry_list
+
+
+def _read_ls_cache(fn):
+	# Returns the cached directory listings: path -> (modification time, entry list)
+	if (fn is None) or not os.path.exists(fn):
+		return {}
+	try:
+		ls_cache = {}
+		for (path, (dn_mtime, ls_entry_list)) in parse_json(SafeFile(fn).read_close()).items():
+			ls_cache[path] = (dn_mtime, lmap(tuple, ls_entry_list))
+		return ls_cache
+	except Exception:
+		clear_current_exception()
+		return {}
+
+
+def _write_ls_cache(fn, ls_cache):
+	if not os.path.exists(os.path.dirname(os.path.dirname(fn))):
+		return  # the cache is only used with an existing work directory
+	ensure_dir_exists(os.path.dirname(fn), 'dataset provider cache directory')
+	SafeFile(fn, 'w').write_close(json.dumps(ls_cache))
@@ -12,14 +12,32 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, gzip
+import os, gzip, mmap, time, struct
 from grid_control.datasets.splitter_base import DataSplitter, PartitionReader, PartitionWriter
 from grid_control.utils import DictFormat
 from grid_control.utils.activity import Activity
+from grid_control.utils.algos import decode_columns, encode_columns
+from grid_control.utils.data_structures import LRUCache
 from grid_control.utils.file_tools import VirtualFile
 from grid_control.utils.parsing import parse_bool, parse_json, parse_list
+from grid_control.utils.thread_tools import GCEvent, GCLock, start_daemon, with_lock
 from hpfwk import AbstractError, NestedException, clear_current_exception, ignore_exception
-from python_compat import BytesBuffer, bytes2str, ifilter, imap, json, lmap, tarfile
+from python_compat import BytesBuffer, Struct, bytes2str, ifilter, imap, json, lmap, str2bytes, tarfile, unpack_from  # pylint:disable=line-too-long
+
+
+# Layout of the binary partition file (all integers are stored in big-endian byte order):
+#   <magic> <header> <partition records> <url index> <url data> <partition index>
+# header: number of valid partitions, number of stored partitions, number of urls,
+#   position of url index, position of partition index
+# partition record: <info length:uint32> <url count:uint32> <json partition info> <url ids:uint32>
+#   - the file metadata in the partition info is stored column-wise (see encode_columns)
+# url index: <number of urls + 1> offsets (uint64) of the urls in the url data block
+# partition index: <number of stored partitions> positions (uint64) of the partition records
+_BINARY_MAGIC = str2bytes('GCPMAP03')
+_BINARY_HEADER = Struct('>QQQQQ')
+_BINARY_RECORD_HEADER = Struct('>II')
+_BINARY_POS = Struct('>Q')
+_BINARY_POS_RANGE = Struct('>QQ')
 
 
 class PartitionReaderError(NestedException):
@@ -40,6 +58,60 @@ class TrivialPartitionReader(PartitionReader):
 		return self._partition_data[partition_num]
 
 
+class BinaryPartitionWriter(PartitionWriter):
+	alias_list = ['version_3', 'auto']
+
+	def save_partitions(self, path, partition_iter, progress=None):
+		fp = open(path, 'wb')
+		try:
+			fp.write(_BINARY_MAGIC + _BINARY_HEADER.pack(0, 0, 0, 0, 0))  # header is written at the end
+			(last_valid_pnum, partition_pos_list, url_list, map_url2url_idx) = (-1, [], [], {})
+			for (partition_num, partition) in enumerate(partition_iter):
+				if not partition.get(DataSplitter.Invalid, False):
+					last_valid_pnum = partition_num
+				if progress and (partition_num % 100 == 0):
+					progress.update_progress(partition_num)
+				url_idx_list = []
+				for url in partition.get(DataSplitter.FileList, []):  # urls are stored only once
+					url_idx = map_url2url_idx.get(url)
+					if url_idx is None:
+						url_idx = map_url2url_idx[url] = len(url_list)
+						url_list.append(url)
+					url_idx_list.append(url_idx)
+				partition_pos_list.append(fp.tell())
+				fp.write(self._format_partition(partition, url_idx_list))
+			url_index_pos = fp.tell()
+			self._write_url_table(fp, url_list)
+			partition_index_pos = fp.tell()
+			fp.write(struct.pack('>%dQ' % len(partition_pos_list), *partition_pos_list))
+			fp.seek(len(_BINARY_MAGIC))
+			fp.write(_BINARY_HEADER.pack(last_valid_pnum + 1, len(partition_pos_list), len(url_list),
+				url_index_pos, partition_index_pos))
+		finally:
+			fp.close()
+
+	def _format_partition(self, partition, url_idx_list):
+		partition_info = {}
+		for (key, value) in partition.items():
+			if key == DataSplitter.Metadata:  # file metadata is stored column-wise
+				partition_info[str(key)] = {'columns': encode_columns(value), 'rows': len(value)}
+			elif key != DataSplitter.FileList:
+				partition_info[str(key)] = value
+		partition_info_str = str2bytes(json.dumps(partition_info, separators=(',', ':')))
+		return (_BINARY_RECORD_HEADER.pack(len(partition_info_str), len(url_idx_list)) +
+			partition_info_str + struct.pack('>%dI' % len(url_idx_list), *url_idx_list))
+
+	def _write_url_table(self, fp, url_list):
+		(url_data_list, url_offset_list, url_offset) = ([], [0], 0)
+		for url in url_list:
+			url_data = str2bytes(url)
+			url_data_list.append(url_data)
+			url_offset += len(url_data)
+			url_offset_list.append(url_offset)
+		fp.write(struct.pack('>%dQ' % len(url_offset_list), *url_offset_list))
+		fp.write(str2bytes('').join(url_data_list))
+
+
 class TarPartitionWriter(PartitionWriter):
 	def __init__(self):
 		PartitionWriter.__init__(self)
@@ -101,13 +173,57 @@ class AutoPartitionReader(FilePartitionReader):
 	alias_list = ['auto']
 
 	def __new__(cls, path):
+		if ignore_exception(Exception, None, _read_magic, path) == _BINARY_MAGIC:
+			return FilePartitionReader.create_instance('version_3', path)
 		version = ignore_exception(Exception, 1,
 			lambda: int(tarfile.open(path, 'r:').extractfile('Version').read()))
 		return FilePartitionReader.create_instance('version_%s' % version, path)
 
 
-class TarPartitionReader(FilePartitionReader):
+class BinaryPartitionReader(FilePartitionReader):
+	alias_list = ['version_3']
+
 	def __init__(self, path):
+		try:
+			fp = open(path, 'rb')
+			try:  # partitions are read directly from the memory mapped file
+				self._data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+			finally:
+				fp.close()
+			if self._data[:len(_BINARY_MAGIC)] != _BINARY_MAGIC:
+				raise PartitionReaderError('Invalid file header')
+			(partition_len, _, url_len, self._url_index_pos,
+				self._partition_index_pos) = _BINARY_HEADER.unpack_from(self._data, len(_BINARY_MAGIC))
+		except Exception:
+			raise PartitionReaderError('No valid dataset splitting found in %s' % path)
+		self._url_data_pos = self._url_index_pos + (url_len + 1) * _BINARY_POS.size
+		FilePartitionReader.__init__(self, path, partition_len)
+
+	def get_partition_unchecked(self, partition_num):
+		(pos,) = _BINARY_POS.unpack_from(self._data,
+			self._partition_index_pos + partition_num * _BINARY_POS.size)
+		(info_len, url_len) = _BINARY_RECORD_HEADER.unpack_from(self._data, pos)
+		pos += _BINARY_RECORD_HEADER.size
+		partition = {}
+		for (key, value) in parse_json(bytes2str(self._data[pos:pos + info_len])).items():
+			partition[int(key)] = value
+		metadata = partition.get(DataSplitter.Metadata)
+		if isinstance(metadata, dict):
+			partition[DataSplitter.Metadata] = decode_columns(metadata['columns'], metadata['rows'])
+		url_idx_list = unpack_from('>%dI' % url_len, self._data, pos + info_len)
+		partition[DataSplitter.FileList] = lmap(self._get_url, url_idx_list)
+		return partition
+
+	def _get_url(self, url_idx):
+		(url_start, url_end) = _BINARY_POS_RANGE.unpack_from(self._data,
+			self._url_index_pos + url_idx * _BINARY_POS.size)
+		return bytes2str(self._data[self._url_data_pos + url_start:self._url_data_pos + url_end])
+
+
+class TarPartitionReader(FilePartitionReader):
+	# Decompressed chunks are kept in a LRU cache - the next chunk is prefetched in the background
+	# when the chunks are accessed sequentially
+	def __init__(self, path, chunk_cache_size=10):
 		activity = Activity('Reading dataset partition file')
 		self._fmt = DictFormat()
 		try:
@@ -128,7 +244,14 @@ class TarPartitionReader(FilePartitionReader):
 			DataSplitter.MetadataHeader: parse_json,
 			DataSplitter.Metadata: lambda x: parse_json(x.strip("'"))
 		}
-		(self._cache_nested_fn, self._cache_nested_tar) = (None, None)
+		self._partition_chunk_size = 100
+		(self._chunk_cache, self._chunk_idx_last) = (LRUCache(chunk_cache_size), None)
+		(self._chunk_cache_lock, self._tar_lock, self._map_chunk_idx2event) = (GCLock(), GCLock(), {})
+		(self._chunk_prefetch_num, self._chunk_decompression_time) = (0, 0)
+
+	def get_chunk_cache_stats(self):
+		return {'hits': self._chunk_cache.hits, 'misses': self._chunk_cache.misses,
+			'prefetched': self._chunk_prefetch_num, 'decompression time': self._chunk_decompression_time}
 
 	def _combine_partition_parts(self, partition, url_list):
 		if DataSplitter.CommonPrefix in partition:
@@ -137,17 +260,53 @@ class TarPartitionReader(FilePartitionReader):
 		partition[DataSplitter.FileList] = lmap(str.strip, url_list)
 		return partition
 
-	def _get_nested_tar(self, nested_fn):
-		if self._cache_nested_fn != nested_fn:  # caching gives 3-4x speedup for sequential access
-			self._cache_nested_tar = self._open_nested_tar(nested_fn)
-			self._cache_nested_fn = nested_fn
-		return self._cache_nested_tar
+	def _get_nested_tar(self, chunk_idx):
+		self._chunk_cache_lock.acquire()
+		try:
+			nested_tar = self._chunk_cache.get(chunk_idx)
+			prefetch_event = self._map_chunk_idx2event.get(chunk_idx)
+		finally:
+			self._chunk_cache_lock.release()
+		if (nested_tar is None) and (prefetch_event is not None):  # wait for running prefetch
+			prefetch_event.wait(timeout=None)
+			nested_tar = with_lock(self._chunk_cache_lock, self._chunk_cache.get, chunk_idx)
+		if nested_tar is None:
+			nested_tar = self._open_nested_tar(chunk_idx)
+			with_lock(self._chunk_cache_lock, self._chunk_cache.put, chunk_idx, nested_tar)
+		if chunk_idx == (self._chunk_idx_last or 0) + 1:  # sequential access - prefetch next chunk
+			self._prefetch_nested_tar(chunk_idx + 1)
+		self._chunk_idx_last = chunk_idx
+		return nested_tar
 
-	def _open_nested_tar(self, nested_fn):
-		nested_tar_fp = self._tar.extractfile(nested_fn)
-		nested_tar_fp = BytesBuffer(gzip.GzipFile(fileobj=nested_tar_fp).read())
+	def _open_nested_tar(self, chunk_idx):
+		def _read_nested_tar():
+			return self._tar.extractfile('%03dXX.tgz' % chunk_idx).read()
+		nested_tar_data = with_lock(self._tar_lock, _read_nested_tar)
+		t_start = time.time()
+		nested_tar_fp = BytesBuffer(gzip.GzipFile(fileobj=BytesBuffer(nested_tar_data)).read())
+		self._chunk_decompression_time += time.time() - t_start
 		return tarfile.open(mode='r', fileobj=nested_tar_fp)
 
+	def _prefetch_nested_tar(self, chunk_idx):
+		def _prefetch_thread(prefetch_event):
+			try:
+				nested_tar = self._open_nested_tar(chunk_idx)
+				with_lock(self._chunk_cache_lock, self._chunk_cache.put, chunk_idx, nested_tar)
+			finally:
+				with_lock(self._chunk_cache_lock, self._map_chunk_idx2event.pop, chunk_idx)
+				prefetch_event.set()
+		if chunk_idx * self._partition_chunk_size >= self.get_partition_len():
+			return
+		self._chunk_cache_lock.acquire()
+		try:
+			if (chunk_idx in self._chunk_cache) or (chunk_idx in self._map_chunk_idx2event):
+				return
+			prefetch_event = self._map_chunk_idx2event[chunk_idx] = GCEvent()
+			self._chunk_prefetch_num += 1
+		finally:
+			self._chunk_cache_lock.release()
+		start_daemon('prefetching partition chunk %d' % chunk_idx, _prefetch_thread, prefetch_event)
+
 
 class TarPartitionWriterV1(TarPartitionWriter):
 	alias_list = ['version_1']
@@ -182,7 +341,7 @@ class TarPartitionWriterV1(TarPartitionWriter):
 
 
 class TarPartitionWriterV2(TarPartitionWriter):
-	alias_list = ['version_2', 'auto']
+	alias_list = ['version_2']
 
 	def __init__(self):
 		TarPartitionWriter.__init__(self)
@@ -223,7 +382,7 @@ class TarPartitionReaderV1(TarPartitionReader):
 
 	def get_partition_unchecked(self, partition_num):
 		# Save as outer_tar file to allow random access to mapping data with little memory overhead
-		nested_tar = self._get_nested_tar('%03dXX.tgz' % (partition_num / 100))
+		nested_tar = self._get_nested_tar(int(partition_num / self._partition_chunk_size))
 		partition = self._fmt.parse(nested_tar.extractfile('%05d/info' % partition_num).readlines(),
 			key_parser={None: DataSplitter.intstr2enum}, value_parser=self._map_enum2parser)
 		url_list = lmap(bytes2str, nested_tar.extractfile('%05d/list' % partition_num).readlines())
@@ -238,9 +397,17 @@ class TarPartitionReaderV2(TarPartitionReader):
 		self._partition_chunk_size = self._metadata.pop('ChunkSize', 100)
 
 	def get_partition_unchecked(self, partition_num):
-		nested_tar = self._get_nested_tar('%03dXX.tgz' % (partition_num / self._partition_chunk_size))
+		nested_tar = self._get_nested_tar(int(partition_num / self._partition_chunk_size))
 		partition_str_list = lmap(bytes2str, nested_tar.extractfile('%05d' % partition_num).readlines())
 		partition = self._fmt.parse(ifilter(lambda x: not x.startswith('='), partition_str_list),
 			key_parser={None: DataSplitter.intstr2enum}, value_parser=self._map_enum2parser)
 		url_list = imap(lambda x: x[1:], ifilter(lambda x: x.startswith('='), partition_str_list))
 		return self._combine_partition_parts(partition, url_list)
+
+
+def _read_magic(path):
+	fp = open(path, 'rb')
+	try:
+		return fp.read(len(_BINARY_MAGIC))
+	finally:
+		fp.close()
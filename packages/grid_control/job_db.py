@@ -16,7 +16,7 @@ import time, logging
 from grid_control.gc_plugin import ConfigurablePlugin
 from grid_control.utils.data_structures import make_enum
 from hpfwk import AbstractError, NestedException
-from python_compat import irange, sorted
+from python_compat import ichain, imap, irange, set, sorted
 
 
 class JobError(NestedException):
@@ -24,6 +24,8 @@ class JobError(NestedException):
 
 
 class Job(object):
+	__slots__ = ['attempt', 'changed', 'gc_id', 'history', 'state', 'submitted', '_dict']
+
 	def __init__(self):
 		self.state = Job.INIT
 		self.attempt = 0
@@ -90,17 +92,36 @@ class JobDB(ConfigurablePlugin):
 		ConfigurablePlugin.__init__(self, config)
 		self._log = logging.getLogger('jobs.db')
 		(self._job_limit, self._always_selector, self._default_job_obj) = (job_limit, job_selector, Job())
+		self._state_index = None  # mapping: state -> set of jobnums - enabled by _build_state_index
+		self._batch_depth = 0
 
 	def __len__(self):
 		return self._job_limit
 
+	def begin_batch(self):
+		# Job changes committed until the matching call of commit_batch can be written together
+		self._batch_depth += 1
+
 	def commit(self, jobnum, job_obj):
 		raise AbstractError
 
+	def commit_batch(self):
+		self._batch_depth = max(0, self._batch_depth - 1)
+		if not self._batch_depth:
+			self._write_batch()
+
+	def flush_batch(self):
+		# Write the job changes committed so far in the current batch
+		self._write_batch()
+
 	def get_job(self, jobnum):
 		raise AbstractError
 
 	def get_job_len(self, job_selector=None, subset=None):
+		if (subset is None) and (self._state_index is not None):
+			state_list = _get_selector_state_list(job_selector, self._always_selector, exact=True)
+			if state_list is not None:
+				return sum(imap(lambda state: len(self._state_index.get(state, ())), state_list))
 		return len(self.get_job_list(job_selector, subset))  # fastest method! (iter->list written in C)
 
 	def get_job_list(self, job_selector=None, subset=None):
@@ -113,6 +134,10 @@ class JobDB(ConfigurablePlugin):
 		raise AbstractError
 
 	def iter_jobs(self, job_selector=None, subset=None):
+		if (subset is None) and (self._state_index is not None):
+			state_list = _get_selector_state_list(job_selector, self._always_selector, exact=False)
+			if state_list is not None:  # only jobs in the required states have to be checked
+				subset = sorted(ichain(imap(lambda state: self._state_index.get(state, ()), state_list)))
 		if subset is None:
 			subset = irange(self._job_limit)
 
@@ -130,7 +155,30 @@ class JobDB(ConfigurablePlugin):
 					yield jobnum
 
 	def set_job_limit(self, value):
-		self._job_limit = value
+		(job_limit_old, self._job_limit) = (self._job_limit, value)
+		if self._state_index is not None:
+			for jobnum in irange(value, job_limit_old):
+				self._update_state_index(jobnum, None)
+			for jobnum in irange(job_limit_old, value):
+				self._update_state_index(jobnum, self.get_job_transient(jobnum).state)
+
+	def _build_state_index(self):
+		# Index the job states to resolve state based job selections without checking all jobs
+		self._state_index = {}
+		for jobnum in irange(self._job_limit):
+			self._state_index.setdefault(self.get_job_transient(jobnum).state, set()).add(jobnum)
+
+	def _update_state_index(self, jobnum, state):
+		# Has to be called by the commit method of job databases with enabled state index
+		if self._state_index is None:
+			return
+		for jobnum_set in self._state_index.values():
+			jobnum_set.discard(jobnum)
+		if (state is not None) and (jobnum < self._job_limit):
+			self._state_index.setdefault(state, set()).add(jobnum)
+
+	def _write_batch(self):
+		pass
 
 
 class JobClass(JobClassHolder):
@@ -148,3 +196,29 @@ class JobClass(JobClassHolder):
 	FAILING = JobClassHolder(Job.FAILED, Job.ABORTED, Job.CANCELLED)
 	SUBMIT_CANDIDATES = JobClassHolder(Job.INIT, Job.FAILED, Job.ABORTED, Job.CANCELLED)
 	SUCCESS = JobClassHolder(Job.SUCCESS)
+
+
+def _get_selector_state_list(job_selector, always_selector, exact):
+	# Return list of job states (or None) that the given selectors are restricted to
+	# exact: the selectors select all jobs with these states - otherwise a subset of these jobs
+	state_set = None
+	for selector in [job_selector, always_selector]:
+		if selector is None:
+			continue
+		if exact:
+			selector_state_list = selector.get_state_list()
+		else:
+			selector_state_list = selector.get_required_state_list()
+		if selector_state_list is None:
+			if exact:
+				return
+			continue
+		if state_set is None:
+			state_set = set(selector_state_list)
+		else:
+			state_set.intersection_update(selector_state_list)
+	if state_set is None:
+		if exact and (job_selector is None) and (always_selector is None):
+			return list(Job.enum_value_list)
+		return
+	return sorted(state_set)
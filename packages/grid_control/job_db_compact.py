@@ -0,0 +1,175 @@
+# | Copyright 2017 Karlsruhe Institute of Technology
+# |
+# | Licensed under the Apache License, Version 2.0 (the "License");
+# | you may not use this file except in compliance with the License.
+# | You may obtain a copy of the License at
+# |
+# |     http://www.apache.org/licenses/LICENSE-2.0
+# |
+# | Unless required by applicable law or agreed to in writing, software
+# | distributed under the License is distributed on an "AS IS" BASIS,
+# | WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# | See the License for the specific language governing permissions and
+# | limitations under the License.
+
+from array import array
+from grid_control.job_db import Job
+from python_compat import irange, izip, sorted
+
+
+class CompactJobMap(object):
+	# Dictionary-like storage of job objects (jobnum -> Job) with a small memory footprint:
+	# The core job fields are stored in typed arrays indexed by the job number, while the history
+	# and the job dictionary are kept as flat tuples with interned strings (site, queue, keys, ...).
+	# Job objects are only created on access. Like a dictionary, the map refers to the job objects
+	# assigned last - these are only encoded once more than pending_max job objects are assigned
+	def __init__(self, pending_max=1000):
+		(self._state, self._attempt) = (array('i'), array('i'))
+		(self._submitted, self._changed) = (array('d'), array('d'))
+		(self._gc_id_list, self._map_jobnum2extra, self._map_str2str, self._len) = ([], {}, {}, 0)
+		(self._pending_max, self._map_jobnum2pending) = (pending_max, {})
+
+	def __contains__(self, jobnum):
+		return (0 <= jobnum < len(self._state)) and (self._state[jobnum] != -1)
+
+	def __getitem__(self, jobnum):
+		if jobnum not in self:
+			raise KeyError(jobnum)
+		return self.get(jobnum)
+
+	def __iter__(self):
+		for jobnum in irange(len(self._state)):
+			if self._state[jobnum] != -1:
+				yield jobnum
+
+	def __len__(self):
+		return self._len
+
+	def __setitem__(self, jobnum, job_obj):
+		if jobnum >= len(self._state):
+			missing = jobnum + 1 - len(self._state)
+			self._state.extend([-1] * missing)
+			self._attempt.extend([0] * missing)
+			self._submitted.extend([0] * missing)
+			self._changed.extend([0] * missing)
+			self._gc_id_list.extend([None] * missing)
+		if self._state[jobnum] == -1:
+			self._len += 1
+		self._state[jobnum] = job_obj.state
+		if len(self._map_jobnum2pending) >= self._pending_max:
+			for (jobnum_pending, job_obj_pending) in self._map_jobnum2pending.items():
+				self._store_job_obj(jobnum_pending, job_obj_pending)
+			self._map_jobnum2pending = {}
+		self._map_jobnum2pending[jobnum] = job_obj
+
+	def get(self, jobnum, default=None):
+		if jobnum in self._map_jobnum2pending:
+			return self._map_jobnum2pending[jobnum]
+		elif jobnum in self:
+			return self._create_job_obj(jobnum)
+		return default
+
+	def get_view(self, jobnum, default=None):
+		# Returns a read-only view of the job information - without creating the job dictionaries
+		if jobnum in self._map_jobnum2pending:
+			return self._map_jobnum2pending[jobnum]
+		elif jobnum in self:
+			return CompactJobView(self, jobnum)
+		return default
+
+	def _create_job_obj(self, jobnum):
+		job_obj = Job()
+		job_obj.state = self._state[jobnum]
+		job_obj.attempt = self._attempt[jobnum]
+		job_obj.submitted = self._submitted[jobnum]
+		job_obj.changed = self._changed[jobnum]
+		job_obj.gc_id = self._gc_id_list[jobnum]
+		job_obj.history = self._get_history(jobnum)
+		job_obj.set_dict(self._get_job_dict(jobnum))
+		return job_obj
+
+	def _get_history(self, jobnum):
+		history = self._map_jobnum2extra.get(jobnum, ((), ()))[0]
+		return dict(izip(history[::2], history[1::2]))
+
+	def _get_job_dict(self, jobnum):
+		job_dict_items = self._map_jobnum2extra.get(jobnum, ((), ()))[1]
+		return dict(izip(job_dict_items[::2], job_dict_items[1::2]))
+
+	def _intern(self, value):
+		if isinstance(value, str):
+			return self._map_str2str.setdefault(value, value)
+		return value
+
+	def _store_job_obj(self, jobnum, job_obj):
+		self._state[jobnum] = job_obj.state
+		self._attempt[jobnum] = int(job_obj.attempt)
+		self._submitted[jobnum] = float(job_obj.submitted)
+		self._changed[jobnum] = float(job_obj.changed)
+		self._gc_id_list[jobnum] = job_obj.gc_id
+
+		history = []
+		for attempt in sorted(job_obj.history):
+			history.extend([attempt, self._intern(job_obj.history[attempt])])
+		job_dict = job_obj.get_dict_full()
+		for key in ['id', 'status', 'attempt', 'submitted', 'changed']:  # already stored in arrays
+			job_dict.pop(key, None)
+		job_dict_items = []
+		for key in sorted(job_dict):
+			job_dict_items.extend([self._intern(key), self._intern(job_dict[key])])
+		if history or job_dict_items:
+			self._map_jobnum2extra[jobnum] = (tuple(history), tuple(job_dict_items))
+		else:
+			self._map_jobnum2extra.pop(jobnum, None)
+
+
+class CompactJobView(object):
+	# Read-only job object, which accesses the job information stored in a CompactJobMap
+	__slots__ = ['_job_map', '_jobnum']
+
+	def __init__(self, job_map, jobnum):
+		(self._job_map, self._jobnum) = (job_map, jobnum)
+
+	def get(self, key, default=None):
+		job_dict_items = self._job_map._map_jobnum2extra.get(self._jobnum, ((), ()))[1]
+		for idx in irange(0, len(job_dict_items), 2):
+			if job_dict_items[idx] == key:
+				return job_dict_items[idx + 1]
+		return default
+
+	def get_dict(self):
+		return {'id': self.gc_id, 'status': Job.enum2str(self.state),
+			'attempt': self.attempt, 'submitted': self.submitted, 'changed': self.changed}
+
+	def get_dict_full(self):
+		result = self._job_map._get_job_dict(self._jobnum)
+		result.update(self.get_dict())
+		return result
+
+	def get_job_location(self):
+		job_location_str = (self.get('site') or '') + '/' + (self.get('queue') or '')
+		return job_location_str.strip('/') or 'N/A'
+
+	def _get_attempt(self):
+		return self._job_map._attempt[self._jobnum]
+	attempt = property(_get_attempt)
+
+	def _get_changed(self):
+		return self._job_map._changed[self._jobnum]
+	changed = property(_get_changed)
+
+	def _get_gc_id(self):
+		return self._job_map._gc_id_list[self._jobnum]
+	gc_id = property(_get_gc_id)
+
+	def _get_history(self):
+		return self._job_map._get_history(self._jobnum)
+	history = property(_get_history)
+
+	def _get_state(self):
+		return self._job_map._state[self._jobnum]
+	state = property(_get_state)
+
+	def _get_submitted(self):
+		return self._job_map._submitted[self._jobnum]
+	submitted = property(_get_submitted)
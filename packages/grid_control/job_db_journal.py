@@ -0,0 +1,196 @@
+# | Copyright 2017 Karlsruhe Institute of Technology
+# |
+# | Licensed under the Apache License, Version 2.0 (the "License");
+# | you may not use this file except in compliance with the License.
+# | You may obtain a copy of the License at
+# |
+# |     http://www.apache.org/licenses/LICENSE-2.0
+# |
+# | Unless required by applicable law or agreed to in writing, software
+# | distributed under the License is distributed on an "AS IS" BASIS,
+# | WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# | See the License for the specific language governing permissions and
+# | limitations under the License.
+
+import os, time, zlib
+from grid_control.job_db import JobError
+from grid_control.job_db_text import TextFileJobDB
+from grid_control.job_db_zip import ZippedJobDB
+from grid_control.utils import remove_files
+from grid_control.utils.activity import Activity
+from grid_control.utils.file_tools import SafeFile
+from python_compat import Struct, bytes2str, imap, set, sorted, str2bytes
+
+
+# Both the journal and the snapshot consist of a magic header followed by records of the form
+#   <jobnum:uint32> <payload length:uint32> <crc32 of payload:uint32> <payload>
+# where the payload is the DictFormat representation of the job used by the text database.
+# Every record contains the complete job information - so replaying a record is idempotent
+_JOURNAL_MAGIC = str2bytes('GCJ1')
+_RECORD_HEADER = Struct('>III')
+
+
+class JournalJobDB(TextFileJobDB):
+	alias_list = ['journaldb']
+
+	def __init__(self, config, job_limit=-1, job_selector=None):
+		self._db_fn = config.get_work_path('jobs.journal')
+		self._snapshot_fn = config.get_work_path('jobs.snapshot')
+		self._snapshot_interval = config.get_int('journal snapshot interval', 10000, on_change=None)
+		self._sync_interval = config.get_time('journal sync interval', 5, on_change=None)
+		(self._journal_fp, self._journal_len, self._sync_last) = (None, 0, time.time())
+		self._skipped_record_dict = {}  # records of jobs beyond the job limit are kept as they are
+		TextFileJobDB.__init__(self, config, job_limit, job_selector)
+		if self._journal_len >= self._snapshot_interval > 0:
+			self._write_snapshot()
+
+	def commit_batch(self):
+		TextFileJobDB.commit_batch(self)
+		if not self._batch_depth:
+			self.sync()  # all changes of a batch are synchronised together
+
+	def sync(self):
+		# Ensure that all journal entries written so far are stored on disk
+		if self._journal_fp is not None:
+			self._journal_fp.flush()
+			os.fsync(self._journal_fp.fileno())
+		self._sync_last = time.time()
+
+	def _close_journal(self):
+		if self._journal_fp is not None:
+			self._journal_fp.close()
+			self._journal_fp = None
+
+	def _format_record(self, jobnum, job_obj):
+		return _format_record_payload(jobnum, str2bytes(self._format_job_obj(job_obj)))
+
+	def _get_journal_fp(self):
+		if self._journal_fp is None:
+			self._journal_fp = open(self._db_fn, 'ab')
+			if self._journal_fp.tell() == 0:
+				self._journal_fp.write(_JOURNAL_MAGIC)
+		return self._journal_fp
+
+	def _iter_records(self, fn, activity_msg):
+		# Yield (jobnum, payload, end offset) of all valid records until the first damaged record
+		if os.path.getsize(fn) == 0:  # journal without magic header (see _get_journal_fp)
+			return
+		fp = open(fn, 'rb')
+		try:
+			if fp.read(len(_JOURNAL_MAGIC)) != _JOURNAL_MAGIC:
+				raise JobError('Invalid job journal file %r' % fn)
+			(fn_size, record_idx) = (max(1, os.path.getsize(fn)), 0)
+			activity = Activity(activity_msg)
+			while True:
+				header = fp.read(_RECORD_HEADER.size)
+				if len(header) < _RECORD_HEADER.size:
+					break
+				(jobnum, payload_len, payload_crc) = _RECORD_HEADER.unpack(header)
+				payload = fp.read(payload_len)
+				if (len(payload) < payload_len) or (zlib.crc32(payload) & 0xffffffff != payload_crc):
+					break
+				yield (jobnum, payload, fp.tell())
+				record_idx += 1
+				if record_idx % 1000 == 0:
+					activity.update('%s %d [%d%%]' % (activity_msg, record_idx,
+						(100.0 * fp.tell()) / fn_size))
+			activity.finish()
+		except:  # old python versions can't use finally - also closes the file on GeneratorExit
+			fp.close()
+			raise
+		fp.close()
+
+	def _read_jobs(self, job_limit):
+		job_map = self._create_job_map()
+		if os.path.exists(self._snapshot_fn):
+			for (jobnum, payload, _) in self._iter_records(self._snapshot_fn, 'Reading job snapshot'):
+				self._read_record(job_map, job_limit, jobnum, payload)
+
+		(self._journal_len, journal_pos) = (0, len(_JOURNAL_MAGIC))
+		if os.path.exists(self._db_fn):
+			for (jobnum, payload, journal_pos) in self._iter_records(self._db_fn, 'Replaying job journal'):
+				self._read_record(job_map, job_limit, jobnum, payload)
+				self._journal_len += 1
+			if journal_pos < os.path.getsize(self._db_fn):  # remove damaged / incomplete tail
+				self._log.warning('Job journal is damaged - discarding entries after position %d',
+					journal_pos)
+				fp = open(self._db_fn, 'r+b')
+				try:
+					fp.truncate(journal_pos)
+				finally:
+					fp.close()
+		return job_map
+
+	def _read_record(self, job_map, job_limit, jobnum, payload):
+		if jobnum >= job_limit >= 0:  # the raw record is carried over into the next snapshot
+			self._skipped_record_dict[jobnum] = payload
+			return
+		try:
+			job_map[jobnum] = self._create_job_obj('journal entry of job %d' % jobnum,
+				self._fmt.parse(bytes2str(payload)))
+		except Exception:
+			raise JobError('Unable to process journal entry of job %d' % jobnum)
+
+	def _write_jobs(self, jobnum_list):
+		# All records are appended with a single write - an interrupted write only leaves
+		# an incomplete record at the end of the journal, which is discarded while reading
+		self._get_journal_fp().write(str2bytes('').join(imap(lambda jobnum:
+			self._format_record(jobnum, self._job_map[jobnum]), jobnum_list)))
+		self._journal_fp.flush()
+		self._journal_len += len(jobnum_list)
+		if self._journal_len >= self._snapshot_interval > 0:
+			self._write_snapshot()
+		elif time.time() - self._sync_last >= self._sync_interval:
+			self.sync()
+
+	def _write_snapshot(self):
+		# The snapshot and the empty journal are both written atomically. Replaying the old journal
+		# on top of a new snapshot (crash between both steps) yields the same job information
+		activity = Activity('Writing job snapshot')
+		fp = SafeFile(self._snapshot_fn, 'wb')  # incomplete files are not moved into place
+		fp.write(_JOURNAL_MAGIC)
+		for jobnum in sorted(set(self._job_map).union(self._skipped_record_dict)):
+			if jobnum in self._job_map:
+				fp.write(self._format_record(jobnum, self._job_map[jobnum]))
+			else:
+				fp.write(_format_record_payload(jobnum, self._skipped_record_dict[jobnum]))
+		fp.close()
+		self._close_journal()
+		SafeFile(self._db_fn, 'wb').write_close(_JOURNAL_MAGIC)
+		self._journal_len = 0
+		self._get_journal_fp()
+		self.sync()
+		activity.finish()
+
+
+class Migrate2JournalJobDB(JournalJobDB):
+	alias_list = ['migrate_journal']
+
+	def __new__(cls, config, job_limit=-1, job_selector=None):
+		db_fn = config.get_work_path('jobs.journal')
+		snapshot_fn = config.get_work_path('jobs.snapshot')
+		if not (os.path.exists(db_fn) or os.path.exists(snapshot_fn)):
+			old_db_cls = None
+			if os.path.exists(config.get_work_path('jobs.zip')):
+				old_db_cls = ZippedJobDB
+			elif os.path.isdir(config.get_work_path('jobs')):
+				old_db_cls = TextFileJobDB
+			if old_db_cls is not None:
+				activity = Activity('Converting job database')
+				try:
+					old_db = old_db_cls(config)
+					new_db = JournalJobDB(config)
+					new_db.begin_batch()
+					for jobnum in old_db.get_job_list():
+						new_db.commit(jobnum, old_db.get_job(jobnum))
+					new_db.commit_batch()
+					new_db._close_journal()
+				except Exception:
+					remove_files([db_fn, snapshot_fn])
+					raise
+				activity.finish()
+		return JournalJobDB.__new__(cls)
+
+
+def _format_record_payload(jobnum, payload):
+	return _RECORD_HEADER.pack(jobnum, len(payload), zlib.crc32(payload) & 0xffffffff) + payload
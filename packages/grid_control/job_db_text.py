@@ -12,13 +12,20 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, time, fnmatch
+import os, time, zlib, fnmatch
 from grid_control.job_db import Job, JobDB, JobError
+from grid_control.job_db_compact import CompactJobMap
 from grid_control.utils import DictFormat, ensure_dir_exists
 from grid_control.utils.activity import Activity
 from grid_control.utils.file_tools import SafeFile, with_file
 from hpfwk import clear_current_exception
-from python_compat import irange, sorted
+from python_compat import Struct, bytes2str, imap, irange, set, sorted, str2bytes
+
+
+# The batch log contains records of the form
+#   <jobnum:uint32> <payload length:uint32> <crc32 of payload:uint32> <payload>
+# where the payload is the content of the job file - replaying a record is idempotent
+_BATCH_LOG_RECORD_HEADER = Struct('>III')
 
 
 class TextFileJobDB(JobDB):
@@ -27,18 +34,29 @@ class TextFileJobDB(JobDB):
 	def __init__(self, config, job_limit=-1, job_selector=None):
 		JobDB.__init__(self, config, job_limit, job_selector)
 		self._path_db = config.get_work_path('jobs')
+		# Changes are appended to the batch log, which is folded into the job files from time to time
+		self._batch_log_fn = config.get_work_path('jobs.batch')
+		self._batch_log_max = config.get_int('job database batch log size', 1000, on_change=None)
+		(self._batch_log_fp, self._batch_log_len, self._batch_log_pos) = (None, 0, 0)
+		(self._batch_log_jobnum_set, self._batch_log_skipped_dict) = (set(), {})
 		self._fmt = DictFormat(escape_strings=True)
+		self._compact = config.get_bool('job database compact', False, on_change=None)
+		self._batch_jobnum_set = set()
 		try:
 			self._job_map = self._read_jobs(self._job_limit)
 		except Exception:
 			raise JobError('Unable to read stored job information!')
 		if self._job_limit < 0 and len(self._job_map) > 0:
 			self._job_limit = max(self._job_map) + 1
+		self._build_state_index()
 
 	def commit(self, jobnum, job_obj):
-		with_file(SafeFile(os.path.join(self._path_db, 'job_%d.txt' % jobnum), 'w'),
-			lambda fp: fp.writelines(self._fmt.format(self._serialize_job_obj(job_obj))))
 		self._job_map[jobnum] = job_obj
+		self._update_state_index(jobnum, job_obj.state)
+		if not self._batch_depth:
+			self._write_jobs([jobnum])
+		else:
+			self._batch_jobnum_set.add(jobnum)
 
 	def get_job(self, jobnum):
 		return self._job_map.get(jobnum)
@@ -47,8 +65,15 @@ class TextFileJobDB(JobDB):
 		return self._job_map.get(jobnum, Job())
 
 	def get_job_transient(self, jobnum):
+		if self._compact:  # avoid creating job objects for job selections / reports
+			return self._job_map.get_view(jobnum, self._default_job_obj)
 		return self._job_map.get(jobnum, self._default_job_obj)
 
+	def _create_job_map(self):
+		if self._compact:
+			return CompactJobMap()
+		return {}
+
 	def _create_job_obj(self, name, data):
 		try:
 			job = Job()
@@ -81,7 +106,58 @@ class TextFileJobDB(JobDB):
 			raise JobError('Unable to parse data in %s:\n%r' % (name, data))
 		return job
 
-	def _read_jobs(self, job_limit):
+	def _fold_batch_log(self):
+		# The job files are updated before the batch log is reset - replaying the old batch log
+		# on top of the new job files (crash between both steps) yields the same job information
+		job_str_dict = dict(self._batch_log_skipped_dict)
+		for jobnum in self._batch_log_jobnum_set:
+			job_str_dict[jobnum] = self._format_job_obj(self._job_map[jobnum])
+		self._write_job_files(sorted(job_str_dict.items()))
+		if self._batch_log_fp is not None:
+			self._batch_log_fp.close()
+		SafeFile(self._batch_log_fn, 'wb').write_close(str2bytes(''))
+		(self._batch_log_fp, self._batch_log_len, self._batch_log_pos) = (None, 0, 0)
+		(self._batch_log_jobnum_set, self._batch_log_skipped_dict) = (set(), {})
+
+	def _format_job_obj(self, job_obj):
+		return str.join('', self._fmt.format(self._serialize_job_obj(job_obj)))
+
+	def _get_batch_log_fp(self):
+		if self._batch_log_fp is None:
+			self._batch_log_fp = open(self._batch_log_fn, 'ab')
+			if self._batch_log_fp.tell() > self._batch_log_pos:  # remove damaged / incomplete tail
+				self._batch_log_fp.truncate(self._batch_log_pos)
+		return self._batch_log_fp
+
+	def _read_batch_log(self, job_map, job_limit):
+		# Apply the changes, which are not yet written to the job files
+		self._batch_log_pos = 0
+		if not os.path.exists(self._batch_log_fn):
+			return
+		fp = open(self._batch_log_fn, 'rb')
+		try:
+			while True:
+				header = fp.read(_BATCH_LOG_RECORD_HEADER.size)
+				if len(header) < _BATCH_LOG_RECORD_HEADER.size:
+					break
+				(jobnum, payload_len, payload_crc) = _BATCH_LOG_RECORD_HEADER.unpack(header)
+				payload = fp.read(payload_len)
+				if (len(payload) < payload_len) or (zlib.crc32(payload) & 0xffffffff != payload_crc):
+					break
+				(self._batch_log_pos, self._batch_log_len) = (fp.tell(), self._batch_log_len + 1)
+				if jobnum >= job_limit >= 0:  # the record is carried over when folding the batch log
+					self._batch_log_skipped_dict[jobnum] = bytes2str(payload)
+					continue
+				try:
+					data = self._fmt.parse(bytes2str(payload))
+					job_map[jobnum] = self._create_job_obj('batch log entry of job %d' % jobnum, data)
+				except Exception:
+					raise JobError('Unable to process batch log entry of job %d' % jobnum)
+				self._batch_log_jobnum_set.add(jobnum)
+		finally:
+			fp.close()
+
+	def _read_job_files(self, job_limit):
 		ensure_dir_exists(self._path_db, 'job database directory', JobError)
 
 		candidates = []
@@ -93,7 +169,7 @@ class TextFileJobDB(JobDB):
 				continue
 			candidates.append((jobnum, job_fn))
 
-		(job_map, max_job_len) = ({}, len(candidates))
+		(job_map, max_job_len) = (self._create_job_map(), len(candidates))
 		activity = Activity('Reading job infos')
 		idx = 0
 		for (jobnum, job_fn) in sorted(candidates):
@@ -113,6 +189,11 @@ class TextFileJobDB(JobDB):
 		activity.finish()
 		return job_map
 
+	def _read_jobs(self, job_limit):
+		job_map = self._read_job_files(job_limit)
+		self._read_batch_log(job_map, job_limit)
+		return job_map
+
 	def _serialize_job_obj(self, job_obj):
 		data = job_obj.get_dict_full()
 		for key, value in job_obj.history.items():
@@ -120,3 +201,31 @@ class TextFileJobDB(JobDB):
 		if job_obj.gc_id is not None:
 			data['id'] = job_obj.get('legacy_gc_id') or job_obj.gc_id  # store legacy gc_id
 		return data
+
+	def _write_batch(self):
+		(jobnum_set, self._batch_jobnum_set) = (self._batch_jobnum_set, set())
+		if jobnum_set:
+			self._write_jobs(sorted(jobnum_set))
+
+	def _write_job_files(self, jobnum_job_str_list):
+		for (jobnum, job_str) in jobnum_job_str_list:
+			with_file(SafeFile(os.path.join(self._path_db, 'job_%d.txt' % jobnum), 'w'),
+				lambda fp: fp.write(job_str))
+
+	def _write_jobs(self, jobnum_list):
+		# All records are appended with a single write - an interrupted write only leaves
+		# an incomplete record at the end of the batch log, which is discarded while reading
+		fp = self._get_batch_log_fp()
+		fp.write(str2bytes('').join(imap(lambda jobnum:
+			_format_batch_log_record(jobnum, self._format_job_obj(self._job_map[jobnum])), jobnum_list)))
+		fp.flush()
+		self._batch_log_jobnum_set.update(jobnum_list)
+		self._batch_log_len += len(jobnum_list)
+		if self._batch_log_len >= self._batch_log_max:
+			self._fold_batch_log()
+
+
+def _format_batch_log_record(jobnum, job_str):
+	payload = str2bytes(job_str)
+	return _BATCH_LOG_RECORD_HEADER.pack(jobnum, len(payload),
+		zlib.crc32(payload) & 0xffffffff) + payload
@@ -28,18 +28,8 @@ class ZippedJobDB(TextFileJobDB):
 		self._db_fn = config.get_work_path('jobs.zip')
 		TextFileJobDB.__init__(self, config, job_limit, job_selector)
 
-	def commit(self, jobnum, job_obj):
-		job_str = str.join('', self._fmt.format(self._serialize_job_obj(job_obj)))
-		tar = zipfile.ZipFile(self._db_fn, 'a', zipfile.ZIP_DEFLATED)
-		try:
-			tar.writestr('J%06d_T%06d' % (jobnum, self._serial), job_str)
-		finally:
-			tar.close()
-		self._serial += 1
-		self._job_map[jobnum] = job_obj
-
-	def _read_jobs(self, job_limit):
-		job_map = {}
+	def _read_job_files(self, job_limit):
+		job_map = self._create_job_map()
 		max_job_len = 0
 		if os.path.exists(self._db_fn):
 			try:
@@ -71,7 +61,7 @@ class ZippedJobDB(TextFileJobDB):
 		return job_map
 
 	def _recover_jobs(self):
-		proc = LocalProcess('zip', '-FF', self._db_fn, '--out', '%s.tmp' % self._db_fn)
+		proc = LocalProcess('zip', '-FF', self._db_fn, '--out', '%s.tmp' % self._db_fn, pty=True)
 		proc.stdin.write('y\n')
 		proc.status(timeout=None)
 		os.rename(self._db_fn, self._db_fn + '.broken')
@@ -93,6 +83,15 @@ class ZippedJobDB(TextFileJobDB):
 		for broken in broken_fn_list:
 			os.system('zip %s -d %s' % (self._db_fn, broken))
 
+	def _write_job_files(self, jobnum_job_str_list):
+		tar = zipfile.ZipFile(self._db_fn, 'a', zipfile.ZIP_DEFLATED)
+		try:
+			for (jobnum, job_str) in jobnum_job_str_list:
+				tar.writestr('J%06d_T%06d' % (jobnum, self._serial), job_str)
+				self._serial += 1
+		finally:
+			tar.close()
+
 
 class Migrate2ZippedJobDB(ZippedJobDB):
 	alias_list = ['migrate']
@@ -110,8 +109,11 @@ class Migrate2ZippedJobDB(ZippedJobDB):
 			new_db = ZippedJobDB(config)
 			try:
 				old_db = TextFileJobDB(config)
+				new_db.begin_batch()
 				for jobnum in old_db.get_job_list():
 					new_db.commit(jobnum, old_db.get_job(jobnum))
+				new_db.commit_batch()
+				new_db._fold_batch_log()
 			except Exception:
 				remove_files([db_fn])
 				raise
@@ -79,37 +79,10 @@ class JobManager(NamedPlugin):  # pylint:disable=too-many-instance-attributes
 		jobs = self.job_db.get_job_list(selector)
 		if jobs:
 			self._log.warning('Cancelling the following jobs:')
-			self._cancel(task, wms, jobs, interactive=self._interactive_cancel, show_jobs=True)
+			self._run_batch(self._cancel, task, wms, jobs, self._interactive_cancel, True)
 
 	def check(self, task, wms):
-		jobnum_list = self._sample(self.job_db.get_job_list(ClassSelector(JobClass.PROCESSING)),
-			self._get_chunk_size(self._chunks_check))
-
-		# Check jobs in the jobnum_list and return changes, timeouts and successfully reported jobs
-		(change, jobnum_list_timeout, reported) = self._check_get_jobnum_list(task, wms, jobnum_list)
-		unreported = len(jobnum_list) - len(reported)
-		if unreported > 0:
-			self._log.log_time(logging.CRITICAL, '%d job(s) did not report their status!', unreported)
-		if change is None:  # neither True or False => abort
-			return False
-
-		# Cancel jobs which took too long
-		if len(jobnum_list_timeout):
-			change = True
-			self._log.warning('Timeout for the following jobs:')
-			self._cancel(task, wms, jobnum_list_timeout, interactive=False, show_jobs=True)
-
-		# Process task interventions
-		self._process_intervention(task, wms)
-
-		# Quit when all jobs are finished
-		if self.job_db.get_job_len(ClassSelector(JobClass.ENDSTATE)) == len(self.job_db):
-			self._log_disabled_jobs()
-			if task.can_finish():
-				self._local_event_handler.on_task_finish(task, len(self.job_db))
-				abort(True)
-
-		return change
+		return self._run_batch(self._check, task, wms)
 
 	def finish(self):
 		self._local_event_handler.on_workflow_finish()
@@ -124,71 +97,20 @@ class JobManager(NamedPlugin):  # pylint:disable=too-many-instance-attributes
 			self._abort_report.show_report(self.job_db, jobnum_list)
 			ask_user_msg = 'Are you sure you want to reset the state of these jobs?'
 			if self._interactive_reset or self._uii.prompt_bool(ask_user_msg, False):
-				self._cancel(task, wms, self.job_db.get_job_list(
-					ClassSelector(JobClass.PROCESSING), jobnum_list), interactive=False, show_jobs=False)
-				for jobnum in jobnum_list:
-					self.job_db.commit(jobnum, Job())
+				self.job_db.begin_batch()
+				try:
+					self._cancel(task, wms, self.job_db.get_job_list(
+						ClassSelector(JobClass.PROCESSING), jobnum_list), interactive=False, show_jobs=False)
+					for jobnum in jobnum_list:
+						self.job_db.commit(jobnum, Job())
+				finally:
+					self.job_db.commit_batch()
 
 	def retrieve(self, task, wms):
-		change = False
-		jobnum_list = self._sample(self.job_db.get_job_list(ClassSelector(JobClass.DONE)),
-			self._get_chunk_size(self._chunks_retrieve))
-
-		job_output_iter = wms.retrieve_jobs(self._get_wms_args(jobnum_list))
-		for (jobnum, exit_code, data, outputdir) in job_output_iter:
-			job_obj = self.job_db.get_job(jobnum)
-			if job_obj is None:
-				continue
-
-			if exit_code == 0:
-				state = Job.SUCCESS
-			elif exit_code == 107:  # set ABORTED instead of FAILED for errorcode 107
-				state = Job.ABORTED
-			else:
-				state = Job.FAILED
-
-			if state == Job.SUCCESS:
-				if not self._output_processor.process(outputdir, task):
-					exit_code = 108
-					state = Job.FAILED
-
-			if state != job_obj.state:
-				change = True
-				job_obj.set('retcode', exit_code)
-				job_obj.set('runtime', data.get('TIME', -1))
-				self._update(task, job_obj, jobnum, state)
-				self._local_event_handler.on_job_output(task, wms, job_obj, jobnum, exit_code)
-
-			if abort():
-				return False
-
-		return change
+		return self._run_batch(self._retrieve, task, wms)
 
 	def submit(self, task, wms):
-		jobnum_list = self._submit_get_jobs(task)
-		if len(jobnum_list) == 0:
-			return False
-
-		submitted = []
-		for (jobnum, gc_id, data) in wms.submit_jobs(jobnum_list, task):
-			submitted.append(jobnum)
-			job_obj = self.job_db.get_job_persistent(jobnum)
-			job_obj.clear_old_state()
-
-			if gc_id is None:
-				# Could not register at WMS
-				self._update(task, job_obj, jobnum, Job.FAILED)
-				continue
-
-			job_obj.assign_id(gc_id)
-			for (key, value) in data.items():
-				job_obj.set(key, value)
-
-			self._update(task, job_obj, jobnum, Job.SUBMITTED)
-			self._local_event_handler.on_job_submit(task, wms, job_obj, jobnum)
-			if abort():
-				return False
-		return len(submitted) != 0
+		return self._run_batch(self._submit, task, wms)
 
 	def _cancel(self, task, wms, jobnum_list, interactive, show_jobs):
 		if len(jobnum_list) == 0:
@@ -220,6 +142,36 @@ class JobManager(NamedPlugin):  # pylint:disable=too-many-instance-attributes
 		if interactive:
 			wait(2)
 
+	def _check(self, task, wms):
+		jobnum_list = self._sample(self.job_db.get_job_list(ClassSelector(JobClass.PROCESSING)),
+			self._get_chunk_size(self._chunks_check))
+
+		# Check jobs in the jobnum_list and return changes, timeouts and successfully reported jobs
+		(change, jobnum_list_timeout, reported) = self._check_get_jobnum_list(task, wms, jobnum_list)
+		unreported = len(jobnum_list) - len(reported)
+		if unreported > 0:
+			self._log.log_time(logging.CRITICAL, '%d job(s) did not report their status!', unreported)
+		if change is None:  # neither True or False => abort
+			return False
+
+		# Cancel jobs which took too long
+		if len(jobnum_list_timeout):
+			change = True
+			self._log.warning('Timeout for the following jobs:')
+			self._cancel(task, wms, jobnum_list_timeout, interactive=False, show_jobs=True)
+
+		# Process task interventions
+		self._process_intervention(task, wms)
+
+		# Quit when all jobs are finished
+		if self.job_db.get_job_len(ClassSelector(JobClass.ENDSTATE)) == len(self.job_db):
+			self._log_disabled_jobs()
+			if task.can_finish():
+				self._local_event_handler.on_task_finish(task, len(self.job_db))
+				abort(True)
+
+		return change
+
 	def _check_get_jobnum_list(self, task, wms, jobnum_list):
 		(change, jobnum_list_timeout, reported) = (False, [], [])
 		if not jobnum_list:
@@ -274,7 +226,8 @@ class JobManager(NamedPlugin):  # pylint:disable=too-many-instance-attributes
 			if can_submit and can_retry:
 				jobnum_list_enabled.append(jobnum)
 			if can_submit and (job_obj.state == Job.DISABLED):  # recover jobs
-				self._update(task, job_obj, jobnum, Job.INIT, reason='reenabled by task module')
+				self._update(task, self.job_db.get_job_persistent(jobnum),
+					jobnum, Job.INIT, reason='reenabled by task module')
 			elif not can_submit and (job_obj.state != Job.DISABLED):  # disable invalid jobs
 				self._update(task, self.job_db.get_job_persistent(jobnum),
 					jobnum, Job.DISABLED, reason='disabled by task module')
@@ -357,11 +310,81 @@ class JobManager(NamedPlugin):  # pylint:disable=too-many-instance-attributes
 		if applied_change:
 			self._log.log_time(logging.INFO, 'All requested changes are applied')
 
+	def _retrieve(self, task, wms):
+		change = False
+		jobnum_list = self._sample(self.job_db.get_job_list(ClassSelector(JobClass.DONE)),
+			self._get_chunk_size(self._chunks_retrieve))
+
+		job_output_iter = wms.retrieve_jobs(self._get_wms_args(jobnum_list))
+		for (jobnum, exit_code, data, outputdir) in job_output_iter:
+			job_obj = self.job_db.get_job(jobnum)
+			if job_obj is None:
+				continue
+
+			if exit_code == 0:
+				state = Job.SUCCESS
+			elif exit_code == 107:  # set ABORTED instead of FAILED for errorcode 107
+				state = Job.ABORTED
+			else:
+				state = Job.FAILED
+
+			if state == Job.SUCCESS:
+				if not self._output_processor.process(outputdir, task):
+					exit_code = 108
+					state = Job.FAILED
+
+			if state != job_obj.state:
+				change = True
+				job_obj.set('retcode', exit_code)
+				job_obj.set('runtime', data.get('TIME', -1))
+				self._update(task, job_obj, jobnum, state)
+				self._local_event_handler.on_job_output(task, wms, job_obj, jobnum, exit_code)
+
+			if abort():
+				return False
+
+		return change
+
+	def _run_batch(self, fun, *args):
+		# All job changes during the job cycle action are written to the job database together
+		self.job_db.begin_batch()
+		try:
+			return fun(*args)
+		finally:
+			self.job_db.commit_batch()
+
 	def _sample(self, jobnum_list, size):
 		if size >= 0:
 			jobnum_list = random.sample(jobnum_list, min(size, len(jobnum_list)))
 		return sorted(jobnum_list)
 
+	def _submit(self, task, wms):
+		jobnum_list = self._submit_get_jobs(task)
+		if len(jobnum_list) == 0:
+			return False
+
+		submitted = []
+		for (jobnum, gc_id, data) in wms.submit_jobs(jobnum_list, task):
+			submitted.append(jobnum)
+			job_obj = self.job_db.get_job_persistent(jobnum)
+			job_obj.clear_old_state()
+
+			if gc_id is None:
+				# Could not register at WMS
+				self._update(task, job_obj, jobnum, Job.FAILED)
+				continue
+
+			job_obj.assign_id(gc_id)
+			for (key, value) in data.items():
+				job_obj.set(key, value)
+
+			self._update(task, job_obj, jobnum, Job.SUBMITTED)
+			self.job_db.flush_batch()  # the gc_id is stored immediately - even during a batch
+			self._local_event_handler.on_job_submit(task, wms, job_obj, jobnum)
+			if abort():
+				return False
+		return len(submitted) != 0
+
 	def _submit_get_jobs(self, task):
 		# Get list of submittable jobs
 		jobnum_list_ready = self.job_db.get_job_list(ClassSelector(JobClass.SUBMIT_CANDIDATES))
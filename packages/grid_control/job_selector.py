@@ -34,6 +34,14 @@ class JobSelector(Plugin):
 		return None
 	create = staticmethod(create)
 
+	def get_required_state_list(self):
+		# Return list of states that selected jobs are required to have (None: no restriction)
+		return self.get_state_list()
+
+	def get_state_list(self):
+		# Return list of states if the selector selects exactly all jobs in these states
+		return None
+
 
 class AndJobSelector(JobSelector):  # Internally used
 	def __new__(cls, *args):
@@ -53,6 +61,23 @@ class AndJobSelector(JobSelector):  # Internally used
 	def __repr__(self):
 		return self._repr_base(str.join('&', imap(repr, self._selectors)))
 
+	def get_required_state_list(self):
+		result = None
+		for selector in self._selectors:
+			state_list = selector.get_required_state_list()
+			if state_list is not None:
+				result = lfilter(lambda state: (result is None) or (state in result), state_list)
+		return result
+
+	def get_state_list(self):
+		result = None
+		for selector in self._selectors:
+			state_list = selector.get_state_list()
+			if state_list is None:
+				return None
+			result = lfilter(lambda state: (result is None) or (state in result), state_list)
+		return result
+
 
 class ClassSelector(JobSelector):
 	def __init__(self, arg, **kwargs):
@@ -64,6 +89,9 @@ class ClassSelector(JobSelector):
 	def __repr__(self):
 		return self._repr_base(JobClass.lookup_job_class_name(self._state_list))
 
+	def get_state_list(self):
+		return list(self._state_list)
+
 
 class IDSelector(JobSelector):
 	alias_list = ['id']
@@ -169,6 +197,9 @@ class StateSelector(JobSelector):
 	def __repr__(self):
 		return self._repr_base(str.join(',', sorted(imap(Job.enum2str, self._state_list))))
 
+	def get_state_list(self):
+		return list(self._state_list)
+
 
 class StuckSelector(JobSelector):
 	alias_list = ['stuck']
@@ -15,15 +15,15 @@
 import os, time, logging
 from grid_control.gc_plugin import ConfigurablePlugin
 from grid_control.parameters.psource_base import ParameterError, ParameterInfo, ParameterMetadata, ParameterSource  # pylint:disable=line-too-long
-from grid_control.utils import ensure_dir_exists
+from grid_control.utils import ensure_dir_exists, remove_files
 from grid_control.utils.activity import Activity
-from grid_control.utils.algos import filter_dict, get_list_difference, reverse_dict
-from grid_control.utils.data_structures import make_enum
+from grid_control.utils.algos import get_list_difference, reverse_dict
+from grid_control.utils.data_structures import LRUCache, make_enum
 from grid_control.utils.file_tools import GZipTextFile
 from grid_control.utils.parsing import str_time_short
 from grid_control.utils.user_interface import UserInputInterface
 from hpfwk import APIError
-from python_compat import ifilter, iidfilter, imap, irange, itemgetter, lfilter, lmap, md5_hex, set, sort_inplace, sorted  # pylint:disable=line-too-long
+from python_compat import ifilter, iidfilter, imap, irange, itemgetter, izip, lfilter, lmap, md5_hex, set, sort_inplace, sorted  # pylint:disable=line-too-long
 
 
 # TrackingInfo enum values == fast resync tuple indices
@@ -46,15 +46,7 @@ class ParameterAdapter(ConfigurablePlugin):
 		return self.get_job_content(jobnum)[ParameterInfo.ACTIVE]
 
 	def get_job_content(self, jobnum, pnum=None):
-		if pnum is None:
-			pnum = jobnum
-		if jobnum is None:
-			raise APIError('Unable to process job number None!')
-		result = {ParameterInfo.ACTIVE: True, ParameterInfo.REQS: []}
-		result['GC_JOB_ID'] = jobnum
-		result['GC_PARAM'] = pnum
-		self._psrc.fill_parameter_content(pnum, result)
-		return filter_dict(result, value_filter=lambda x: x != '')
+		return self._get_job_content(jobnum, pnum)
 
 	def get_job_len(self):
 		return self._psrc.get_parameter_len()
@@ -68,8 +60,7 @@ class ParameterAdapter(ConfigurablePlugin):
 		return self._psrc.get_used_psrc_list()
 
 	def iter_jobs(self):
-		for jobnum in irange(self.get_job_len() or 0):
-			yield self.get_job_content(jobnum)
+		return self._iter_job_content(irange(self.get_job_len() or 0))
 
 	def resync(self, force=False):
 		return self._psrc.resync_psrc()
@@ -77,6 +68,38 @@ class ParameterAdapter(ConfigurablePlugin):
 	def show(self):
 		return self._psrc.show_psrc()
 
+	def _get_job_content(self, jobnum, pnum=None):
+		if pnum is None:
+			pnum = jobnum
+		return ParameterAdapter._get_job_content_batch(self, [jobnum], [pnum])[0]
+
+	def _get_job_content_batch(self, jobnum_list, pnum_list=None):
+		if pnum_list is None:
+			pnum_list = jobnum_list
+		if None in jobnum_list:
+			raise APIError('Unable to process job number None!')
+		result_list = []
+		for (jobnum, pnum) in izip(jobnum_list, pnum_list):
+			result_list.append({ParameterInfo.ACTIVE: True, ParameterInfo.REQS: [],
+				'GC_JOB_ID': jobnum, 'GC_PARAM': pnum})
+		self._psrc.fill_parameter_content_batch(pnum_list, result_list)
+		for result in ifilter(lambda result: '' in result.values(), result_list):
+			for key in [key for (key, value) in result.items() if value == '']:  # remove unset parameters
+				result.pop(key)
+		return result_list
+
+	def _iter_job_content(self, jobnum_iter, chunk_size=1000):
+		# Parameter space points are retrieved in chunks to profit from the batch interface
+		jobnum_list = []
+		for jobnum in jobnum_iter:
+			jobnum_list.append(jobnum)
+			if len(jobnum_list) >= chunk_size:
+				for result in self._get_job_content_batch(jobnum_list):
+					yield result
+				jobnum_list = []
+		for result in self._get_job_content_batch(jobnum_list):
+			yield result
+
 
 class ResyncParameterAdapter(ParameterAdapter):
 	def __init__(self, config, source):
@@ -113,16 +136,31 @@ class BasicParameterAdapter(ResyncParameterAdapter):
 	def __init__(self, config, source):
 		ResyncParameterAdapter.__init__(self, config, source)
 		self._can_submit_map = {}
+		# Parameter space points are requested several times by the task module during submission
+		self._psp_cache = LRUCache(config.get_int('parameter cache size', 1000, on_change=None))
 
 	def can_submit(self, jobnum):  # Use caching to speed up job manager operations
-		if jobnum not in self._can_submit_map:
-			self._can_submit_map[jobnum] = ParameterAdapter.can_submit(self, jobnum)
+		if jobnum not in self._can_submit_map:  # bypass the psp cache - all ready jobs are checked
+			self._can_submit_map[jobnum] = self._get_job_content(jobnum)[ParameterInfo.ACTIVE]
 		return self._can_submit_map[jobnum]
 
+	def get_job_content(self, jobnum, pnum=None):
+		psp = self._psp_cache.get((jobnum, pnum))
+		if psp is None:
+			psp = self._get_job_content(jobnum, pnum)
+			self._psp_cache.put((jobnum, pnum), psp)
+		return dict(psp)  # callers are allowed to modify the returned parameter space point
+
+	def get_psp_cache_stats(self):
+		return {'hits': self._psp_cache.hits, 'misses': self._psp_cache.misses,
+			'size': len(self._psp_cache)}
+
 	def resync(self, force=False):
 		result = ResyncParameterAdapter.resync(self, force)
 		if result not in (None, ParameterSource.get_empty_resync_result()):
+			self._log.log(logging.DEBUG, 'Parameter cache statistics: %s', self.get_psp_cache_stats())
 			self._can_submit_map = {}  # invalidate cache on changes
+			self._psp_cache.clear()
 		return result
 
 
@@ -136,12 +174,14 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 		self._map_jobnum2pnum = {}
 		ensure_dir_exists(config.get_work_path(), 'parameter storage directory', ParameterError)
 		self._path_jobnum2pnum = config.get_work_path('params.map.gz')
-		self._path_params = config.get_work_path('params.dat.gz')
+		self._path_params = config.get_work_path('params.dat')
+		self._path_params_text = config.get_work_path('params.dat.gz')  # parameter dump of old versions
 
 		# Find out if init should be performed - overrides resync_requested!
 		init_requested = config.get_state('init', detail='parameters')
 		init_needed = False
-		if not (os.path.exists(self._path_params) and os.path.exists(self._path_jobnum2pnum)):
+		path_params_exists = os.path.exists(self._path_params) or os.path.exists(self._path_params_text)
+		if not (path_params_exists and os.path.exists(self._path_jobnum2pnum)):
 			init_needed = True  # Init needed if no parameter log exists
 		if init_requested and not init_needed and (source.get_parameter_len() is not None):
 			self._log.warning('Re-Initialization will overwrite the current mapping ' +
@@ -161,9 +201,7 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 		resync_by_psrc = self._psrc_raw.get_resync_request()
 
 		if do_init:  # Write current state
-			self._write_jobnum2pnum(self._path_jobnum2pnum)
-			ParameterSource.get_class('GCDumpParameterSource').write(self._path_params,
-				self.get_job_len(), self.get_job_metadata(), self.iter_jobs())
+			self._write_params()
 		elif resync_by_user or resync_by_psrc or psrc_hash_changed:  # Perform sync
 			if psrc_hash_changed:
 				self._log.info('Parameter hash has changed')
@@ -185,15 +223,52 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 			return  # do not set parameter hash in config
 		config.set('parameter hash', self._psrc_raw.get_psrc_hash())
 
-	def get_job_content(self, jobnum, pnum=None):
+	def _get_job_content(self, jobnum, pnum=None):
+		return self._get_job_content_batch([jobnum])[0]
+
+	def _get_job_content_batch(self, jobnum_list, pnum_list=None):
 		# Perform mapping between jobnum and parameter number
-		pnum = self._map_jobnum2pnum.get(jobnum, jobnum)
-		if (self._psrc.get_parameter_len() is None) or (pnum < self._psrc.get_parameter_len()):
-			result = BasicParameterAdapter.get_job_content(self, jobnum, pnum)
-		else:
-			result = {ParameterInfo.ACTIVE: False}
-		result['GC_JOB_ID'] = jobnum
-		return result
+		pnum_len = self._psrc.get_parameter_len()
+		jobnum_pnum_list = []
+		for jobnum in jobnum_list:
+			pnum = self._map_jobnum2pnum.get(jobnum, jobnum)
+			if (pnum_len is None) or (pnum < pnum_len):
+				jobnum_pnum_list.append((jobnum, pnum))
+		map_jobnum2result = {}
+		if jobnum_pnum_list:
+			map_jobnum2result = dict(izip(imap(itemgetter(0), jobnum_pnum_list),
+				BasicParameterAdapter._get_job_content_batch(self,
+				lmap(itemgetter(0), jobnum_pnum_list), lmap(itemgetter(1), jobnum_pnum_list))))
+		result_list = []
+		for jobnum in jobnum_list:
+			result = map_jobnum2result.get(jobnum, {ParameterInfo.ACTIVE: False})
+			result['GC_JOB_ID'] = jobnum
+			result_list.append(result)
+		return result_list
+
+	def _get_pa_old(self):
+		if os.path.exists(self._path_params):
+			return ParameterAdapter(None,
+				ParameterSource.create_instance('GCBinaryDumpParameterSource', self._path_params))
+		return ParameterAdapter(None,
+			ParameterSource.create_instance('GCDumpParameterSource', self._path_params_text))
+
+	def _get_pspi_list_updated(self, pa_new, pspi_list_old, pnum_set_changed):
+		# Derive tracking information of the new parameter space from the stored tracking information
+		# of unchanged parameter space points - only changed points are evaluated again
+		pnum_len = pa_new.get_job_len()
+		if pnum_len is None:
+			return
+		pspi_list_new = [None] * pnum_len
+		for (is_active, hash_str, jobnum) in pspi_list_old:
+			pnum = self._map_jobnum2pnum.get(jobnum, jobnum)
+			if pnum < pnum_len:
+				pspi_list_new[pnum] = (is_active, hash_str, pnum)
+		meta_list = _get_tracked_meta_list(pa_new.get_job_metadata())
+		for pnum in ifilter(lambda pnum: pnum < pnum_len, pnum_set_changed):
+			pspi_list_new[pnum] = _get_pspi(meta_list, pa_new.get_job_content(pnum), pnum)
+		if None not in pspi_list_new:
+			return pspi_list_new
 
 	def _read_jobnum2pnum(self):
 		fp = GZipTextFile(self._path_jobnum2pnum, 'r')
@@ -205,9 +280,17 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 			jobnum_pnum_info_iter = iidfilter(imap(str.strip, fp.readline().split(',')))
 			self._map_jobnum2pnum = dict(imap(_translate_info, jobnum_pnum_info_iter))
 			self._can_submit_map = {}
+			self._psp_cache.clear()
 		finally:
 			fp.close()
 
+	def _read_pspi_list(self):
+		# Read stored tracking information of the parameter dump (None if not available)
+		if os.path.exists(self._path_params):
+			psrc_dump = ParameterSource.create_instance('GCBinaryDumpParameterSource', self._path_params)
+			return lmap(lambda jobnum_info: (jobnum_info[1][0], jobnum_info[1][1], jobnum_info[0]),
+				enumerate(psrc_dump.iter_tracking_info()))
+
 	def _resync(self):  # This function is _VERY_ time critical!
 		tmp = self._psrc_raw.resync_psrc()  # First ask about psrc changes
 		(result_redo, result_disable, size_change) = (set(tmp[0]), set(tmp[1]), tmp[2])
@@ -217,34 +300,35 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 		if not (result_redo or result_disable or size_change or psrc_hash_changed):
 			return ParameterSource.get_empty_resync_result()
 
-		ps_old = ParameterSource.create_instance('GCDumpParameterSource', self._path_params)
-		pa_old = ParameterAdapter(None, ps_old)
 		pa_new = ParameterAdapter(None, self._psrc_raw)
-		return self._resync_adapter(pa_old, pa_new, result_redo, result_disable, size_change)
-
-	def _resync_adapter(self, pa_old, pa_new, result_redo, result_disable, size_change):
-		(map_jobnum2pnum, pspi_list_added, pspi_list_missing) = _diff_pspi_list(pa_old, pa_new,
-			result_redo, result_disable)
+		(pspi_list_old, pspi_list_new) = (self._read_pspi_list(), None)
+		if pspi_list_old is None:  # fallback to tracking information from the parameter dump
+			pspi_list_old = list(_translate_pa2pspi_list(self._get_pa_old()))
+		elif not (size_change or psrc_hash_changed):
+			pspi_list_new = self._get_pspi_list_updated(pa_new, pspi_list_old,
+				result_redo.union(result_disable))
+		if pspi_list_new is None:
+			pspi_list_new = _translate_pa2pspi_list(pa_new)
+		return self._resync_adapter(pspi_list_old, pa_new, pspi_list_new,
+			result_redo, result_disable, size_change)
+
+	def _resync_adapter(self, pspi_list_old, pa_new, pspi_list_new,
+			result_redo, result_disable, size_change):
+		(map_jobnum2pnum, pspi_list_added, pspi_list_missing) = _diff_pspi_list(
+			pspi_list_old, pspi_list_new, result_redo, result_disable)
 		# Reorder and reconstruct parameter space with the following layout:
 		# NNNNNNNNNNNNN OOOOOOOOO | source: NEW (==self) and OLD (==from file)
 		# <same><added> <missing> | same: both in NEW and OLD, added: only in NEW, missing: only in OLD
 		if pspi_list_added:
-			_extend_map_jobnum2pnum(map_jobnum2pnum, pa_old.get_job_len(), pspi_list_added)
+			_extend_map_jobnum2pnum(map_jobnum2pnum, len(pspi_list_old), pspi_list_added)
 		if pspi_list_missing:
 			# extend the parameter source by placeholders for the missing parameter space points
-			psrc_missing = _create_placeholder_psrc(pa_old, pa_new,
+			psrc_missing = _create_placeholder_psrc(self._get_pa_old(), pa_new,
 				map_jobnum2pnum, pspi_list_missing, result_disable)
 			self._psrc = ParameterSource.create_instance('ChainParameterSource',
 				self._psrc_raw, psrc_missing)
 
 		self._map_jobnum2pnum = map_jobnum2pnum  # Update Job2PID map
-		# Write resynced state
-		self._write_jobnum2pnum(self._path_jobnum2pnum + '.tmp')
-		ParameterSource.get_class('GCDumpParameterSource').write(self._path_params + '.tmp',
-			self.get_job_len(), self.get_job_metadata(), self.iter_jobs())
-		os.rename(self._path_jobnum2pnum + '.tmp', self._path_jobnum2pnum)
-		os.rename(self._path_params + '.tmp', self._path_params)
-
 		result_redo = result_redo.difference(result_disable)
 		if result_redo or result_disable:
 			map_pnum2jobnum = reverse_dict(self._map_jobnum2pnum)
@@ -253,8 +337,12 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 				return map_pnum2jobnum.get(pnum, pnum)
 			result_redo = set(imap(_translate_pnum, result_redo))
 			result_disable = set(imap(_translate_pnum, result_disable))
-			return (result_redo, result_disable, size_change)
-		return (set(), set(), size_change)
+
+		# Write resynced state - unchanged jobs keep their (identical) entries in the parameter dump
+		jobnum_set_changed = result_redo.union(result_disable)
+		jobnum_set_changed.update(irange(len(pspi_list_old), self.get_job_len() or 0))
+		self._write_params(jobnum_set_changed)
+		return (result_redo, result_disable, size_change)
 
 	def _write_jobnum2pnum(self, fn):
 		fp = GZipTextFile(fn, 'w')
@@ -267,6 +355,35 @@ class TrackedParameterAdapter(BasicParameterAdapter):
 		finally:
 			fp.close()
 
+	def _write_params(self, jobnum_set_changed=None):
+		# Write parameter dump together with the tracking hash of each parameter space point -
+		# existing dumps are updated with the changed jobs if possible
+		meta_list = self.get_job_metadata()
+		meta_list_tracked = _get_tracked_meta_list(meta_list)
+		job_len = self.get_job_len() or 0
+
+		def _iter_dump_rows(jobnum_iter):
+			for psp in self._iter_job_content(jobnum_iter):
+				jobnum = psp['GC_JOB_ID']
+				yield (jobnum, psp, _get_pspi(meta_list_tracked, psp, jobnum)[TrackingInfo.HASH])
+
+		self._write_jobnum2pnum(self._path_jobnum2pnum + '.tmp')
+		if (jobnum_set_changed is not None) and os.path.exists(self._path_params):
+			# Only the rows of the changed jobs are written to the existing dump - this requires an
+			# unchanged set of tracked variables, since it defines the stored columns and the tracking
+			# hash of every row. Otherwise the rows outside of redo / disable would become stale.
+			meta_list_tracked_old = _get_tracked_meta_list(self._get_pa_old().get_job_metadata())
+			if lmap(lambda meta: meta.value, meta_list_tracked_old) != lmap(lambda meta: meta.value,
+					meta_list_tracked):
+				jobnum_set_changed = None
+		dump_cls = ParameterSource.get_class('GCBinaryDumpParameterSource')
+		if (jobnum_set_changed is None) or not os.path.exists(self._path_params) or not dump_cls.update(
+				self._path_params, job_len, meta_list, _iter_dump_rows(sorted(jobnum_set_changed))):
+			dump_cls.write(self._path_params + '.tmp', job_len, meta_list, _iter_dump_rows(irange(job_len)))
+			os.rename(self._path_params + '.tmp', self._path_params)
+			remove_files([self._path_params_text])
+		os.rename(self._path_jobnum2pnum + '.tmp', self._path_jobnum2pnum)
+
 
 def _create_placeholder_psrc(pa_old, pa_new, map_jobnum2pnum, pspi_list_missing, result_disable):
 	# Construct placeholder parameter source with missing parameter entries and intervention state
@@ -289,7 +406,7 @@ def _create_placeholder_psrc(pa_old, pa_new, map_jobnum2pnum, pspi_list_missing,
 		psp_list_missing, meta_list_missing)
 
 
-def _diff_pspi_list(pa_old, pa_new, result_redo, result_disable):
+def _diff_pspi_list(pspi_list_old, pspi_list_new, result_redo, result_disable):
 	map_jobnum2pnum = {}
 
 	def _handle_matching_pspi(pspi_list_added, pspi_list_missing, pspi_list_same, pspi_old, pspi_new):
@@ -300,8 +417,7 @@ def _diff_pspi_list(pa_old, pa_new, result_redo, result_disable):
 			result_disable.add(pspi_new[TrackingInfo.pnum])
 	# pspi_list_changed is ignored, since it is already processed by the change handler above
 	(pspi_list_added, pspi_list_missing, _) = get_list_difference(
-		_translate_pa2pspi_list(pa_old), _translate_pa2pspi_list(pa_new),
-		itemgetter(TrackingInfo.HASH), _handle_matching_pspi)
+		pspi_list_old, pspi_list_new, itemgetter(TrackingInfo.HASH), _handle_matching_pspi)
 	return (map_jobnum2pnum, pspi_list_added, pspi_list_missing)
 
 
@@ -313,12 +429,19 @@ def _extend_map_jobnum2pnum(map_jobnum2pnum, jobnum_start, pspi_list_added):
 			map_jobnum2pnum[jobnum_start + pspi_idx] = pspi_added[TrackingInfo.pnum]
 
 
+def _get_pspi(meta_list, psp, pnum):
+	# Translates parameter space point into hash
+	psp_item_iter = imap(lambda meta: (meta.value, psp.get(meta.value)), meta_list)
+	hash_str = md5_hex(repr(lfilter(itemgetter(1), psp_item_iter)))
+	return (psp[ParameterInfo.ACTIVE], hash_str, pnum)
+
+
+def _get_tracked_meta_list(meta_list):
+	return sorted(ifilter(lambda k: not k.untracked, meta_list), key=lambda k: k.value)
+
+
 def _translate_pa2pspi_list(padapter):
 	# Reduces parameter adapter output to essential information for diff - faster than keying
-	meta_iter = ifilter(lambda k: not k.untracked, padapter.get_job_metadata())
-	meta_list = sorted(meta_iter, key=lambda k: k.value)
-
-	for psp in padapter.iter_jobs():  # Translates parameter space point into hash
-		psp_item_iter = imap(lambda meta: (meta.value, psp.get(meta.value)), meta_list)
-		hash_str = md5_hex(repr(lfilter(itemgetter(1), psp_item_iter)))
-		yield (psp[ParameterInfo.ACTIVE], hash_str, psp['GC_PARAM'])
+	meta_list = _get_tracked_meta_list(padapter.get_job_metadata())
+	for psp in padapter.iter_jobs():
+		yield _get_pspi(meta_list, psp, psp['GC_PARAM'])
@@ -15,7 +15,7 @@
 import time, logging
 from grid_control.utils.data_structures import make_enum
 from hpfwk import AbstractError, NestedException, Plugin
-from python_compat import set
+from python_compat import izip, set
 
 
 ParameterInfo = make_enum(['ACTIVE', 'HASH', 'REQS', 'FILES'])  # pylint:disable=invalid-name
@@ -63,6 +63,12 @@ class ParameterSource(Plugin):
 	def fill_parameter_content(self, pnum, result):
 		raise AbstractError
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		# Fill parameter space points of several parameter numbers at once - sources can override
+		# this to perform their lookups / index calculations only once per batch
+		for (pnum, result) in izip(pnum_list, result_list):
+			self.fill_parameter_content(pnum, result)
+
 	def fill_parameter_metadata(self, result):
 		raise AbstractError
 
@@ -136,6 +142,9 @@ class NullParameterSource(ParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		pass
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		pass
+
 	def fill_parameter_metadata(self, result):
 		pass
 
@@ -18,7 +18,7 @@ from grid_control.config import ConfigError
 from grid_control.parameters.psource_base import ParameterInfo, ParameterMetadata, ParameterSource
 from grid_control.utils.parsing import parse_time, parse_type, str_dict_linear
 from hpfwk import ignore_exception
-from python_compat import imap, lmap, md5_hex
+from python_compat import imap, izip, lmap, md5_hex
 
 
 class ImmutableParameterSource(ParameterSource):
@@ -136,6 +136,10 @@ class ConstParameterSource(SingleParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		result[self._output_vn] = self._value
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for result in result_list:
+			result[self._output_vn] = self._value
+
 	def show_psrc(self):
 		return ['%s: const = %s, value = %s' % (self.__class__.__name__, self._output_vn, self._value)]
 
@@ -153,6 +157,10 @@ class CounterParameterSource(SingleParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		result[self._output_vn] = self._seed + result['GC_JOB_ID']
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for result in result_list:
+			result[self._output_vn] = self._seed + result['GC_JOB_ID']
+
 	def show_psrc(self):
 		return ['%s: var = %s, start = %s' % (self.__class__.__name__, self._output_vn, self._seed)]
 
@@ -171,6 +179,14 @@ class FormatterParameterSource(SingleParameterSource):
 		src = parse_type(str(result.get(self._source, self._default)))
 		result[self._output_vn] = self._fmt % src
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		map_src2value = {}  # each distinct source value is only parsed and formatted once
+		for result in result_list:
+			src = str(result.get(self._source, self._default))
+			if src not in map_src2value:
+				map_src2value[src] = self._fmt % parse_type(src)
+			result[self._output_vn] = map_src2value[src]
+
 	def show_psrc(self):
 		return ['%s: var = %s, fmt = %r, source = %s, default = %r' %
 			(self.__class__.__name__, self._output_vn, self._fmt, self._source, self._default)]
@@ -250,6 +266,10 @@ class SimpleParameterSource(SingleParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		result[self._output_vn] = self._value_list[pnum]
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for (pnum, result) in izip(pnum_list, result_list):
+			result[self._output_vn] = self._value_list[pnum]
+
 	def get_parameter_len(self):
 		return len(self._value_list)
 
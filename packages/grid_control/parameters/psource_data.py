@@ -20,7 +20,7 @@ from grid_control.parameters.psource_base import LimitedResyncParameterSource, N
 from grid_control.utils import ensure_dir_exists, rename_file
 from grid_control.utils.activity import Activity, ProgressActivity
 from grid_control.utils.parsing import str_time_long
-from python_compat import md5_hex, set
+from python_compat import itemgetter, izip, md5_hex, set, sorted
 
 
 class BaseDataParameterSource(LimitedResyncParameterSource):
@@ -55,6 +55,11 @@ class BaseDataParameterSource(LimitedResyncParameterSource):
 		partition = self._reader.get_partition_checked(pnum)
 		self._part_proc.process(pnum, partition, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		# partitions are read in sequential order - to profit from the chunk cache of the reader
+		for (pnum, result) in sorted(izip(pnum_list, result_list), key=itemgetter(0)):
+			self._part_proc.process(pnum, self._reader.get_partition_checked(pnum), result)
+
 	def fill_parameter_metadata(self, result):
 		result.extend(self._part_proc.get_partition_metadata() or [])
 
@@ -115,6 +120,7 @@ class DataParameterSource(BaseDataParameterSource):
 
 		# Settings:
 		(self._dn, self._keep_old) = (config.get_work_path(), keep_old)
+		self._binary_cache = config.get_bool('%s binary cache' % datasource_name, False, on_change=None)
 		ensure_dir_exists(self._dn, 'partition map directory', DatasetError)
 		self._set_reader(self._init_reader())
 
@@ -152,7 +158,7 @@ class DataParameterSource(BaseDataParameterSource):
 			else:
 				provider = DataProvider.load_from_file(self._get_data_path('cache.dat'))
 			block_iter = DataProvider.save_to_file_iter(self._get_data_path('cache.dat.init'),
-				provider.get_block_list_cached(show_stats=True))
+				provider.get_block_list_cached(show_stats=True), binary=self._binary_cache)
 			partition_iter = self._splitter.split_partitions(block_iter)
 			DataSplitter.save_partitions(self._get_data_path('map.tar.init'), partition_iter)
 			rename_file(self._get_data_path('cache.dat.init'), self._get_data_path('cache.dat'))
@@ -180,7 +186,8 @@ class DataParameterSource(BaseDataParameterSource):
 		block_list_old = provider_old.get_block_list_cached(show_stats=False)
 		self._provider.clear_cache()
 		block_list_new = self._provider.get_block_list_cached(show_stats=False)
-		self._provider.save_to_file(self._get_data_path('cache-new.dat'), block_list_new)
+		self._provider.save_to_file(self._get_data_path('cache-new.dat'), block_list_new,
+			binary=self._binary_cache)
 
 		# Use old splitting information to synchronize with new dataset infos
 		partition_len_old = self.get_parameter_len()
@@ -12,39 +12,73 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import csv
+import os, csv, mmap, struct
+from array import array
 from grid_control.parameters.psource_base import ParameterError, ParameterInfo, ParameterMetadata, ParameterSource  # pylint:disable=line-too-long
-from grid_control.parameters.psource_internal import InternalParameterSource
+from grid_control.parameters.psource_basic import ImmutableParameterSource
 from grid_control.utils.activity import ProgressActivity
-from grid_control.utils.file_tools import GZipTextFile
+from grid_control.utils.file_tools import GZipBlockFile, GZipTextFile, MappedFile
 from grid_control.utils.parsing import parse_json, str_dict_linear
-from python_compat import ifilter, imap, izip, json, lfilter, lidfilter, lmap, sorted
+from python_compat import Struct, bytes2str, ifilter, imap, irange, izip, json, lfilter, lidfilter, lmap, md5, next, sorted, str2bytes, unpack_from  # pylint:disable=line-too-long
 
 
-class CSVParameterSource(InternalParameterSource):  # Reader for CSV files
+# Layout of the binary parameter dump (all integers are stored in big-endian byte order):
+#   <magic> <header> <data block> <row index> <column table>
+# header: number of rows, position of row index, position of column table, size of unused data
+# data block: value and row records - changed rows and new values are appended during updates
+# value record: <length:uint32> <json value>
+# row record: <active:uint8> <tracking hash:32 bytes> <value id of each column:uint32>
+# row index: <number of rows> positions (uint64) of the row records
+# column table: <length:uint32> <json list of [column name, number of values]> followed by
+#   the positions (uint64) of the value records of each column (= value dictionary of the column)
+_DUMP_MAGIC = str2bytes('GCPDMP01')
+_DUMP_HEADER = Struct('>QQQQ')
+_DUMP_LENGTH = Struct('>I')
+_DUMP_VALUE_UNSET = 0xffffffff
+_GZIP_MAGIC = struct.pack('>H', 0x1f8b)
+
+
+class CSVParameterSource(ImmutableParameterSource):  # Reader for CSV files
+	# The file is indexed in a single pass (storing the start position of each row and the hash of
+	# the content) - rows are only parsed on access. Gzip compressed files are supported as well.
+	# The file must not be changed while it is in use (the size and modification time are checked
+	# before each access - changes of a memory mapped file could otherwise crash the process)
 	alias_list = ['csv']
 
 	def __init__(self, fn, format='sniffed'):
-		(self._fn, self._format) = (fn, format)
-		fp = open(fn)
-		try:
-			first_line = fp.readline()
-			sniffed = csv.Sniffer().sniff(first_line)
-			csv.register_dialect('sniffed', sniffed)
-			csv_header = first_line.strip().split(sniffed.delimiter) + [None]
-			psp_list = list(csv.DictReader(fp, csv_header, dialect=format))
-		finally:
-			fp.close()
-		for psp in psp_list:
-			psp.pop(None, None)
-			if None in psp.values():
-				raise ParameterError('Malformed entry in csv file %r: {%s}' % (fn, str_dict_linear(psp)))
+		(self._fn, self._format, self._file_stat) = (fn, format, _get_file_stat(fn))
+		if _is_gzip_file(fn):
+			self._data = GZipBlockFile(fn)
+		else:
+			self._data = MappedFile(fn)
+		data_hash = md5()
+		line_info_iter = _iter_line_info(_iter_hashed_chunks(self._data.iter_chunks(), data_hash))
+		first_line = next(line_info_iter, (0, str2bytes('')))[1]
+		sniffed = csv.Sniffer().sniff(bytes2str(first_line))
+		csv.register_dialect('sniffed', sniffed)
+		self._csv_header = bytes2str(first_line).strip().split(sniffed.delimiter)
+		self._row_pos_list = array('L')
+		(row_pos, data_len) = ([None], [len(first_line)])
+
+		def _iter_lines():  # csv.reader requests the lines of each row one by one
+			for (pos, line) in line_info_iter:
+				if row_pos[0] is None:
+					row_pos[0] = pos
+				data_len[0] = pos + len(line)
+				yield bytes2str(line)
+		for row in csv.reader(_iter_lines(), dialect=format):
+			if row:  # skip empty rows
+				if len(row) < len(self._csv_header):
+					raise ParameterError('Malformed entry in csv file %r: {%s}' % (fn,
+						str_dict_linear(dict(izip(self._csv_header, row + [None] * len(self._csv_header))))))
+				self._row_pos_list.append(row_pos[0])
+			row_pos[0] = None
+		self._row_pos_list.append(data_len[0])
 
-		def _cleanup_dict(mapping):  # strip all key value entries and filter empty parameters
-			tmp = tuple(imap(lambda item: lmap(str.strip, item), mapping.items()))
-			return dict(lfilter(lambda k_v: k_v[0] != '', tmp))
-		output_vn_list = sorted(imap(ParameterMetadata, lidfilter(csv_header)), key=lambda k: k.value)
-		InternalParameterSource.__init__(self, lmap(_cleanup_dict, psp_list), output_vn_list)
+		self._output_vn_list = sorted(imap(ParameterMetadata, lidfilter(self._csv_header)),
+			key=lambda k: k.value)
+		ImmutableParameterSource.__init__(self, (data_hash.hexdigest(), format,
+			lmap(lambda pm: pm.get_value(), self._output_vn_list)))
 
 	def __repr__(self):
 		if self._format == 'sniffed':
@@ -56,6 +90,173 @@ class CSVParameterSource(InternalParameterSource):  # Reader for CSV files
 		return CSVParameterSource(fn, pconfig.get(ref_name, 'format', 'sniffed'))
 	create_psrc = classmethod(create_psrc)
 
+	def fill_parameter_content(self, pnum, result):
+		self._check_file()
+		self._fill_row(pnum, result)
+
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		self._check_file()  # the file is only checked once per batch
+		for (pnum, result) in izip(pnum_list, result_list):
+			self._fill_row(pnum, result)
+
+	def fill_parameter_metadata(self, result):
+		result.extend(self._output_vn_list)
+
+	def get_parameter_len(self):
+		return len(self._row_pos_list) - 1
+
+	def _check_file(self):
+		if _get_file_stat(self._fn) != self._file_stat:
+			raise ParameterError('CSV parameter file %r was changed during the run' % self._fn)
+
+	def _fill_row(self, pnum, result):
+		row_data = self._data.read(self._row_pos_list[pnum], self._row_pos_list[pnum + 1])
+		row_line_list = [bytes2str(row_data)]
+		if row_data.count(str2bytes('\n')) > 1:  # row with line breaks or followed by empty rows
+			row_line_list = lmap(lambda line_info: bytes2str(line_info[1]), _iter_line_info([row_data]))
+		for row in csv.reader(row_line_list, dialect=self._format):
+			if row:  # strip all key value entries and filter empty parameters
+				for (key, value) in izip(self._csv_header, row):
+					if key.strip() != '':
+						result[key.strip()] = value.strip()
+				return
+
+
+class GCBinaryDumpParameterSource(ParameterSource):
+	# Random access reader for binary grid-control dump files - rows are only decoded on access
+	def __init__(self, fn):
+		ParameterSource.__init__(self)
+		try:
+			fp = open(fn, 'rb')
+			try:
+				self._data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+			finally:
+				fp.close()
+			if self._data[:len(_DUMP_MAGIC)] != _DUMP_MAGIC:
+				raise ParameterError('Invalid file header')
+			(self._row_len, self._row_index_pos, column_table_pos,
+				self._unused_len) = _DUMP_HEADER.unpack_from(self._data, len(_DUMP_MAGIC))
+			column_info_pos = column_table_pos + _DUMP_LENGTH.size
+			column_info_len = _DUMP_LENGTH.unpack_from(self._data, column_table_pos)[0]
+			column_info_list = parse_json(bytes2str(
+				self._data[column_info_pos:column_info_pos + column_info_len]))
+		except Exception:
+			raise ParameterError('Unable to read parameter dump %r' % fn)
+		(self._output_vn_list, self._value_len_list, self._value_index_pos_list) = ([], [], [])
+		value_index_pos = column_info_pos + column_info_len
+		for (output_vn, value_len) in column_info_list:
+			self._output_vn_list.append(output_vn)
+			self._value_len_list.append(value_len)
+			self._value_index_pos_list.append(value_index_pos)
+			value_index_pos += value_len * 8
+		self._row_struct = _get_dump_row_struct(self._output_vn_list)
+
+	def fill_parameter_content(self, pnum, result):
+		row = self._get_row(pnum)
+		result[ParameterInfo.ACTIVE] = bool(row[0])
+		for (output_vn, value_index_pos, value_id) in izip(self._output_vn_list,
+				self._value_index_pos_list, row[2:]):
+			if value_id != _DUMP_VALUE_UNSET:
+				result[output_vn] = self._get_value(value_index_pos, value_id)
+
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		map_value_key2value = {}  # values of low-cardinality variables are decoded once per batch
+		for (pnum, result) in izip(pnum_list, result_list):
+			row = self._get_row(pnum)
+			result[ParameterInfo.ACTIVE] = bool(row[0])
+			for (output_vn, value_index_pos, value_id) in izip(self._output_vn_list,
+					self._value_index_pos_list, row[2:]):
+				if value_id != _DUMP_VALUE_UNSET:
+					value_key = (value_index_pos, value_id)
+					if value_key not in map_value_key2value:
+						map_value_key2value[value_key] = self._get_value(value_index_pos, value_id)
+					result[output_vn] = map_value_key2value[value_key]
+
+	def fill_parameter_metadata(self, result):
+		result.extend(imap(ParameterMetadata, self._output_vn_list))
+
+	def get_parameter_len(self):
+		return self._row_len
+
+	def iter_tracking_info(self):
+		# Yield activity and tracking hash of the stored rows - without decoding the values
+		for pnum in irange(self._row_len):
+			row = self._get_row(pnum)
+			yield (bool(row[0]), bytes2str(row[1]))
+
+	def update(cls, fn, psrc_len, psrc_metadata, row_iter):
+		# Append changed rows (jobnum, psp, tracking hash) to the parameter dump - returns False
+		# if the dump has to be written again (different variables or too much unused data)
+		dump = cls(fn)
+		output_vn_list = _get_dump_vn_list(psrc_metadata)
+		# The columns are the tracked variables - if this set changed, the rows of all jobs change
+		# (not only the given rows), so the whole dump has to be written again
+		if (output_vn_list != dump._output_vn_list) or (2 * dump._unused_len > len(dump._data)):
+			dump._data.close()
+			return False
+		row_pos_list = list(unpack_from('>%dQ' % dump._row_len, dump._data, dump._row_index_pos))
+		row_pos_list = (row_pos_list + [None] * psrc_len)[:psrc_len]
+		(value_pos_list_list, map_value2id_list) = ([], [])
+		for (value_index_pos, value_len) in izip(dump._value_index_pos_list, dump._value_len_list):
+			value_pos_list_list.append(list(unpack_from('>%dQ' % value_len,
+				dump._data, value_index_pos)))
+			map_value2id = {}
+			if value_len <= 1000:  # low-cardinality values are reused during updates
+				for value_id in irange(value_len):
+					map_value2id[dump._get_value_str(value_index_pos, value_id)] = value_id
+			map_value2id_list.append(map_value2id)
+		(unused_len, file_len) = (dump._unused_len, len(dump._data))
+		unused_len += file_len - dump._row_index_pos  # row index and column table are replaced
+		dump._data.close()
+
+		fp = open(fn, 'r+b')
+		try:
+			row_pos_list_old = list(row_pos_list)
+			_write_dump_rows(fp, file_len, output_vn_list, row_iter,
+				row_pos_list, value_pos_list_list, map_value2id_list)
+			unused_len += dump._row_struct.size * len(lfilter(lambda row_pos_old_new:
+				row_pos_old_new[0] not in (None, row_pos_old_new[1]), izip(row_pos_list_old, row_pos_list)))
+			_write_dump_index(fp, output_vn_list, row_pos_list, value_pos_list_list, unused_len)
+		finally:
+			fp.close()
+		return True
+	update = classmethod(update)
+
+	def write(cls, fn, psrc_len, psrc_metadata, row_iter):
+		# Write all rows (jobnum, psp, tracking hash) of the parameter space into a new dump
+		output_vn_list = _get_dump_vn_list(psrc_metadata)
+		(row_pos_list, value_pos_list_list) = ([None] * psrc_len, lmap(lambda vn: [], output_vn_list))
+		fp = open(fn, 'wb')
+		try:
+			fp.write(_DUMP_MAGIC + _DUMP_HEADER.pack(0, 0, 0, 0))  # header is written at the end
+			progress = ProgressActivity('Writing parameter dump', progress_max=psrc_len)
+
+			def _iter_rows_progress():
+				for (row_idx, row) in enumerate(row_iter):
+					if row_idx % 100 == 0:
+						progress.update_progress(row_idx)
+					yield row
+			_write_dump_rows(fp, len(_DUMP_MAGIC) + _DUMP_HEADER.size, output_vn_list,
+				_iter_rows_progress(), row_pos_list, value_pos_list_list,
+				lmap(lambda vn: {}, output_vn_list))
+			progress.finish()
+			_write_dump_index(fp, output_vn_list, row_pos_list, value_pos_list_list, 0)
+		finally:
+			fp.close()
+	write = classmethod(write)
+
+	def _get_row(self, pnum):
+		row_pos = unpack_from('>Q', self._data, self._row_index_pos + pnum * 8)[0]
+		return self._row_struct.unpack_from(self._data, row_pos)
+
+	def _get_value(self, value_index_pos, value_id):
+		return parse_json(bytes2str(self._get_value_str(value_index_pos, value_id)))
+
+	def _get_value_str(self, value_index_pos, value_id):
+		value_pos = unpack_from('>Q', self._data, value_index_pos + value_id * 8)[0]
+		value_len = _DUMP_LENGTH.unpack_from(self._data, value_pos)[0]
+		return self._data[value_pos + _DUMP_LENGTH.size:value_pos + _DUMP_LENGTH.size + value_len]
+
 
 class GCDumpParameterSource(ParameterSource):
 	# Reader for grid-control dump files
@@ -108,3 +309,95 @@ class GCDumpParameterSource(ParameterSource):
 		finally:
 			fp.close()
 	write = classmethod(write)
+
+
+def _get_dump_row_struct(output_vn_list):
+	return Struct('>B32s%dI' % len(output_vn_list))
+
+
+def _get_dump_vn_list(psrc_metadata):
+	return sorted(lmap(lambda p: p.value, ifilter(lambda p: not p.untracked, psrc_metadata)))
+
+
+def _get_file_stat(fn):
+	file_stat = os.stat(fn)
+	return (file_stat.st_size, file_stat.st_mtime)
+
+
+def _is_gzip_file(fn):
+	fp = open(fn, 'rb')
+	try:
+		return fp.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC
+	finally:
+		fp.close()
+
+
+def _iter_hashed_chunks(chunk_iter, hash_obj):
+	for chunk in chunk_iter:
+		hash_obj.update(chunk)
+		yield chunk
+
+
+def _iter_line_info(chunk_iter):
+	# Yield start position and content (including the line break) of all lines in the given data
+	(pos, line_part_list, newline) = (0, [], str2bytes('\n'))
+	for chunk in chunk_iter:
+		chunk_pos = 0
+		while True:
+			newline_pos = chunk.find(newline, chunk_pos)
+			if newline_pos < 0:
+				line_part_list.append(chunk[chunk_pos:])
+				break
+			line_part_list.append(chunk[chunk_pos:newline_pos + 1])
+			line = str2bytes('').join(line_part_list)
+			yield (pos, line)
+			(pos, line_part_list, chunk_pos) = (pos + len(line), [], newline_pos + 1)
+	line = str2bytes('').join(line_part_list)
+	if line:
+		yield (pos, line)
+
+
+def _write_dump_index(fp, output_vn_list, row_pos_list, value_pos_list_list, unused_len):
+	# Write row index and column table at the end of the file - the header is updated last
+	if None in row_pos_list:
+		raise ParameterError('Parameter dump is missing %d rows' % row_pos_list.count(None))
+	row_index_pos = fp.tell()
+	fp.write(struct.pack('>%dQ' % len(row_pos_list), *row_pos_list))
+	column_table_pos = fp.tell()
+	column_info = str2bytes(json.dumps(lmap(lambda vn_value_pos_list: [vn_value_pos_list[0],
+		len(vn_value_pos_list[1])], izip(output_vn_list, value_pos_list_list))))
+	fp.write(_DUMP_LENGTH.pack(len(column_info)) + column_info)
+	for value_pos_list in value_pos_list_list:
+		fp.write(struct.pack('>%dQ' % len(value_pos_list), *value_pos_list))
+	fp.flush()
+	os.fsync(fp.fileno())
+	fp.seek(len(_DUMP_MAGIC))
+	fp.write(_DUMP_HEADER.pack(len(row_pos_list), row_index_pos, column_table_pos, unused_len))
+
+
+def _write_dump_rows(fp, pos, output_vn_list, row_iter,
+		row_pos_list, value_pos_list_list, map_value2id_list):
+	# Append row records (and the records of new values) starting at the given file position
+	fp.seek(pos)
+	row_struct = _get_dump_row_struct(output_vn_list)
+	column_info_list = lmap(lambda column_idx: (output_vn_list[column_idx],
+		value_pos_list_list[column_idx], map_value2id_list[column_idx]), irange(len(output_vn_list)))
+	for (pnum, psp, hash_str) in row_iter:
+		value_id_list = []
+		for (output_vn, value_pos_list, map_value2id) in column_info_list:
+			value = psp.get(output_vn)
+			if value is None:
+				value_id_list.append(_DUMP_VALUE_UNSET)
+				continue
+			value_str = str2bytes(json.dumps(value))
+			value_id = map_value2id.get(value_str)
+			if value_id is None:
+				value_id = map_value2id[value_str] = len(value_pos_list)
+				value_pos_list.append(pos)
+				fp.write(_DUMP_LENGTH.pack(len(value_str)) + value_str)
+				pos += _DUMP_LENGTH.size + len(value_str)
+			value_id_list.append(value_id)
+		row_pos_list[pnum] = pos
+		fp.write(row_struct.pack(int(bool(psp.get(ParameterInfo.ACTIVE, True))),
+			str2bytes(hash_str or ''), *value_id_list))
+		pos += row_struct.size
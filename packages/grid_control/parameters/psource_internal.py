@@ -16,13 +16,16 @@ from grid_control.parameters.psource_base import ParameterSource
 from grid_control.parameters.psource_basic import ImmutableParameterSource
 from grid_control.utils.parsing import str_dict_linear
 from hpfwk import APIError, AbstractError
-from python_compat import lmap
+from python_compat import izip, lmap
 
 
 class InternalNestedParameterSource(ImmutableParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		pass
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		pass
+
 	def fill_parameter_metadata(self, result):
 		pass
 
@@ -42,6 +45,10 @@ class InternalParameterSource(ImmutableParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		result.update(self._value_list[pnum])
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for (pnum, result) in izip(pnum_list, result_list):
+			result.update(self._value_list[pnum])
+
 	def fill_parameter_metadata(self, result):
 		result.extend(self._meta_list)
 
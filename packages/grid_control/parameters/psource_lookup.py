@@ -16,13 +16,20 @@ from grid_control.config import ConfigError, Matcher
 from grid_control.parameters.psource_base import ParameterError, ParameterInfo, ParameterSource
 from grid_control.parameters.psource_basic import KeyParameterSource, SingleParameterSource
 from grid_control.parameters.psource_internal import InternalNestedParameterSource
-from python_compat import imap, irange, izip, lidfilter, lmap, md5_hex
+from python_compat import all, imap, irange, izip, lfilter, lidfilter, lmap, lrange, md5_hex
 
 
 class LookupHelper(object):  # TODO: use grid_control.config.matcher_base.DictLookup here
 	def __init__(self, lookup_vn_list, lookup_matcher_list, lookup_dict, lookup_order):
 		(self._lookup_vn_list, self._lookup_matcher_list) = (lookup_vn_list, lookup_matcher_list)
 		(self._lookup_dict, self._lookup_order) = (lookup_dict, lookup_order)
+		# The matchers are compiled into indices over the lookup keys (in lookup order) and the
+		# matching lookup key is stored for each distinct combination of lookup values
+		self._lookup_index_list = []
+		for (lookup_idx, lookup_matcher) in enumerate(lookup_matcher_list):
+			self._lookup_index_list.append(lookup_matcher.create_index(lmap(
+				lambda lookup_dict_key: _get_lookup_expr(lookup_dict_key, lookup_idx), lookup_order)))
+		self._map_lookup_value_str2lookup_dict_key = {}
 
 	def __repr__(self):
 		if len(self._lookup_vn_list) == 1:
@@ -34,18 +41,29 @@ class LookupHelper(object):  # TODO: use grid_control.config.matcher_base.DictLo
 
 	def lookup(self, psp):
 		lookup_value_list = lmap(psp.get, self._lookup_vn_list)
-		lookup_dict_key = self._match_lookup_dict_key(lookup_value_list)
-		return self._lookup_dict.get(lookup_dict_key)
+		lookup_value_str = repr(lookup_value_list)
+		if lookup_value_str not in self._map_lookup_value_str2lookup_dict_key:
+			self._map_lookup_value_str2lookup_dict_key[lookup_value_str] = self._match_lookup_dict_key(
+				lookup_value_list)
+		return self._lookup_dict.get(self._map_lookup_value_str2lookup_dict_key[lookup_value_str])
+
+	def lookup_batch(self, psp_list):
+		return lmap(self.lookup, psp_list)
 
 	def _match_lookup_dict_key(self, lookup_value_list):
-		for lookup_dict_key in self._lookup_order:
-			match = True
-			lookup_info_iter = izip(lookup_value_list, lookup_dict_key, self._lookup_matcher_list)
-			for (lookup_value, lookup_expr, lookup_matcher) in lookup_info_iter:
-				if lookup_value is not None:
-					match = match and (lookup_matcher.matcher(lookup_value, lookup_expr) > 0)
-			if match:
-				return lookup_dict_key
+		# The first lookup key (in lookup order) matching all given lookup values is selected -
+		# candidates are taken from the index of the first given value and checked against the others
+		lookup_info_list = lfilter(lambda lookup_info: lookup_info[0] is not None,
+			izip(lookup_value_list, self._lookup_index_list))
+		if not lookup_info_list:
+			if self._lookup_order:
+				return self._lookup_order[0]
+			return
+		(lookup_value_first, lookup_index_first) = lookup_info_list[0]
+		for lookup_key_idx in lookup_index_first.iter_match_idx(lookup_value_first):
+			if all(imap(lambda lookup_info: lookup_info[1].is_match(lookup_key_idx, lookup_info[0]),
+					lookup_info_list[1:])):
+				return self._lookup_order[lookup_key_idx]
 
 
 class InternalSwitchPlaceholder(InternalNestedParameterSource):
@@ -116,13 +134,11 @@ class SimpleLookupParameterSource(LookupBaseParameterSource):
 	create_psrc = classmethod(create_psrc)
 
 	def fill_parameter_content(self, pnum, result):
-		output_tuple = self._helper.lookup(result)
-		if output_tuple is None:
-			return
-		elif len(output_tuple) != 1:
-			raise ConfigError("%s can't handle multiple lookup parameter sets!" % self.__class__.__name__)
-		elif output_tuple[0] is not None:
-			result[self._output_vn] = output_tuple[0]
+		self._fill_output(result, self._helper.lookup(result))
+
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for (result, output_tuple) in izip(result_list, self._helper.lookup_batch(result_list)):
+			self._fill_output(result, output_tuple)
 
 	def get_parameter_deps(self):
 		return self._lookup_vn_list
@@ -131,6 +147,14 @@ class SimpleLookupParameterSource(LookupBaseParameterSource):
 		return ['%s: var = %s, lookup = %s' % (self.__class__.__name__,
 			self._output_vn, repr(self._helper))]
 
+	def _fill_output(self, result, output_tuple):
+		if output_tuple is None:
+			return
+		elif len(output_tuple) != 1:
+			raise ConfigError("%s can't handle multiple lookup parameter sets!" % self.__class__.__name__)
+		elif output_tuple[0] is not None:
+			result[self._output_vn] = output_tuple[0]
+
 
 class SwitchingLookupParameterSource(LookupBaseParameterSource):
 	alias_list = ['switch']
@@ -157,6 +181,17 @@ class SwitchingLookupParameterSource(LookupBaseParameterSource):
 		self._psrc.fill_parameter_content(psrc_pnum, result)
 		result[self._output_vn] = self._helper.lookup(result)[output_idx]
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		if len(self._psp_field) == 0:
+			self._psrc.fill_parameter_content_batch(pnum_list, result_list)
+			return
+		psp_info_list = lmap(self._psp_field.__getitem__, pnum_list)
+		self._psrc.fill_parameter_content_batch(lmap(lambda psp_info: psp_info[0], psp_info_list),
+			result_list)
+		output_tuple_list = self._helper.lookup_batch(result_list)
+		for (result, psp_info, output_tuple) in izip(result_list, psp_info_list, output_tuple_list):
+			result[self._output_vn] = output_tuple[psp_info[1]]
+
 	def fill_parameter_metadata(self, result):
 		result.append(self._meta)
 		self._psrc.fill_parameter_metadata(result)
@@ -190,20 +225,22 @@ class SwitchingLookupParameterSource(LookupBaseParameterSource):
 	def _init_psp_field(self):
 		result = []
 
-		def _add_psp_entry(pnum):
-			tmp = {ParameterInfo.ACTIVE: True, ParameterInfo.REQS: [], 'GC_JOB_ID': pnum, 'GC_PARAM': pnum}
-			self._psrc.fill_parameter_content(pnum, tmp)
-			output_tuple = self._helper.lookup(tmp)
-			if output_tuple:
-				for (lookup_idx, tmp) in enumerate(output_tuple):
-					result.append((pnum, lookup_idx))
-
-		if self._psrc.get_parameter_len() is None:
+		def _add_psp_entry_batch(pnum_list):
+			psp_list = lmap(lambda pnum: {ParameterInfo.ACTIVE: True, ParameterInfo.REQS: [],
+				'GC_JOB_ID': pnum, 'GC_PARAM': pnum}, pnum_list)
+			self._psrc.fill_parameter_content_batch(pnum_list, psp_list)
+			for (pnum, output_tuple) in izip(pnum_list, self._helper.lookup_batch(psp_list)):
+				if output_tuple:
+					for lookup_idx in irange(len(output_tuple)):
+						result.append((pnum, lookup_idx))
+
+		psrc_len = self._psrc.get_parameter_len()
+		if psrc_len is None:
 			error_msg = 'Unable to use %r with an infinite parameter space!'
 			raise ParameterError(error_msg % self.__class__.__name__)
 		else:
-			for pnum in irange(self._psrc.get_parameter_len()):
-				_add_psp_entry(pnum)
+			for pnum_start in irange(0, psrc_len, 1000):
+				_add_psp_entry_batch(lrange(pnum_start, min(pnum_start + 1000, psrc_len)))
 		if len(result) == 0:
 			self._log.critical('Lookup parameter "%s" has no matching entries!', self._output_vn)
 		return result
@@ -248,3 +285,9 @@ def _get_lookup_args(pconfig, output_user, lookup_user_list):
 			if len(lookup_dict[lookup_key]) == 0:
 				lookup_dict[lookup_key].append('')
 	return (output_vn, lookup_vn_list, lookup_matcher_list, lookup_dict, lookup_order)
+
+
+def _get_lookup_expr(lookup_dict_key, lookup_idx):
+	# lookup keys without an expression for the given lookup variable match any value
+	if lookup_idx < len(lookup_dict_key):
+		return lookup_dict_key[lookup_idx]
@@ -12,7 +12,7 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import operator
+import bisect, operator
 from grid_control.parameters.psource_base import NullParameterSource, ParameterError, ParameterSource  # pylint:disable=line-too-long
 from hpfwk import AbstractError, Plugin
 from python_compat import all, ichain, ifilter, imap, irange, izip, lchain, lfilter, lmap, lrange, md5_hex, reduce, set, sorted  # pylint:disable=line-too-long
@@ -29,6 +29,9 @@ class ForwardingParameterSource(ParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		self._psrc.fill_parameter_content(pnum, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		self._psrc.fill_parameter_content_batch(pnum_list, result_list)
+
 	def fill_parameter_metadata(self, result):
 		self._psrc.fill_parameter_metadata(result)
 
@@ -155,6 +158,11 @@ class RangeParameterSource(ForwardingParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		self._psrc.fill_parameter_content(pnum + self._pos_start, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		pos_start = self._pos_start
+		self._psrc.fill_parameter_content_batch(lmap(lambda pnum: pnum + pos_start, pnum_list),
+			result_list)
+
 	def get_parameter_len(self):
 		return self._pos_end - self._pos_start + 1
 
@@ -247,6 +255,12 @@ class TruncateParameterSource(ForwardingParameterSource):
 		if (self._psrc_len is None) or (pnum < self._psrc_len):
 			self._psrc.fill_parameter_content(pnum, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		if self._psrc_len is None:
+			self._psrc.fill_parameter_content_batch(pnum_list, result_list)
+		else:
+			_fill_parameter_content_batch_limited(self._psrc, self._psrc_len, pnum_list, result_list)
+
 	def get_parameter_len(self):
 		return self._max_len
 
@@ -271,7 +285,7 @@ class BaseCombineParameterSource(MultiParameterSource):
 
 	def __init__(self, combine_fun, psrc1, psrc2, var1, var2=None):
 		(self._combine_fun, self._var1, self._var2) = (combine_fun, var1, var2 or var1)
-		self._psrc_pnum_pair_list = []
+		(self._psrc_pnum_pair_list, self._map_psrc_pnum2pnum_list) = ([], ({}, {}))
 		MultiParameterSource.__init__(self, psrc1, psrc2)
 
 	def fill_parameter_content(self, pnum, result):
@@ -281,6 +295,16 @@ class BaseCombineParameterSource(MultiParameterSource):
 		self._psrc_list[0].fill_parameter_content(pnum1, result)
 		self._psrc_list[1].fill_parameter_content(pnum2, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		def _get_pnum12_tuple(pnum):
+			if pnum is None:
+				pnum = -1
+			return self._psrc_pnum_pair_list[pnum]
+		pnum12_list = lmap(_get_pnum12_tuple, pnum_list)
+		for (psrc_idx, psrc) in enumerate(self._psrc_list):
+			psrc.fill_parameter_content_batch(lmap(lambda pnum12: pnum12[psrc_idx], pnum12_list),
+				result_list)
+
 	def _init_psrc_max(self):
 		self._psrc_pnum_pair_list = []
 		psrc1_values = _get_map_value2pnum(self._psrc_list[0], self._var1)
@@ -288,12 +312,15 @@ class BaseCombineParameterSource(MultiParameterSource):
 		for value in sorted(psrc1_values):
 			self._psrc_pnum_pair_list.extend(self._combine_fun(
 				psrc1_values[value], psrc2_values.get(value, [])))
+		# inverse index (for each psrc) to translate subsource parameter numbers during resync
+		self._map_psrc_pnum2pnum_list = ({}, {})
+		for (pnum_result, pnum12_tuple) in enumerate(self._psrc_pnum_pair_list):
+			for (psrc_idx, pnum) in enumerate(pnum12_tuple):
+				self._map_psrc_pnum2pnum_list[psrc_idx].setdefault(pnum, []).append(pnum_result)
 		return len(self._psrc_pnum_pair_list)
 
 	def _translate_pnum(self, psrc_idx, pnum):
-		for (pnum_result, pnum12_tuple) in enumerate(self._psrc_pnum_pair_list):
-			if pnum == pnum12_tuple[psrc_idx]:
-				yield pnum_result
+		return self._map_psrc_pnum2pnum_list[psrc_idx].get(pnum, [])
 
 
 class BaseZipParameterSource(MultiParameterSource):
@@ -310,6 +337,13 @@ class BaseZipParameterSource(MultiParameterSource):
 			else:
 				psrc.fill_parameter_content(pnum, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for (psrc, psrc_len) in izip(self._psrc_list, self._psrc_max_list):
+			if psrc_len is not None:
+				_fill_parameter_content_batch_limited(psrc, psrc_len, pnum_list, result_list)
+			else:
+				psrc.fill_parameter_content_batch(pnum_list, result_list)
+
 	def resync_psrc(self):  # Quicker version than the general purpose implementation
 		result = ParameterSource.get_empty_resync_result()
 		for psrc in self._psrc_list:
@@ -345,6 +379,18 @@ class ChainParameterSource(MultiParameterSource):
 				return psrc.fill_parameter_content(pnum - limit, result)
 			limit += psrc_max
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		# sort parameter numbers into the batches of the chained sources
+		batch_list = lmap(lambda psrc: ([], []), self._psrc_list)
+		for (pnum, result) in izip(pnum_list, result_list):
+			psrc_idx = bisect.bisect_right(self._offset_list, pnum) - 1
+			if pnum < self._offset_list[psrc_idx] + self._psrc_max_list[psrc_idx]:
+				batch_list[psrc_idx][0].append(pnum - self._offset_list[psrc_idx])
+				batch_list[psrc_idx][1].append(result)
+		for (psrc, (psrc_pnum_list, psrc_result_list)) in izip(self._psrc_list, batch_list):
+			if psrc_pnum_list:
+				psrc.fill_parameter_content_batch(psrc_pnum_list, psrc_result_list)
+
 	def fill_parameter_metadata(self, result):
 		map_vn2tracking_status = {}
 		map_vn2psrc_list = {}
@@ -391,6 +437,14 @@ class CrossParameterSource(MultiParameterSource):
 			elif psrc_max is None:
 				psrc.fill_parameter_content(pnum, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		for (psrc, psrc_max, psrc_group_size) in self._psrc_info_list:
+			if psrc_max:
+				psrc.fill_parameter_content_batch(lmap(lambda pnum: (pnum // psrc_group_size) % psrc_max,
+					pnum_list), result_list)
+			elif psrc_max is None:
+				psrc.fill_parameter_content_batch(pnum_list, result_list)
+
 	def _init_psrc_max(self):
 		self._psrc_info_list = []
 		psrc_group_size = 1
@@ -405,8 +459,16 @@ class CrossParameterSource(MultiParameterSource):
 	def _translate_pnum(self, psrc_idx, pnum):
 		# psrc irrelevant for pnum translation
 		(_, psrc_max, psrc_group_size) = self._psrc_info_list[psrc_idx]
-		return lfilter(lambda x: int(x / psrc_group_size) % psrc_max == pnum,
-			irange(self.get_parameter_len()))
+		if psrc_max is None:  # parameter number is directly passed to infinite sources
+			return lfilter(lambda x: x < self.get_parameter_len(), [pnum])
+		elif not (0 <= pnum < psrc_max):
+			return []
+		# the result consists of blocks with <group size> consecutive parameter numbers,
+		# which repeat after <group size> * <psrc size> parameter numbers
+		block_offset = pnum * psrc_group_size
+		return lchain(imap(lambda block_start: irange(block_start + block_offset,
+			block_start + block_offset + psrc_group_size),
+			irange(0, self.get_parameter_len(), psrc_group_size * psrc_max)))
 
 
 class RepeatParameterSource(MultiParameterSource):
@@ -434,6 +496,11 @@ class RepeatParameterSource(MultiParameterSource):
 	def fill_parameter_content(self, pnum, result):
 		self._psrc.fill_parameter_content(pnum % self._psrc_child_max, result)
 
+	def fill_parameter_content_batch(self, pnum_list, result_list):
+		psrc_child_max = self._psrc_child_max
+		self._psrc.fill_parameter_content_batch(lmap(lambda pnum: pnum % psrc_child_max, pnum_list),
+			result_list)
+
 	def fill_parameter_metadata(self, result):
 		self._psrc.fill_parameter_metadata(result)
 
@@ -514,17 +581,29 @@ def _combine_resync_result(resync_result_a, resync_result_b, sc_fun=bool.__or__)
 	return (redo_a, disable_a, sc_fun(size_change_a, size_change_b))
 
 
+def _fill_parameter_content_batch_limited(psrc, psrc_len, pnum_list, result_list):
+	# only parameter numbers below the given limit are passed to the parameter source
+	batch_list = lfilter(lambda pnum_result: pnum_result[0] < psrc_len, izip(pnum_list, result_list))
+	if len(batch_list) == len(result_list):
+		psrc.fill_parameter_content_batch(pnum_list, result_list)
+	elif batch_list:
+		psrc.fill_parameter_content_batch(lmap(lambda pnum_result: pnum_result[0], batch_list),
+			lmap(lambda pnum_result: pnum_result[1], batch_list))
+
+
 def _get_map_value2pnum(psrc, var):
-	def _get_value(pnum):
-		psp = {}
-		psrc.fill_parameter_content(pnum, psp)
-		return psp.get(var)
 	result = {}
 	if psrc.get_parameter_len() is None:
-		result[_get_value(None)] = [-1]
+		psp = {}
+		psrc.fill_parameter_content(None, psp)
+		result[psp.get(var)] = [-1]
 	else:
-		for pnum in irange(psrc.get_parameter_len()):
-			result.setdefault(_get_value(pnum), []).append(pnum)
+		for pnum_start in irange(0, psrc.get_parameter_len(), 1000):
+			pnum_list = lrange(pnum_start, min(pnum_start + 1000, psrc.get_parameter_len()))
+			psp_list = lmap(lambda pnum: {}, pnum_list)
+			psrc.fill_parameter_content_batch(pnum_list, psp_list)
+			for (pnum, psp) in izip(pnum_list, psp_list):
+				result.setdefault(psp.get(var), []).append(pnum)
 	return result
 
 
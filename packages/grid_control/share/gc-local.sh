@@ -16,6 +16,18 @@
 # grid-control: https://ekptrac.physik.uni-karlsruhe.de/trac/grid-control
 
 GC_SANDBOX="${GC_SANDBOX:-$1}"
+# Array jobs are started with a file containing the sandbox list - select sandbox of array task
+if [ -f "$GC_SANDBOX" ]; then
+	GC_ARRAY_IDX="${SLURM_ARRAY_TASK_ID:-${PBS_ARRAYID:-${SGE_TASK_ID:-$LSB_JOBINDEX}}}"
+	GC_SANDBOX="$(sed -n "${GC_ARRAY_IDX}p" "$GC_SANDBOX")"
+	[ ! -d "$GC_SANDBOX" ] && echo "Sandbox of array task $GC_ARRAY_IDX not found" && exit 101
+	if [ -n "$GC_DELAY_OUTPUT" ]; then
+		GC_DELAY_OUTPUT="$GC_SANDBOX/gc.stdout"
+		GC_DELAY_ERROR="$GC_SANDBOX/gc.stderr"
+	else
+		exec > "$GC_SANDBOX/gc.stdout" 2> "$GC_SANDBOX/gc.stderr"
+	fi
+fi
 GC_JOBCONF="$GC_SANDBOX/_jobconfig.sh"
 source "$GC_JOBCONF"
 if [ ! -f "$GC_SANDBOX/job_${GC_JOB_ID}.var" ]; then
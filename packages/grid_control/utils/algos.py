@@ -13,7 +13,7 @@
 # | limitations under the License.
 
 import operator
-from python_compat import ifilter, ismap, izip_longest, next, sort_inplace, sorted, unspecified
+from python_compat import ifilter, irange, ismap, izip, izip_longest, lmap, next, sort_inplace, sorted, unspecified  # pylint:disable=line-too-long
 
 
 def accumulate(iterable, empty, do_emit, do_add=lambda item, buffer: True, add_fun=operator.add):
@@ -29,6 +29,23 @@ def accumulate(iterable, empty, do_emit, do_add=lambda item, buffer: True, add_f
 		yield buf
 
 
+def decode_columns(column_list, row_len):
+	# Inverse of encode_columns - returns the list of rows
+	row_list = lmap(lambda row_idx: [], irange(row_len))
+	for column in column_list:
+		value_list = column[0]
+		if len(column) == 1:  # constant value or one value per row
+			if len(value_list) == 1:
+				value_list = value_list * row_len
+			for (row, value) in izip(row_list, value_list):
+				row.append(value)
+		else:
+			for (row, value_idx) in izip(row_list, column[1]):
+				if value_idx >= 0:
+					row.append(value_list[value_idx])
+	return row_list
+
+
 def dict_union(*args):
 	tmp = dict()
 	for mapping in args:
@@ -36,6 +53,36 @@ def dict_union(*args):
 	return tmp
 
 
+def encode_columns(row_list):
+	# Encode the columns of a list of rows (with possibly different lengths) in a single pass
+	# over each column - depending on the number of distinct values, the columns are stored as
+	#   [[<value>]] - constant value in all rows
+	#   [<values>] - one value per row (mostly distinct values)
+	#   [<distinct values>, <value index per row>] - the index -1 marks rows without this column
+	column_list = []
+	for column_idx in irange(max([0] + lmap(len, row_list))):
+		(value_list, value_idx_list, map_value_key2value_idx) = ([], [], {})
+		for row in row_list:
+			value_idx = -1
+			if column_idx < len(row):
+				value = row[column_idx]
+				value_key = repr(value)  # values are not required to be hashable
+				value_idx = map_value_key2value_idx.get(value_key)
+				if value_idx is None:
+					value_idx = map_value_key2value_idx[value_key] = len(value_list)
+					value_list.append(value)
+			value_idx_list.append(value_idx)
+		if -1 in value_idx_list:
+			column_list.append([value_list, value_idx_list])
+		elif len(value_list) == 1:
+			column_list.append([value_list])
+		elif 2 * len(value_list) > len(row_list):
+			column_list.append([lmap(value_list.__getitem__, value_idx_list)])
+		else:
+			column_list.append([value_list, value_idx_list])
+	return column_list
+
+
 def filter_dict(mapping, key_filter=lambda k: True, value_filter=lambda v: True):
 	def _filter_items(k_v):
 		return key_filter(k_v[0]) and value_filter(k_v[1])
@@ -111,5 +158,6 @@ def split_list(iterable, fun, sort_key=unspecified):
 	return (result_true, result_false)
 
 
-__all__ = ['accumulate', 'dict_union', 'filter_dict', 'get_list_difference', 'grouper',
-	'intersect_first_dict', 'reverse_dict', 'safe_index', 'split_list']
+__all__ = ['accumulate', 'decode_columns', 'dict_union', 'encode_columns', 'filter_dict',
+	'get_list_difference', 'grouper', 'intersect_first_dict', 'reverse_dict', 'safe_index',
+	'split_list']
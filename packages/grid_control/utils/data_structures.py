@@ -74,6 +74,58 @@ def make_enum(enum_name_list=None, cls=None, use_hash=True, register=True):
 make_enum.enum_list = []  # <global-state>
 
 
+class LRUCache(object):
+	# Bounded dictionary which discards the least recently used entries - with hit / miss counters.
+	# Entries are links [link before, link after, key, value] of a circular list - most recent first
+	def __init__(self, max_size):
+		(self._max_size, self._map_key2link, self._root) = (max_size, {}, [])
+		self._root[:] = [self._root, self._root, None, None]
+		(self.hits, self.misses) = (0, 0)
+
+	def __contains__(self, key):
+		return key in self._map_key2link
+
+	def __len__(self):
+		return len(self._map_key2link)
+
+	def clear(self):
+		self._map_key2link = {}
+		self._root[:] = [self._root, self._root, None, None]
+
+	def get(self, key, default=None):
+		link = self._map_key2link.get(key)
+		if link is None:
+			self.misses += 1
+			return default
+		self.hits += 1
+		self._unlink(link)
+		self._link_first(link)
+		return link[3]
+
+	def put(self, key, value):
+		link = self._map_key2link.get(key)
+		if link is None:
+			link = [None, None, key, value]
+			self._map_key2link[key] = link
+		else:
+			link[3] = value
+			self._unlink(link)
+		self._link_first(link)
+		while len(self._map_key2link) > max(1, self._max_size):
+			link_lru = self._root[0]
+			self._unlink(link_lru)
+			self._map_key2link.pop(link_lru[2])
+
+	def _link_first(self, link):
+		link_next = self._root[1]
+		(link[0], link[1]) = (self._root, link_next)
+		(self._root[1], link_next[0]) = (link, link)
+
+	def _unlink(self, link):
+		(link_prev, link_next) = (link[0], link[1])
+		(link_prev[1], link_next[0]) = (link_next, link_prev)
+
+
 class UniqueList(object):
 	def __init__(self, values=None):
 		self._set = set()
@@ -12,8 +12,9 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, gzip
-from python_compat import BytesBufferBase, bytes2str, identity, imap, str2bytes, tarfile
+import os, gzip, mmap, zlib, bisect
+from grid_control.utils.data_structures import LRUCache
+from python_compat import BytesBufferBase, bytes2str, identity, imap, irange, str2bytes, tarfile
 
 
 def erase_content(fp):
@@ -40,6 +41,73 @@ def with_file_iter(fp, iter_fun):
 	fp.close()
 
 
+class GZipBlockFile(object):
+	# Random access to the content of gzip files: During a first sequential pass over the content,
+	# the state of the decompressor is stored in regular intervals (blocks) - so any part of the
+	# content can be accessed by decompressing the surrounding block(s) again
+	def __init__(self, fn, block_size=1024 * 1024, block_cache_size=4):
+		self._fp = open(fn, 'rb')
+		(self._block_size, self._block_cache) = (block_size, LRUCache(block_cache_size))
+		(self._block_pos_list, self._block_info_list) = ([], [])
+
+	def close(self):
+		self._fp.close()
+
+	def iter_chunks(self):
+		# Sequential access to the complete content - this builds the block index used by "read"
+		decompressor = _create_gzip_decompressor()
+		(self._block_pos_list, self._block_info_list) = ([0], [(0, decompressor.copy())])
+		self._block_cache.clear()
+		pos = 0
+		for (pos_compressed, decompressor, data) in self._iter_decompress(0, decompressor):
+			pos += len(data)
+			yield data
+			if pos >= self._block_pos_list[-1] + self._block_size:
+				self._block_pos_list.append(pos)
+				self._block_info_list.append((pos_compressed, decompressor.copy()))
+
+	def read(self, pos_start, pos_end):
+		result = []
+		block_idx = bisect.bisect_right(self._block_pos_list, pos_start) - 1
+		while (pos_start < pos_end) and (0 <= block_idx < len(self._block_pos_list)):
+			block_pos = self._block_pos_list[block_idx]
+			block_data = self._get_block_data(block_idx)
+			result.append(block_data[pos_start - block_pos:pos_end - block_pos])
+			(pos_start, block_idx) = (block_pos + len(block_data), block_idx + 1)
+		return str2bytes('').join(result)
+
+	def _get_block_data(self, block_idx):
+		block_data = self._block_cache.get(block_idx)
+		if block_data is None:
+			block_len = None
+			if block_idx + 1 < len(self._block_pos_list):
+				block_len = self._block_pos_list[block_idx + 1] - self._block_pos_list[block_idx]
+			(pos_compressed, decompressor) = self._block_info_list[block_idx]
+			(data_list, data_len) = ([], 0)
+			for (_, _, data) in self._iter_decompress(pos_compressed, decompressor.copy()):
+				data_list.append(data)
+				data_len += len(data)
+				if (block_len is not None) and (data_len >= block_len):
+					break
+			block_data = str2bytes('').join(data_list)[:block_len]
+			self._block_cache.put(block_idx, block_data)
+		return block_data
+
+	def _iter_decompress(self, pos_compressed, decompressor):
+		self._fp.seek(pos_compressed)
+		while True:
+			data_compressed = self._fp.read(64 * 1024)
+			if not data_compressed:
+				break
+			pos_compressed += len(data_compressed)
+			data = decompressor.decompress(data_compressed)
+			while decompressor.unused_data:  # continue with the next member of the gzip file
+				data_compressed = decompressor.unused_data
+				decompressor = _create_gzip_decompressor()
+				data += decompressor.decompress(data_compressed)
+			yield (pos_compressed, decompressor, data)
+
+
 class GZipTextFile(object):
 	def __init__(self, fn, mode):
 		self._fp = gzip.open(fn, mode)
@@ -57,6 +125,29 @@ class GZipTextFile(object):
 		self._fp.write(str2bytes(data))
 
 
+class MappedFile(object):
+	# Random access to the content of (large) files without reading them into memory
+	def __init__(self, fn, chunk_size=4 * 1024 * 1024):
+		(self._data, self._chunk_size) = (str2bytes(''), chunk_size)
+		if os.path.getsize(fn):  # empty files can't be mapped
+			fp = open(fn, 'rb')
+			try:
+				self._data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+			finally:
+				fp.close()
+
+	def close(self):
+		if self._data:
+			self._data.close()
+
+	def iter_chunks(self):
+		for pos in irange(0, len(self._data), self._chunk_size):
+			yield self._data[pos:pos + self._chunk_size]
+
+	def read(self, pos_start, pos_end):
+		return self._data[pos_start:pos_end]
+
+
 class SafeFile(object):
 	def __init__(self, fn, mode='r', keep_old=False):
 		if mode not in ['r', 'w', 'rb', 'wb']:
@@ -126,3 +217,7 @@ class VirtualFile(BytesBufferBase):
 		info = tarfile.TarInfo(self.name)
 		info.size = self.size
 		return (info, self)
+
+
+def _create_gzip_decompressor():
+	return zlib.decompressobj(16 + zlib.MAX_WBITS)  # accept only data with gzip header
@@ -15,7 +15,7 @@
 import os, time, errno, fcntl, select, signal, logging, termios
 from grid_control.utils.thread_tools import GCEvent, GCLock, GCQueue, start_daemon, start_thread
 from hpfwk import AbstractError, clear_current_exception, get_current_exception, ignore_exception
-from python_compat import bytes2str, imap, set, str2bytes
+from python_compat import bytes2str, imap, lfilter, set, str2bytes
 
 
 class ProcessError(Exception):
@@ -162,8 +162,15 @@ class ProcessStream(object):
 
 class LocalProcess(Process):
 	fd_creation_lock = GCLock()
+	engine_cls = None  # process class used to create LocalProcess instances (None: LocalProcess)
+
+	def __new__(cls, *args, **kwargs):
+		if (cls is LocalProcess) and (LocalProcess.engine_cls is not None):
+			return Process.__new__(LocalProcess.engine_cls)
+		return Process.__new__(cls)
 
 	def __init__(self, cmd, *args, **kwargs):
+		kwargs.pop('pty', None)  # stdin / stdout are always connected via pty
 		self._signal_dict = {}
 		for attr in dir(signal):
 			if attr.startswith('SIG') and ('_' not in attr):
@@ -183,6 +190,11 @@ class LocalProcess(Process):
 					raise
 				clear_current_exception()
 
+	def set_engine(cls, engine):
+		# Select the process implementation used by LocalProcess: 'thread' or 'selector'
+		LocalProcess.engine_cls = {'thread': None, 'selector': SelectorProcess}[engine]
+	set_engine = classmethod(set_engine)
+
 	def status(self, timeout, terminate=False):
 		self._event_finished.wait(timeout, 'process to finish')
 		if self._status is False:
@@ -392,5 +404,232 @@ class ProcessWriteStream(ProcessStream):
 		self._buffer.put(value)
 
 
+class ProcessSelector(object):
+	# Single thread that multiplexes the streams of all SelectorProcess instances
+	# and collects the exit status of the finished processes
+	def __init__(self):
+		self._log = logging.getLogger('process.selector')
+		(self._lock, self._channel_list_new, self._running) = (GCLock(), [], False)
+		(self._fd_wakeup_read, self._fd_wakeup_write) = os.pipe()
+		for fd_setup in [self._fd_wakeup_read, self._fd_wakeup_write]:
+			fcntl.fcntl(fd_setup, fcntl.F_SETFL, os.O_NONBLOCK | fcntl.fcntl(fd_setup, fcntl.F_GETFL))
+
+	def add_channel(self, channel):
+		self._lock.acquire()
+		try:
+			self._channel_list_new.append(channel)
+			if not self._running:
+				self._running = True
+				start_daemon('process selector', self._run)
+		finally:
+			self._lock.release()
+		self.wakeup()
+
+	def wakeup(self):
+		ignore_exception(OSError, 0, os.write, self._fd_wakeup_write, str2bytes('!'))
+
+	def _run(self):
+		(channel_list, timeout) = ([], None)
+		while True:
+			try:
+				(channel_list, timeout) = self._run_step(channel_list, timeout)
+			except Exception:
+				self._log.exception('Error while handling process streams')
+				clear_current_exception()
+				time.sleep(1)
+
+	def _run_step(self, channel_list, timeout):
+		self._lock.acquire()
+		try:
+			channel_list.extend(self._channel_list_new)
+			self._channel_list_new = []
+		finally:
+			self._lock.release()
+		if channel_list and (timeout is None):  # data written to stdin is collected while polling
+			timeout = 0.001
+		(fd_read_list, fd_write_list, map_fd2channel) = ([self._fd_wakeup_read], [], {})
+		for channel in channel_list:
+			for fd_read in channel.get_fd_read_list():
+				fd_read_list.append(fd_read)
+				map_fd2channel[fd_read] = channel
+			if channel.collect_input():
+				fd_write_list.append(channel.fd_stdin)
+				map_fd2channel[channel.fd_stdin] = channel
+
+		(fd_read_ready, fd_write_ready) = _poll_fd(fd_read_list, fd_write_list, timeout)
+		for fd_read in fd_read_ready:
+			if fd_read == self._fd_wakeup_read:
+				while ignore_exception(OSError, None, os.read, fd_read, 1024):
+					pass
+			else:
+				map_fd2channel[fd_read].read(fd_read, full=False)
+		for fd_write in fd_write_ready:
+			map_fd2channel[fd_write].write()
+
+		channel_list = lfilter(lambda channel: not channel.check_finished(), channel_list)
+		if not channel_list:  # wait for new processes
+			return (channel_list, None)
+		elif fd_read_ready or fd_write_ready:  # processes often finish right after writing output
+			return (channel_list, 0.001)
+		return (channel_list, min(0.2, 2 * (timeout or 0.001)))
+
+
+class SelectorProcess(LocalProcess):
+	# Process without dedicated threads - its streams are handled by the ProcessSelector thread.
+	# stdin / stdout are connected via pipes - a pty is only used if requested via pty=True
+	selector = None
+
+	def __init__(self, cmd, *args, **kwargs):
+		self._use_pty = kwargs.pop('pty', False)
+		LocalProcess.__init__(self, cmd, *args, **kwargs)
+
+	def _finish(self, status):  # called by the process selector after the process has finished
+		self._status = status
+		self._time_finished = time.time()
+		self._event_shutdown.set()
+		self._buffer_stdout.finish()  # wakeup pending output buffer waits
+		self._buffer_stderr.finish()
+		self._event_finished.set()
+
+	def _start(self):
+		(self._status, self._runtime, self._pid) = (None, None, None)
+		LocalProcess.fd_creation_lock.acquire()
+		try:
+			if SelectorProcess.selector is None:
+				SelectorProcess.selector = ProcessSelector()
+			if self._use_pty:  # terminal is used for stdin / stdout
+				fd_parent_stdout, fd_child_stdout = os.openpty()
+				fd_parent_stdin, fd_child_stdin = (fd_parent_stdout, fd_child_stdout)
+			else:
+				fd_child_stdin, fd_parent_stdin = os.pipe()  # Returns (r, w) FDs
+				fd_parent_stdout, fd_child_stdout = os.pipe()
+			fd_parent_stderr, fd_child_stderr = os.pipe()
+		finally:
+			LocalProcess.fd_creation_lock.release()
+
+		stdin_eof = None
+		if self._use_pty:
+			self._setup_terminal(fd_parent_stdout)
+		else:  # writing EOF closes the stdin pipe
+			stdin_eof = self.stdin.EOF = '\x04'
+		for fd_setup in set([fd_parent_stdin, fd_parent_stdout, fd_parent_stderr]):
+			fcntl.fcntl(fd_setup, fcntl.F_SETFL, os.O_NONBLOCK | fcntl.fcntl(fd_setup, fcntl.F_GETFL))
+
+		pid = os.fork()
+		self._time_started = time.time()
+		self._time_finished = None
+		fd_map = {0: fd_child_stdin, 1: fd_child_stdout, 2: fd_child_stderr}
+		if pid == 0:  # We are in the child process - redirect streams and exec external program
+			from grid_control.utils.process_child import run_command
+			run_command(self._cmd, [self._cmd] + self._args, fd_map, self._env_dict)
+
+		else:  # Still in the parent process - register streams with the process selector
+			for fd_child in set([fd_child_stdin, fd_child_stdout, fd_child_stderr]):
+				os.close(fd_child)
+			self._pid = pid
+			SelectorProcess.selector.add_channel(_ProcessChannel(pid, fd_parent_stdin,
+				self._buffer_stdin, stdin_eof, {fd_parent_stdout: self._buffer_stdout,
+				fd_parent_stderr: self._buffer_stderr}, self._finish))
+
+
+class _ProcessChannel(object):
+	# Stream state of a single process handled by the process selector
+	def __init__(self, pid, fd_stdin, buffer_stdin, stdin_eof, map_fd2buffer, finish_fun):
+		(self._pid, self.fd_stdin, self._buffer_stdin) = (pid, fd_stdin, buffer_stdin)
+		(self._map_fd2buffer, self._finish_fun) = (map_fd2buffer, finish_fun)
+		(self._stdin_eof, self._stdin_data, self._stdin_close) = (stdin_eof, str2bytes(''), False)
+		self._fd_open_set = set([fd_stdin] + list(map_fd2buffer))
+
+	def check_finished(self):
+		# OSError=unable to wait for child - status=False => OS_ABORT
+		(result_pid, status) = ignore_exception(OSError, (self._pid, False),
+			os.waitpid, self._pid, os.WNOHANG)
+		if result_pid != self._pid:
+			return False
+		for fd_read in list(self._map_fd2buffer):
+			self.read(fd_read, full=True)  # Final readout after process finished
+		for fd_open in self._fd_open_set:
+			ignore_exception(OSError, None, os.close, fd_open)
+		self._finish_fun(status)
+		return True
+
+	def collect_input(self):
+		# Transfer data from the stdin buffer - returns True if there is data to write
+		while self.fd_stdin is not None:
+			value = self._buffer_stdin.get(timeout=0, default=None)
+			if value is None:
+				break
+			elif (self._stdin_eof is not None) and (value == self._stdin_eof):
+				self._stdin_close = True
+			else:
+				self._stdin_data += str2bytes(value)
+		return (self.fd_stdin is not None) and (bool(self._stdin_data) or self._stdin_close)
+
+	def get_fd_read_list(self):
+		return list(self._map_fd2buffer)
+
+	def read(self, fd_read, full):
+		while True:
+			try:
+				tmp = os.read(fd_read, 32 * 1024)
+			except OSError:
+				if get_current_exception().errno == errno.EAGAIN:
+					clear_current_exception()
+					return
+				clear_current_exception()
+				tmp = None  # pty returns EIO after the child closed the terminal
+			if not tmp:  # end of stream
+				self._map_fd2buffer.pop(fd_read)
+				if fd_read != self.fd_stdin:
+					self._close(fd_read)
+				return
+			self._map_fd2buffer[fd_read].put(bytes2str(tmp))
+			if not full:
+				return
+
+	def write(self):
+		if self._stdin_data:
+			try:
+				self._stdin_data = self._stdin_data[os.write(self.fd_stdin, self._stdin_data):]
+			except OSError:
+				if get_current_exception().errno == errno.EAGAIN:
+					clear_current_exception()
+					return
+				clear_current_exception()
+				(self._stdin_data, self._stdin_close) = (str2bytes(''), True)  # broken pipe
+		if self._stdin_close and not self._stdin_data:
+			if self.fd_stdin not in self._map_fd2buffer:
+				self._close(self.fd_stdin)
+			self.fd_stdin = None
+
+	def _close(self, fd_open):
+		if fd_open in self._fd_open_set:
+			self._fd_open_set.remove(fd_open)
+			ignore_exception(OSError, None, os.close, fd_open)
+
+
+def _poll_fd(fd_read_list, fd_write_list, timeout):
+	# Returns the sets of readable and writable file descriptors - poll has no limit on the fd numbers
+	if not hasattr(select, 'poll'):
+		(fd_read_ready, fd_write_ready, _) = select.select(fd_read_list, fd_write_list, [], timeout)
+		return (set(fd_read_ready), set(fd_write_ready))
+	(poller, map_fd2mask) = (select.poll(), {})
+	for fd_read in fd_read_list:
+		map_fd2mask[fd_read] = map_fd2mask.get(fd_read, 0) | select.POLLIN
+	for fd_write in fd_write_list:
+		map_fd2mask[fd_write] = map_fd2mask.get(fd_write, 0) | select.POLLOUT
+	for (fd_poll, mask) in map_fd2mask.items():
+		poller.register(fd_poll, mask)
+	if timeout is not None:
+		timeout = int(timeout * 1000)
+	(fd_read_ready, fd_write_ready) = (set(), set())
+	for (fd_poll, event) in ignore_exception(select.error, [], poller.poll, timeout):
+		if (event & ~select.POLLOUT) and (map_fd2mask[fd_poll] & select.POLLIN):
+			fd_read_ready.add(fd_poll)  # readable or hangup / error
+		if (event & ~select.POLLIN) and (map_fd2mask[fd_poll] & select.POLLOUT):
+			fd_write_ready.add(fd_poll)
+	return (fd_read_ready, fd_write_ready)
+
+
 def _wait_fd(fd_read_list=None, fd_write_list=None, timeout=0.2):
 	return select.select(fd_read_list or [], fd_write_list or [], [], timeout)
@@ -29,8 +29,11 @@ def run_command(cmd, args, fd_map, env):  # run command by replacing the current
 		fd_max = os.sysconf('SC_OPEN_MAX')
 	except Exception:
 		fd_max = 256
-	for fd_open in irange(3, fd_max):  # close inherited file descriptors except for std{in/out/err}
-		_safe_close(fd_open)
+	if hasattr(os, 'closerange'):  # close inherited file descriptors except for std{in/out/err}
+		os.closerange(3, fd_max)
+	else:
+		for fd_open in irange(3, fd_max):
+			_safe_close(fd_open)
 	try:
 		os.execve(cmd, args, env)  # replace process - this command DOES NOT RETURN if successful!
 	except Exception:
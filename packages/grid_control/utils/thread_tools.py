@@ -14,6 +14,7 @@
 
 import sys, time, logging, threading
 from hpfwk import ExceptionCollector, NestedException, clear_current_exception, get_thread_name, get_trace_fun, ignore_exception  # pylint:disable=line-too-long
+from python_compat import irange, next
 
 
 BLOCKING_EQUIVALENT = 60 * 60 * 24 * 7  # instead of blocking, we wait for a week ;)
@@ -79,6 +80,30 @@ def tchain(iterable_iter, timeout=None, max_concurrent=None,
 	exc.raise_any(ex_cls(ex_msg))
 
 
+def tmap(fun, iterable, max_concurrent=None,
+		ex_cls=NestedException, ex_msg='Caught exception during threaded map'):
+	# Applies function to all elements in parallel threads - results are returned in the input order
+	item_list = list(iterable)
+	result = GCQueue()
+	exc = ExceptionCollector()
+	(item_iter, item_lock, stop_event) = (enumerate(item_list), GCLock(), GCEvent())
+	for _ in irange(min(max_concurrent or len(item_list), len(item_list))):
+		start_daemon('tmap worker thread', _tmap_thread, exc, fun, item_iter, item_lock,
+			stop_event, result)
+
+	result_dict = {}
+	for idx in irange(len(item_list)):
+		while idx not in result_dict:
+			(idx_finished, value) = result.get(timeout=None)
+			result_dict[idx_finished] = value
+		value = result_dict.pop(idx)
+		if value is GCQueue:  # marker for failed function call
+			break
+		yield value
+	stop_event.set()
+	exc.raise_any(ex_cls(ex_msg))
+
+
 def with_lock(lock, fun, *args, **kwargs):
 	lock.acquire()
 	try:
@@ -331,3 +356,18 @@ def _tchain_thread(exc, iterable, result):
 			exc.collect()
 	finally:
 		result.put(GCQueue)  # Use GCQueue as end-of-generator marker
+
+
+def _tmap_thread(exc, fun, item_iter, item_lock, stop_event, result):
+	while not stop_event.is_set():
+		idx_item = with_lock(item_lock, next, item_iter, None)
+		if idx_item is None:
+			break
+		(idx, item) = idx_item
+		try:
+			value = fun(item)
+		except Exception:
+			exc.collect()
+			stop_event.set()
+			value = GCQueue
+		result.put((idx, value))
@@ -12,13 +12,16 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import os, logging
+import os, re, logging
 from grid_control.utils.data_structures import make_enum
-from grid_control.utils.parsing import parse_json
+from grid_control.utils.parsing import parse_json, remove_unicode
 from hpfwk import AbstractError, NestedException, Plugin, clear_current_exception, ignore_exception
 from python_compat import identity, json, resolve_fun
 
 
+_JSON_WHITESPACE = re.compile(r'\s*')
+
+
 class RestError(NestedException):
 	pass
 
@@ -83,6 +86,26 @@ class JSONRestClient(RestClient):
 			default_headers or {'Content-Type': 'application/json', 'Accept': 'application/json'},
 			process_result=process_result or self._process_json_result, process_data=json.dumps)
 
+	def iter_get(self, url=None, api=None, headers=None, params=None):
+		# Iterate over the elements of a JSON list reply - without building the complete list first
+		return self._iter_json_result(self._request(RestSession.GET, url, api, headers, params=params))
+
+	def iter_post(self, url=None, api=None, headers=None, data=None):
+		if data:
+			data = self._process_data(data)
+		return self._iter_json_result(self._request(RestSession.POST, url, api, headers, data=data))
+
+	def _iter_json_result(self, value):
+		if not value:
+			raise RestError('Received empty reply')
+		try:
+			for item in _iter_json_list(value):
+				yield remove_unicode(item)
+		except RestError:
+			raise
+		except Exception:
+			raise RestError('Received invalid JSON reply: %r' % value[:1000])
+
 	def _process_json_result(self, value):
 		if not value:
 			raise RestError('Received empty reply')
@@ -120,3 +143,23 @@ class GridJSONRestClient(JSONRestClient):
 		if not self._cert:
 			self._cert = self._get_grid_cert()
 		return JSONRestClient._request(self, request_fun, url, api, headers, params, data)
+
+
+def _iter_json_list(value):
+	# Decode the elements of a JSON list one by one
+	decoder = json.JSONDecoder()
+	pos = _JSON_WHITESPACE.match(value, 0).end()
+	if value[pos:pos + 1] != '[':
+		raise RestError('Received JSON reply is not a list: %r' % value[:1000])
+	pos = _JSON_WHITESPACE.match(value, pos + 1).end()
+	if value[pos:pos + 1] == ']':
+		return
+	while True:
+		(item, pos) = decoder.raw_decode(value, pos)
+		yield item
+		pos = _JSON_WHITESPACE.match(value, pos).end()
+		if value[pos:pos + 1] == ']':
+			return
+		elif value[pos:pos + 1] != ',':
+			raise RestError('Invalid separator in JSON list at position %d' % pos)
+		pos = _JSON_WHITESPACE.match(value, pos + 1).end()
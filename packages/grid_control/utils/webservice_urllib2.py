@@ -13,9 +13,10 @@
 # | limitations under the License.
 
 import sys
-from grid_control.utils.webservice import RestSession
+from grid_control.utils.thread_tools import GCLock, with_lock
+from grid_control.utils.webservice import RestError, RestSession
 from hpfwk import ignore_exception
-from python_compat import bytes2str, resolve_fun, str2bytes
+from python_compat import bytes2str, irange, resolve_fun, str2bytes
 
 
 def disable_ca_cert_check():  # fix ca verification error in Python 2.7.9
@@ -38,21 +39,53 @@ class Urllib2Session(RestSession):
 	alias_list = ['urllib2']
 	ignore_exception(Exception, None, disable_ca_cert_check)
 	build_opener = resolve_sfun('urllib.request:build_opener', urllib2_path('urllib2:build_opener'))
+	getproxies = resolve_sfun('urllib.request:getproxies', 'urllib:getproxies')
+	HTTPConnection = resolve_sfun('http.client:HTTPConnection', 'httplib:HTTPConnection')
 	HTTPSConnection = resolve_sfun('http.client:HTTPSConnection', 'httplib:HTTPSConnection')
 	HTTPSHandler = resolve_sfun('urllib.request:HTTPSHandler', urllib2_path('urllib2:HTTPSHandler'))
 	Request = resolve_sfun('urllib.request:Request', urllib2_path('urllib2:Request'))
 	urlencode = resolve_sfun('urllib.parse:urlencode', 'urllib:urlencode')
+	urljoin = resolve_sfun('urllib.parse:urljoin', 'urlparse:urljoin')
+	urlsplit = resolve_sfun('urllib.parse:urlsplit', 'urlparse:urlsplit')
+
+	def __init__(self, idle_connection_max=10):
+		RestSession.__init__(self)
+		# idle keep-alive connections are shared between all threads using this session
+		(self._idle_connection_lock, self._idle_connection_dict) = (GCLock(), {})
+		self._idle_connection_max = idle_connection_max
 
 	def request(self, mode, url, headers, params=None, data=None, cert=None):
-		request_fun = {RestSession.GET: lambda: 'GET', RestSession.PUT: lambda: 'PUT',
-			RestSession.POST: lambda: 'POST', RestSession.DELETE: lambda: 'DELETE'}[mode]
+		method = {RestSession.GET: 'GET', RestSession.PUT: 'PUT',
+			RestSession.POST: 'POST', RestSession.DELETE: 'DELETE'}[mode]
 		if params:
 			url += '?%s' % Urllib2Session.urlencode(params)
 		if data:
 			data = str2bytes(data)
-		request = Urllib2Session.Request(url=url, data=data, headers=headers)
-		request.get_method = request_fun
-		return bytes2str(self._get_opener(cert).open(request).read())
+		for _ in irange(10 + 1):  # at most 10 redirects are followed (same limit as urllib2)
+			url_info = Urllib2Session.urlsplit(url)
+			if (url_info[0] not in ['http', 'https']) or Urllib2Session.getproxies().get(url_info[0]):
+				request = Urllib2Session.Request(url=url, data=data, headers=headers)
+				request.get_method = lambda: method
+				return bytes2str(self._get_opener(cert).open(request).read())
+			(response, content) = self._request_pooled(method, url_info, headers, data, cert)
+			location = response.getheader('location')
+			if not ((300 <= response.status < 400) and location):
+				break
+			# the request is sent to the new location - 301 / 302 / 303 turn it into a GET request
+			url = Urllib2Session.urljoin(url, location)
+			if response.status in [301, 302, 303]:
+				(method, data) = ('GET', None)
+		if response.status >= 300:
+			raise RestError('Request result: %s %s\n%s' % (response.status, response.reason,
+				bytes2str(content)))
+		return bytes2str(content)
+
+	def _create_connection(self, scheme, netloc, cert):
+		if scheme == 'https':
+			if cert:
+				return Urllib2Session.HTTPSConnection(netloc, key_file=cert, cert_file=cert)
+			return Urllib2Session.HTTPSConnection(netloc)
+		return Urllib2Session.HTTPConnection(netloc)
 
 	def _get_opener(self, cert):
 		class HTTPSClientAuthHandler(Urllib2Session.HTTPSHandler):
@@ -65,3 +98,48 @@ class Urllib2Session(RestSession):
 		if cert:
 			return Urllib2Session.build_opener(HTTPSClientAuthHandler())
 		return Urllib2Session.build_opener()
+
+	def _pop_idle_connection(self, connection_key):
+		connection_list = self._idle_connection_dict.get(connection_key)
+		if connection_list:
+			return connection_list.pop()
+
+	def _push_idle_connection(self, connection_key, connection):
+		connection_list = self._idle_connection_dict.setdefault(connection_key, [])
+		if len(connection_list) < self._idle_connection_max:
+			connection_list.append(connection)
+		else:
+			connection.close()
+
+	def _request_pooled(self, method, url_info, headers, data, cert):
+		# Send request over a keep-alive connection - returns the response and its content
+		(scheme, netloc, path, query, _) = url_info
+		selector = path or '/'
+		if query:
+			selector += '?%s' % query
+		connection_key = (scheme, netloc, cert)
+		(connection, response_info) = (None, None)
+		if method == 'GET':  # requests on idle connections are repeated if the server closed it -
+			# which is only safe for GET requests, since the server might have received the request
+			connection = with_lock(self._idle_connection_lock, self._pop_idle_connection, connection_key)
+		if connection is not None:
+			response_info = ignore_exception(Exception, None, _send_request,
+				connection, method, selector, data, headers)
+		if response_info is None:
+			connection = self._create_connection(scheme, netloc, cert)
+			response_info = _send_request(connection, method, selector, data, headers)
+		if response_info[0].will_close:
+			connection.close()
+		else:
+			with_lock(self._idle_connection_lock, self._push_idle_connection, connection_key, connection)
+		return response_info
+
+
+def _send_request(connection, method, selector, data, headers):
+	try:
+		connection.request(method, selector, data, headers)
+		response = connection.getresponse()
+		return (response, response.read())
+	except Exception:
+		connection.close()
+		raise
@@ -21,6 +21,7 @@ from grid_control.utils import abort, deprecated, ensure_dir_exists, get_path_sh
 from grid_control.utils.activity import Activity
 from grid_control.utils.cmd_options import Options
 from grid_control.utils.file_tools import SafeFile, with_file
+from grid_control.utils.process_base import LocalProcess
 from grid_control.utils.thread_tools import start_daemon
 from hpfwk import DebugInterface, Plugin, ignore_exception, init_hpf_plugins
 from python_compat import StringBuffer
@@ -145,6 +146,8 @@ def _gc_create_workflow(config, do_freeze=True, **kwargs):
 	_setup_work_path(global_config)
 	for package_paths in global_config.get_dn_list('package paths', [], on_change=None):
 		init_hpf_plugins(package_paths)
+	LocalProcess.set_engine(global_config.get_choice('process engine', ['thread', 'selector'],
+		'thread', on_change=None))
 
 	# Query config settings before config is frozen
 	help_cfg = global_config.get_state('display', detail='config')
@@ -52,7 +52,7 @@ def _get_cms_cert(config):
 		try:
 			proxy_init_exec = resolve_install_path('voms-proxy-init')
 			proc = LocalProcess(proxy_init_exec, '--voms', str.join(':', ['cms'] + role),
-				'--valid', '%d:%d' % (lifetime / 60, lifetime % 60), logging=False)
+				'--valid', '%d:%d' % (lifetime / 60, lifetime % 60), logging=False, pty=True)
 			if password:
 				proc.stdin.write(password + '\n')
 				proc.stdin.close()
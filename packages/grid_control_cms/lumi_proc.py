@@ -47,6 +47,9 @@ class LumiDataProcessor(DataProcessor):
 		return self._repr_base('filter=%s, keep=%s, strict=%s' % (self._lumi_filter,
 			LumiKeep.enum2str(self._lumi_keep), LumiMode.enum2str(self._lumi_strict)))
 
+	def is_parallel_safe(self):
+		return True
+
 	def process_block(self, block):
 		if self._lumi_filter.empty():
 			if (self._lumi_keep == LumiKeep.RunLumi) or (DataProvider.Metadata not in block):
@@ -20,11 +20,11 @@ from grid_control.gc_exceptions import InstallationError
 from grid_control.utils import split_opt
 from grid_control.utils.activity import Activity, ProgressActivity
 from grid_control.utils.data_structures import make_enum
-from grid_control.utils.thread_tools import start_thread
+from grid_control.utils.thread_tools import start_thread, tmap
 from grid_control_cms.cric import CRIC
 from grid_control_cms.lumi_tools import parse_lumi_filter, str_lumi
 from hpfwk import AbstractError
-from python_compat import itemgetter, lfilter, sorted
+from python_compat import ifilter, itemgetter, lfilter, lmap, sorted
 
 
 CMSLocationFormat = make_enum(['hostname', 'siteDB', 'both'])  # pylint:disable=invalid-name
@@ -49,6 +49,7 @@ class CMSBaseProvider(DataProvider):
 		self._only_complete = dataset_config.get_bool('only complete sites', True)
 		self._only_valid = dataset_config.get_bool('only valid', True)
 		self._allow_phedex = dataset_config.get_bool('allow phedex', True)
+		self._block_thread_max = config.get_int('dataprovider block thread max', 5, on_change=None)
 		self._location_format = dataset_config.get_enum('location format',
 			CMSLocationFormat, CMSLocationFormat.hostname)
 		self._sitedb = CRIC()
@@ -132,12 +133,36 @@ class CMSBaseProvider(DataProvider):
 			raise DatasetError('Dataset %r contains %d blocks, but none were selected by %r' % (
 				dataset_path, n_blocks, self._dataset_block_selector))
 
+	def _get_cms_block_token(self, block_path):
+		# Token identifying the state of the block - its file information is cached until it changes
+		return None
+
 	def _get_cms_dataset_list(self, dataset_path):
 		raise AbstractError
 
 	def _get_cms_lumi_dict(self, block_path):
 		return None
 
+	def _get_gc_block(self, use_phedex, block_path, replica_infos, block_cached):
+		(result, do_query_files) = (block_cached, block_cached is None)
+		if do_query_files:
+			result = {}
+			result[DataProvider.Dataset] = block_path.split('#')[0]
+			result[DataProvider.BlockName] = block_path.split('#')[1]
+
+		if use_phedex and self._allow_phedex:  # Start parallel phedex query
+			replicas_dict = {}
+			rucio_thread = start_thread('Query rucio site info for %s' % block_path,
+				self._get_rucio_replica_list, block_path, replicas_dict)
+			if do_query_files:
+				self._fill_cms_fi_list(result, block_path)
+			rucio_thread.join()
+			replica_infos = replicas_dict.get(block_path)
+		elif do_query_files:
+			self._fill_cms_fi_list(result, block_path)
+		result[DataProvider.Locations] = self._process_replica_list(block_path, replica_infos)
+		return result
+
 	def _get_gc_block_list(self, use_phedex):
 		dataset_name_list = self.get_dataset_name_list()
 		progress_ds = ProgressActivity('Getting dataset', len(dataset_name_list))
@@ -145,25 +170,21 @@ class CMSBaseProvider(DataProvider):
 			progress_ds.update_progress(dataset_idx, msg='Getting dataset %s' % dataset_path)
 			counter = 0
 			blockinfo_list = list(self._filter_cms_blockinfo_list(dataset_path, not use_phedex))
-			progress_block = ProgressActivity('Getting block information', len(blockinfo_list))
+			# file information of unchanged blocks is taken from the provider cache
+			block_query_list = []
 			for (block_path, replica_infos) in blockinfo_list:
-				result = {}
-				result[DataProvider.Dataset] = block_path.split('#')[0]
-				result[DataProvider.BlockName] = block_path.split('#')[1]
-				progress_block.update_progress(counter,
+				block_cached = self._get_cached_block(block_path, self._get_cms_block_token(block_path))
+				block_query_list.append((block_path, replica_infos, block_cached))
+			self._prefetch_cms_files(dataset_path,
+				lmap(itemgetter(0), ifilter(lambda block_query: block_query[2] is None, block_query_list)))
+			progress_block = ProgressActivity('Getting block information', len(blockinfo_list))
+			# blocks are queried in parallel threads - but returned in the order of the block list
+			block_iter = tmap(lambda block_query: self._get_gc_block(use_phedex, *block_query),
+				block_query_list, max_concurrent=self._block_thread_max,
+				ex_cls=DatasetError, ex_msg='Unable to retrieve blocks of dataset %s' % dataset_path)
+			for (block_idx, result) in enumerate(block_iter):
+				progress_block.update_progress(block_idx,
 					msg='Getting block information for ' + result[DataProvider.BlockName])
-
-				if use_phedex and self._allow_phedex:  # Start parallel phedex query
-					replicas_dict = {}
-					rucio_thread = start_thread('Query rucio site info for %s' % block_path,
-						self._get_rucio_replica_list, block_path, replicas_dict)
-					self._fill_cms_fi_list(result, block_path)
-					rucio_thread.join()
-					replica_infos = replicas_dict.get(block_path)
-				else:
-					self._fill_cms_fi_list(result, block_path)
-				result[DataProvider.Locations] = self._process_replica_list(block_path, replica_infos)
-
 				if len(result[DataProvider.FileList]):
 					counter += 1
 					yield result
@@ -220,6 +241,10 @@ class CMSBaseProvider(DataProvider):
 				else:
 					yield '%s/%s' % (name_node, name_hostname)
 
+	def _prefetch_cms_files(self, dataset_path, block_path_list):
+		# Allows to retrieve the file information of several blocks with bulk queries
+		pass
+
 	def _process_replica_list(self, block_path, replica_infos):
 		def _empty_with_warning(error_msg, *args):
 			self._log.warning('Dataset block %r ' + error_msg, block_path, *args)
@@ -17,7 +17,7 @@ from grid_control.gc_exceptions import UserError
 from grid_control.utils.webservice import GridJSONRestClient
 from grid_control_cms.access_cms import get_cms_cert
 from grid_control_cms.provider_cms import CMSBaseProvider
-from python_compat import lmap
+from python_compat import imap, irange, lchain, lmap, lrange, set
 
 
 class DBS3Provider(CMSBaseProvider):
@@ -34,6 +34,11 @@ class DBS3Provider(CMSBaseProvider):
 		self._use_phedex = (self._url == 'https://cmsweb.cern.ch/dbs/prod/global/DBSReader')
 		self._gjrc = GridJSONRestClient(get_cms_cert(config), self._url,
 			'VOMS proxy needed to query DBS3!', UserError)
+		self._block_token_dict = {}
+		# file and lumi information of many blocks is retrieved with bulk queries
+		self._bulk_query_block_min = config.get_int('dbs bulk query min blocks', 10, on_change=None)
+		self._lumi_batch_size = config.get_int('dbs lumi batch size', 1000, on_change=None)
+		(self._prefetch_fi_dict, self._prefetch_lumi_dict) = ({}, {})
 
 	def _get_cms_dataset_list(self, dataset_path):
 		dataset_path_parts = (dataset_path.lstrip('/') + '/*/*/*').split('/')[:3]
@@ -42,9 +47,18 @@ class DBS3Provider(CMSBaseProvider):
 			processed_ds_name=processed_ds_name, data_tier_name=data_tier_name)
 		return lmap(lambda x: x['dataset'], tmp)
 
+	def _get_cms_block_token(self, block_path):
+		return self._block_token_dict.get(block_path)
+
 	def _get_cms_lumi_dict(self, block_path):
+		if block_path in self._prefetch_lumi_dict:
+			result = self._prefetch_lumi_dict.pop(block_path)
+			for lumi_info_list in result.values():
+				for (idx, (run, lumi_rle_list)) in enumerate(lumi_info_list):
+					lumi_info_list[idx] = (run, _expand_lumi_list(lumi_rle_list))
+			return result
 		result = {}
-		for lumi_info_dict in self._query_dbsv3('filelumis', block_name=block_path):
+		for lumi_info_dict in self._iter_query_dbsv3('filelumis', block_name=block_path):
 			tmp = (int(lumi_info_dict['run_num']), lmap(int, lumi_info_dict['lumi_section_num']))
 			result.setdefault(lumi_info_dict['logical_file_name'], []).append(tmp)
 		return result
@@ -54,18 +68,77 @@ class DBS3Provider(CMSBaseProvider):
 
 	def _iter_cms_blocks(self, dataset_path, do_query_sites):
 		def _get_name_locationinfo_list(blockinfo):
+			if not blockinfo.get('open_for_writing'):  # only closed blocks are cached
+				self._block_token_dict[blockinfo['block_name']] = (self._lumi_query, self._only_valid,
+					blockinfo.get('last_modification_date'), blockinfo.get('file_count'),
+					blockinfo.get('block_size'))
 			if do_query_sites:
 				return (blockinfo['block_name'], [(blockinfo['origin_site_name'], None, True)])
 			return (blockinfo['block_name'], None)
+		# block details are always requested to get the modification time of the blocks
 		return lmap(_get_name_locationinfo_list,
-			self._query_dbsv3('blocks', dataset=dataset_path, detail=do_query_sites))
+			self._query_dbsv3('blocks', dataset=dataset_path, detail=True))
 
 	def _iter_cms_files(self, block_path, query_only_valid, query_lumi):
-		for cms_fi in self._query_dbsv3('files', block_name=block_path, detail=True):
+		cms_fi_iter = self._prefetch_fi_dict.pop(block_path, None)
+		if cms_fi_iter is None:
+			cms_fi_iter = self._iter_query_dbsv3('files', block_name=block_path, detail=True)
+		for cms_fi in cms_fi_iter:
 			if (cms_fi['is_file_valid'] == 1) or not query_only_valid:
 				fi = {DataProvider.URL: cms_fi['logical_file_name'],
 					DataProvider.NEntries: cms_fi['event_count']}
 				yield (fi, None)
 
+	def _iter_query_dbsv3(self, api, **kwargs):
+		return self._gjrc.iter_get(api=api, params=kwargs)
+
+	def _iter_query_dbsv3_bulk(self, api, **kwargs):
+		return self._gjrc.iter_post(api=api, data=kwargs)
+
+	def _prefetch_cms_files(self, dataset_path, block_path_list):
+		# A single files query for the whole dataset and filelumis queries over batches of
+		# file names replace the per-block queries if the file information of many blocks is needed
+		(self._prefetch_fi_dict, self._prefetch_lumi_dict) = ({}, {})
+		if not (0 < self._bulk_query_block_min <= len(block_path_list)):
+			return
+		(block_path_set, map_lfn2block_path) = (set(block_path_list), {})
+		for cms_fi in self._iter_query_dbsv3('files', dataset=dataset_path, detail=True):
+			block_path = cms_fi['block_name']
+			if block_path in block_path_set:
+				self._prefetch_fi_dict.setdefault(block_path, []).append({
+					'logical_file_name': cms_fi['logical_file_name'],
+					'event_count': cms_fi['event_count'], 'is_file_valid': cms_fi['is_file_valid']})
+				if (cms_fi['is_file_valid'] == 1) or not self._only_valid:
+					map_lfn2block_path[cms_fi['logical_file_name']] = block_path
+		if not self._lumi_query:
+			return
+		for block_path in self._prefetch_fi_dict:
+			self._prefetch_lumi_dict[block_path] = {}
+		lfn_list = list(map_lfn2block_path)
+		for batch_idx in irange(0, len(lfn_list), self._lumi_batch_size):
+			lumi_info_iter = self._iter_query_dbsv3_bulk('filelumis',
+				logical_file_name=lfn_list[batch_idx:batch_idx + self._lumi_batch_size])
+			for lumi_info_dict in lumi_info_iter:  # lumi information is kept run-length encoded
+				lfn = lumi_info_dict['logical_file_name']
+				lumi_info_list = self._prefetch_lumi_dict[map_lfn2block_path[lfn]].setdefault(lfn, [])
+				lumi_info_list.append((int(lumi_info_dict['run_num']),
+					_compress_lumi_list(imap(int, lumi_info_dict['lumi_section_num']))))
+
 	def _query_dbsv3(self, api, **kwargs):
 		return self._gjrc.get(api=api, params=kwargs)
+
+
+def _compress_lumi_list(lumi_iter):
+	# Run-length encoding of consecutive lumi sections: [1, 2, 3, 7] -> [[1, 3], [7, 1]]
+	result = []
+	for lumi in lumi_iter:
+		if result and (result[-1][0] + result[-1][1] == lumi):
+			result[-1][1] += 1
+		else:
+			result.append([lumi, 1])
+	return result
+
+
+def _expand_lumi_list(lumi_rle_list):
+	return lchain(imap(lambda lumi_start_count: lrange(lumi_start_count[0],
+		lumi_start_count[0] + lumi_start_count[1]), lumi_rle_list))
@@ -13,7 +13,7 @@
 # | limitations under the License.
 
 # pylint:disable=invalid-name,wrong-import-position
-import os, sys, logging, itertools
+import os, sys, struct, logging, itertools
 
 
 class ZipExhausted(Exception):
@@ -230,6 +230,32 @@ def _sorted(unsorted_iterable, key=None, reverse=False):
 		unsorted_list.reverse()
 	return unsorted_list
 
+
+class _Struct(object):
+	""" Precompiled struct format with the interface of struct.Struct
+	>>> _Struct('>HI').unpack_from(_Struct('>BHI').pack(1, 2, 3), 1)
+	(2, 3)
+	"""
+	def __init__(self, fmt):
+		(self.format, self.size) = (fmt, struct.calcsize(fmt))
+
+	def pack(self, *args):
+		return struct.pack(self.format, *args)
+
+	def unpack(self, data):
+		return struct.unpack(self.format, data)
+
+	def unpack_from(self, data, offset=0):
+		return struct.unpack(self.format, data[offset:offset + self.size])
+
+
+def _unpack_from(fmt, data, offset=0):
+	""" Unpack struct format from the given position of the data
+	>>> _unpack_from('>H', _Struct('>BH').pack(1, 2), 1)
+	(2,)
+	"""
+	return struct.unpack(fmt, data[offset:offset + struct.calcsize(fmt)])
+
 all = resolve_fun('<builtin>:all', _all)  # >= py-2.5
 any = resolve_fun('<builtin>:any', _any)  # >= py-2.5
 BytesBuffer = resolve_fun('cStringIO:StringIO', 'io:BytesIO')  # < py-2.6
@@ -257,7 +283,9 @@ rsplit = resolve_fun('<builtin>:str.rsplit', _rsplit)  # >= py-2.4
 set = resolve_fun('<builtin>:set', 'sets:Set')  # >= py-2.4
 sorted = resolve_fun('<builtin>:sorted', _sorted)  # >= py-2.4
 StringBuffer = resolve_fun('cStringIO:StringIO', 'io:StringIO')  # < py-2.6
+Struct = resolve_fun('struct:Struct', _Struct)  # >= py-2.5
 unicode = resolve_fun('<builtin-py2>:unicode', '<builtin-py3>:str')  # unicode < py-3.0
+unpack_from = resolve_fun('struct:unpack_from', _unpack_from)  # >= py-2.5
 
 
 try:  # pylint has issues with inheriting from something returned by resolve_fun
@@ -329,7 +357,7 @@ __all__ = ['all', 'any', 'bytes2str', 'BytesBuffer', 'BytesBufferBase', 'exit_wi
 	'itemgetter', 'izip', 'izip_longest', 'json', 'lchain', 'lfilter', 'lidfilter', 'lmap', 'lrange',
 	'lru_cache', 'lsmap', 'lzip', 'md5', 'md5_hex', 'next', 'parsedate', 'partial', 'reduce',
 	'relpath', 'resolve_fun', 'rsplit', 'set', 'sort_inplace', 'sorted', 'str2bytes', 'StringBuffer',
-	'tarfile', 'unicode', 'unspecified', 'when_unspecified']
+	'Struct', 'tarfile', 'unicode', 'unpack_from', 'unspecified', 'when_unspecified']
 
 
 if __name__ == '__main__':
@@ -234,8 +234,8 @@ def merge_blocks(block_list):
 		yield ds_info_dict[ds_name]
 
 
-def save_dataset(fn, block_list):
-	DataProvider.save_to_file(fn, block_list)
+def save_dataset(fn, block_list, binary):
+	DataProvider.save_to_file(fn, block_list, binary=binary)
 	logging.getLogger('script').info('Dataset information saved to %r', fn)
 
 
@@ -272,7 +272,7 @@ def _main():
 	if options.opts.list_metadata_common:
 		list_metadata_common(dataset_list, block_list)
 	if options.opts.save:
-		save_dataset(options.opts.save, block_list)
+		save_dataset(options.opts.save, block_list, options.opts.save_binary or None)
 
 
 def _parse_cmd_line():
@@ -302,6 +302,8 @@ def _parse_cmd_line():
 		help='Specify config file as source of detailed dataset settings')
 	parser.add_text(None, 'S', 'save', default='',
 		help='Saves dataset information to specified file')
+	parser.add_bool(None, 'B', 'save-binary', default=False,
+		help='Use the binary dataset file format to save dataset information')
 	parser.add_bool(None, 'c', 'config-entry', default=False, dest='list_config_entry',
 		help='Gives config file entries to run over given dataset(s)')
 	parser.add_bool(None, 'n', 'config-nick', default=False,
@@ -13,7 +13,7 @@
 # | See the License for the specific language governing permissions and
 # | limitations under the License.
 
-import sys, gzip, base64, logging
+import os, sys, gzip, base64, logging
 from gc_scripts import ConsoleTable, Job, JobSelector, Plugin, ScriptOptions, gc_create_config, get_script_object_cmdline  # pylint:disable=line-too-long
 from grid_control.backends import WMS
 from grid_control.datasets import DataProvider, DataSplitter
@@ -165,6 +165,17 @@ def logfile_decode(fn):
 		with_file(SafeFile(fn), _decode_stream)
 
 
+def partition_convert(options, reader):
+	# Convert partition file into a different format - the original file is kept as backup
+	path = options.args[0]
+	DataSplitter.save_partitions(path + '.convert', reader.iter_partitions(),
+		writer_name=options.opts.partition_convert)
+	os.rename(path, path + '.orig')
+	os.rename(path + '.convert', path)
+	logging.info('Converted %d partitions into %s format (backup: %s)',
+		reader.get_partition_len(), options.opts.partition_convert, path + '.orig')
+
+
 def partition_display(opts, partition_iter):
 	def _iter_partitions():
 		for partition_num, partition in enumerate(partition_iter):
@@ -196,6 +207,8 @@ def _main():
 		partition_display(options.opts, get_partition_reader(options).iter_partitions())
 	if opts.partition_list_invalid:
 		partition_display(options.opts, partition_iter_invalid(get_partition_reader(options)))
+	if opts.partition_convert:
+		partition_convert(options, get_partition_reader(options))
 
 	if opts.job_reset_attempts or opts.job_force_state or opts.job_show_jdl:
 		job_db = get_script_object_cmdline(options.args)
@@ -228,6 +241,8 @@ def _parse_cmd_line():
 		help='List invalidated dataset partitions')
 	parser.add_text('part', '', 'partition-key-list', default='',
 		help='Select dataset partition information to display')
+	parser.add_text('part', '', 'partition-convert', default='',
+		help='Convert partition file into specified format (eg. version_3)')
 
 	parser.section('jobs', 'Jobs debugging', '%s <config file / job file> ... ')
 	parser.add_text('jobs', '', 'job-selector', default='',